@@ -0,0 +1,148 @@
+"""
+Contains a check and benchmark of the cleaning of PDFs, on locally generated PDFs with a text layer, whose body is
+surrounded by long front and back matter. The core pages are cleaned the way that the Cleaner used to (by
+loading every page and then dropping the ones outside the body) and with the page-indexed reader that only decodes
+the core pages. Both must produce exactly the core pages, in order, with the same text; and the old filter (which
+removed items from the list that it was iterating over) is checked for the pages that it let through.
+"""
+import os
+import time
+import random
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from langchain_core.documents import Document
+
+from src.setup.paths import BENCHMARKS_DIR
+from src.data_processing.reading import read_pdf_pages
+from src.data_processing.normalization import Normalizer
+
+
+TEXT_FIXTURES: Path = BENCHMARKS_DIR.joinpath("text")
+
+WORDS: list[str] = [
+    "the", "people", "freedom", "history", "struggle", "nation", "labour", "land", "power", "unity", "colonial",
+    "independence", "capital", "movement", "workers", "state", "africa", "revolution", "economy", "peace"
+]
+
+
+def make_text_page(generator: random.Random, page_number: int, lines: int = 45) -> PageObject:
+    page: PageObject = PageObject.create_blank_page(width=595, height=842)  # A4, in points
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    })
+    page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+
+    text_lines: list[str] = [f"Page {page_number}"] + [
+        " ".join(generator.choices(WORDS, k=generator.randint(6, 10))) for _ in range(lines)
+    ]
+    operations: str = "".join(f"({line}) Tj T* " for line in text_lines)
+
+    stream = DecodedStreamObject()
+    stream.set_data(f"BT /F1 10 Tf 14 TL 60 790 Td {operations}ET".encode())
+    page.replace_contents(stream)
+    return page
+
+
+def make_text_pdf(number_of_pages: int, seed: int = 0) -> Path:
+    """
+    Generate (or reuse) a PDF whose pages have lines of text in their text layer, each page starting with its number.
+    """
+    for path in [BENCHMARKS_DIR, TEXT_FIXTURES]:
+        if not path.exists():
+            os.mkdir(path)
+
+    pdf_path: Path = TEXT_FIXTURES.joinpath(f"text_{number_of_pages}_pages_{seed}.pdf")
+    if not pdf_path.exists():
+        generator = random.Random(seed)
+        writer = PdfWriter()
+
+        for page_number in range(number_of_pages):
+            _ = writer.add_page(make_text_page(generator=generator, page_number=page_number))
+
+        with open(pdf_path, mode="wb") as file:
+            _ = writer.write(file)
+
+        logger.info(f"Generated {pdf_path.name}")
+
+    return pdf_path
+
+
+def load_every_page(pdf_path: Path) -> list[Document]:
+    """
+    Load every page of the PDF, as PyPDFLoader did for the Cleaner.
+    """
+    reader = PdfReader(pdf_path)
+    return [
+        Document(page_content=page.extract_text().strip(), metadata={"source": str(pdf_path), "page": page_number})
+        for page_number, page in enumerate(reader.pages)
+    ]
+
+
+def remove_non_core_pages(documents: list[Document], core_pages: range) -> list[Document]:
+    return [document for document in documents if document.metadata["page"] in core_pages]
+
+
+def remove_non_core_pages_in_place(documents: list[Document], core_pages: range) -> list[Document]:
+    """
+    The filter that the Cleaner used to drop the pages outside the body of a book with, which removes pages from
+    the list while iterating over it, so that the page after each one that it removes is never looked at.
+    """
+    for document in documents:
+        if document.metadata["page"] not in core_pages:
+            documents.remove(document)
+
+    return documents
+
+
+def run_benchmark(number_of_pages: int, core_pages: range, repeats: int) -> None:
+    pdf_path: Path = make_text_pdf(number_of_pages=number_of_pages)
+    normalizer = Normalizer(replacements={})
+
+    eager_times: list[float] = []
+    lazy_times: list[float] = []
+
+    for _ in range(repeats):
+        start_time: float = time.perf_counter()
+        eager: list[Document] = normalizer.normalize_documents(
+            documents=remove_non_core_pages(documents=load_every_page(pdf_path=pdf_path), core_pages=core_pages)
+        )
+        eager_times.append(time.perf_counter() - start_time)
+
+        start_time = time.perf_counter()
+        lazy: list[Document] = normalizer.normalize_documents(documents=read_pdf_pages(path=pdf_path, pages=core_pages))
+        lazy_times.append(time.perf_counter() - start_time)
+
+        assert [document.metadata["page"] for document in lazy] == list(core_pages), "The reader returned the wrong pages"
+        assert [document.metadata["page"] for document in eager] == list(core_pages), "The filter returned the wrong pages"
+        assert [document.page_content for document in lazy] == [document.page_content for document in eager], \
+            "The reader returned different text"
+        assert all(document.page_content.startswith(f"Page {document.metadata['page']} ") for document in lazy), \
+            "The text of a page was read from another page"
+
+    survivors: list[Document] = remove_non_core_pages_in_place(documents=load_every_page(pdf_path=pdf_path), core_pages=core_pages)
+    non_core_survivors: int = sum(document.metadata["page"] not in core_pages for document in survivors)
+
+    logger.success(
+        f"{number_of_pages} pages, core pages {core_pages.start}-{core_pages.stop - 1} | load everything, then filter: "
+        f"{min(eager_times):.2f}s | only read the core pages: {min(lazy_times):.2f}s ({min(eager_times) / min(lazy_times):.1f}x) "
+        f"| non-core pages that the old filter let through: {non_core_survivors}"
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--pages", type=int, default=400)
+    _ = parser.add_argument("--front-matter", type=int, default=60)
+    _ = parser.add_argument("--back-matter", type=int, default=90)
+    _ = parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    run_benchmark(
+        number_of_pages=args.pages, core_pages=range(args.front_matter, args.pages - args.back_matter), repeats=args.repeats
+    )
@@ -0,0 +1,134 @@
+"""
+Contains a benchmark that compares the ways in which we can extract the text of scraped pages, using locally
+generated pages (laid out like the archive pages that we scrape) so that the network doesn't get in the way of the
+measurements. Some of the pages repeat a marker after the end of the extract, split by a tag or written as an
+entity, which must make bounded extraction parse the whole page. Every configuration must produce exactly the
+same text as the original one (a full parse with html.parser) to be considered.
+"""
+import os
+import time
+import random
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+
+from src.setup.paths import BENCHMARKS_DIR, HTML_FIXTURES
+from src.data_preparation.scraping import extract_text
+
+
+CONFIGURATIONS: dict[str, dict[str, str | bool]] = {
+    "html.parser (full)": {"backend": "html.parser", "bounded": False},
+    "html.parser (bounded)": {"backend": "html.parser", "bounded": True},
+    "lxml (full)": {"backend": "lxml", "bounded": False},
+    "lxml (bounded)": {"backend": "lxml", "bounded": True},
+}
+
+INITIAL_MARKER: str = "We stand for"
+TERMINAL_MARKER: str = "Transcription"
+
+WORDS: list[str] = [
+    "the", "people", "freedom", "history", "struggle", "nation", "labour", "land", "power", "unity", "colonial",
+    "independence", "capital", "movement", "workers", "state", "africa", "revolution", "economy", "peace"
+]
+
+# What follows the extract on some of the pages: the terminal marker again, in forms that only show up in the text
+REPEATED_MARKERS: dict[str, str] = {
+    "nowhere": "",
+    "split by a tag": "<p>Trans<i>cription</i> of the appendix</p>",
+    "written as an entity": "<p>&#84;ranscription of the appendix</p>",
+}
+
+
+def make_paragraph(generator: random.Random, footnote: int) -> str:
+    words: list[str] = generator.choices(WORDS, k=generator.randint(40, 120))
+    words[generator.randrange(len(words))] = "&nbsp;&#8212;"
+    words[generator.randrange(len(words))] = f'<a href="#n{footnote}" title="Note {footnote} &gt; see below">[{footnote}]</a>'
+    return f"<p class=\"fst\">{' '.join(words)}</p>\n"
+
+
+def make_page(number_of_paragraphs: int, repeated_marker: str, seed: int = 0) -> Path:
+    """
+    Generate (or reuse) a page whose extract lies between the markers, followed by footnotes, an index and a script,
+    as on the archive's pages.
+    """
+    for path in [BENCHMARKS_DIR, HTML_FIXTURES]:
+        if not path.exists():
+            os.mkdir(path)
+
+    page_path: Path = HTML_FIXTURES.joinpath(f"page_{number_of_paragraphs}_{repeated_marker.replace(' ', '_')}_{seed}.html")
+    if not page_path.exists():
+        generator = random.Random(seed)
+        body: list[str] = [
+            "<!DOCTYPE html>\n<html>\n<head><title>Speeches</title><style>p.fst { margin: 0 }</style></head>\n<body>\n",
+            "<p class=\"title\">Contents &middot; <a href=\"../index.htm\">Archive</a></p>\n",
+            f"<h3>{INITIAL_MARKER} the people</h3>\n",
+        ]
+        body.extend(make_paragraph(generator=generator, footnote=number) for number in range(number_of_paragraphs))
+        body.append(f"<hr /><p class=\"information\"><b>{TERMINAL_MARKER}:</b> the archive, 2024.</p>\n")
+        body.extend(make_paragraph(generator=generator, footnote=number) for number in range(number_of_paragraphs // 2))
+        body.append(REPEATED_MARKERS[repeated_marker])
+        body.append("<!-- analytics --><script>var pages = document.querySelectorAll('p');</script>\n</body>\n</html>\n")
+
+        _ = page_path.write_text("".join(body))
+        logger.info(f"Generated {page_path.name}")
+
+    return page_path
+
+
+def time_extraction(markup: str, repeats: int, backend: str, bounded: bool) -> tuple[str, float]:
+    """
+    Returns:
+        tuple[str, float]: the extracted text, and the quickest of the timed extractions (in seconds).
+    """
+    timings: list[float] = []
+    for _ in range(repeats):
+        start_time: float = time.perf_counter()
+        text: str = extract_text(
+            markup=markup,
+            url="https://example.com/speech",
+            initial_marker=INITIAL_MARKER,
+            terminal_marker=TERMINAL_MARKER,
+            backend=backend,
+            bounded=bounded
+        )
+        timings.append(time.perf_counter() - start_time)
+
+    return text, min(timings)
+
+
+def run_benchmark(number_of_paragraphs: int, repeats: int) -> dict[str, float]:
+    total_times: dict[str, float] = {name: 0 for name in CONFIGURATIONS.keys()}
+    mismatches: dict[str, list[str]] = {name: [] for name in CONFIGURATIONS.keys()}
+
+    for repeated_marker in REPEATED_MARKERS.keys():
+        markup: str = make_page(number_of_paragraphs=number_of_paragraphs, repeated_marker=repeated_marker).read_text()
+        baseline: str | None = None
+
+        for name, configuration in CONFIGURATIONS.items():
+            text, seconds = time_extraction(markup=markup, repeats=repeats, **configuration)
+            baseline = text if baseline == None else baseline
+            total_times[name] += seconds
+
+            if text != baseline:
+                mismatches[name].append(repeated_marker)
+
+            logger.info(f'Page with the marker repeated {repeated_marker} ({len(markup) / 1024**2:.1f} MB) | {name}: {seconds * 1000:.1f} ms')
+
+    for name, seconds in total_times.items():
+        speedup: float = total_times["html.parser (full)"] / seconds if seconds > 0 else 0
+        logger.success(f"{name}: {seconds:.3f}s in total ({speedup:.2f}x)")
+
+        if len(mismatches[name]) > 0:
+            logger.error(f"{name} extracted different text from the pages with the marker repeated: {', '.join(mismatches[name])}")
+
+    return total_times
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--paragraphs", type=int, default=2_000)
+    _ = parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    _ = run_benchmark(number_of_paragraphs=args.paragraphs, repeats=args.repeats)
@@ -0,0 +1,112 @@
+"""
+Contains a benchmark of the normalization engine on synthetic corpora of several megabytes, which are split into
+pages and have new line markers and the targets of an author's rules scattered through them. The pages are
+normalized with the chain of str.replace calls that the engine replaced (as the old Cleaner did it), and by the
+engine with one pass per rule and with a single pass for all of them. Extra (randomly generated) rules can be added
+to the author's own, to find the number of rules at which the single pass starts to pay off. Every approach must
+produce exactly the same text for the comparison to count.
+"""
+import time
+import random
+import itertools
+from argparse import ArgumentParser
+
+from loguru import logger
+
+from src.data_processing.normalization import Normalizer, load_rules
+
+
+WORDS: list[str] = [
+    "the", "of", "and", "people", "africa", "independence", "party", "colonial", "freedom", "struggle", "state",
+    "imperialism", "unity", "workers", "nation", "economic", "power", "government", "history", "revolution"
+]
+
+
+def make_extra_rules(number_of_rules: int, seed: int = 0) -> dict[str, str]:
+    generator = random.Random(seed)
+    rules: dict[str, str] = {}
+
+    while len(rules) < number_of_rules:
+        words: list[str] = ["".join(generator.choices("abcdefghijklmnopqrstuvwxyz", k=6)) for _ in range(2)]
+        rules[" ".join(words)] = "".join(words)
+
+    return rules
+
+
+def make_pages(size_in_megabytes: float, targets: list[str], page_size: int = 2_000, seed: int = 0) -> list[str]:
+    generator = random.Random(seed)
+    pages: list[str] = []
+    total_size: int = 0
+
+    while total_size < size_in_megabytes * 1_000_000:
+        tokens: list[str] = []
+        length: int = 0
+
+        while length < page_size:
+            roll: float = generator.random()
+            if roll < 0.02 and len(targets) > 0:
+                token: str = generator.choice(targets).replace(" ", generator.choice([" ", "\n"]))
+            else:
+                token: str = generator.choice(WORDS)
+
+            tokens.append(token + ("\n" if roll > 0.9 else " "))
+            length += len(token) + 1
+
+        page: str = "\n" + "".join(tokens)
+        pages.append(page)
+        total_size += len(page)
+
+    return pages
+
+
+def normalize_with_replace_chain(text: str, replacements: dict[str, str]) -> str:
+    text = text.replace("\n", " ").strip()
+    for target, replacement in replacements.items():
+        text = text.replace(target, replacement)
+
+    return text
+
+
+def run_benchmark(size_in_megabytes: float, author_name: str, number_of_extra_rules: int, repeats: int) -> None:
+    replacements: dict[str, str] = load_rules().get(author_name.lower(), {}) | make_extra_rules(number_of_rules=number_of_extra_rules)
+    pages: list[str] = make_pages(size_in_megabytes=size_in_megabytes, targets=list(replacements))
+    normalizers: dict[str, Normalizer] = {
+        "one pass per rule": Normalizer(replacements=replacements, single_pass=False),
+        "single pass": Normalizer(replacements=replacements, single_pass=True),
+    }
+
+    chain_times: list[float] = []
+    engine_times: dict[str, list[float]] = {name: [] for name in normalizers}
+
+    for _ in range(repeats):
+        start_time: float = time.perf_counter()
+        expected: list[str] = [normalize_with_replace_chain(text=page, replacements=replacements) for page in pages]
+        chain_times.append(time.perf_counter() - start_time)
+
+        for name, normalizer in normalizers.items():
+            start_time = time.perf_counter()
+            texts: list[str] = [normalizer.normalize(text=page) for page in pages]
+            engine_times[name].append(time.perf_counter() - start_time)
+            assert texts == expected, f"The engine ({name}) normalized the pages differently"
+
+    megabytes: float = sum(len(page) for page in pages) / 1_000_000
+    speeds: str = " | ".join(f"{name}: {megabytes / min(times):.0f} MB/s" for name, times in engine_times.items())
+    logger.success(
+        f"{megabytes:.1f} MB in {len(pages)} pages, {len(replacements)} rules | "
+        f"replace chain: {megabytes / min(chain_times):.0f} MB/s | {speeds} "
+        f"(the engine picks: {'single pass' if Normalizer(replacements=replacements).single_pass else 'one pass per rule'})"
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--megabytes", type=float, nargs="+", default=[4, 16])
+    _ = parser.add_argument("--author", type=str, default="Kwame Nkrumah")
+    _ = parser.add_argument("--extra-rules", type=int, nargs="+", default=[0, 50, 200, 800])
+    _ = parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for size_in_megabytes, number_of_extra_rules in itertools.product(args.megabytes, args.extra_rules):
+        run_benchmark(
+            size_in_megabytes=size_in_megabytes, author_name=args.author, number_of_extra_rules=number_of_extra_rules, repeats=args.repeats
+        )
@@ -0,0 +1,129 @@
+"""
+Contains a benchmark of OCR on locally generated "scanned" PDFs (pages of text that are only present as images,
+with a little noise and skew, like the scans that we OCR). The pages are OCR'd serially and then with pools of
+different sizes, and the text that each run produces must match that of the serial run to be considered. Pages
+are rasterized in windows as part of each run, so the time that rasterization takes is measured along with OCR.
+"""
+import os
+import json
+import time
+import random
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+from PIL import Image, ImageDraw, ImageFilter, ImageFont
+
+from src.setup.paths import BENCHMARKS_DIR, SCANNED_FIXTURES
+from src.data_preparation.ocr import ocr_pdf
+from src.data_preparation.checkpoints import OCRPage
+from src.data_preparation.preprocessing import PreprocessingConfig
+
+
+WORDS: list[str] = [
+    "the", "people", "freedom", "history", "struggle", "nation", "labour", "land", "power", "unity", "colonial",
+    "independence", "capital", "movement", "workers", "state", "africa", "revolution", "economy", "peace"
+]
+
+
+def make_page(generator: random.Random, dpi: int, lines: int = 40) -> tuple[Image.Image, list[str]]:
+    width, height = int(8.27 * dpi), int(11.69 * dpi)  # A4
+    page: Image.Image = Image.new(mode="L", size=(width, height), color=255)
+    draw = ImageDraw.Draw(page)
+    font = ImageFont.load_default(size=max(dpi // 8, 10))
+    line_height: int = (height - 2 * dpi) // lines
+    texts: list[str] = []
+
+    for line in range(lines):
+        text: str = " ".join(generator.choices(WORDS, k=generator.randint(6, 10)))
+        draw.text(xy=(dpi, dpi + line * line_height), text=text, fill=0, font=font)
+        texts.append(text)
+
+    noisy_page: Image.Image = page.rotate(angle=generator.uniform(-1, 1), fillcolor=255).filter(ImageFilter.GaussianBlur(0.6))
+    for _ in range(width * height // 2000):
+        noisy_page.putpixel(xy=(generator.randrange(width), generator.randrange(height)), value=generator.randint(0, 120))
+
+    return noisy_page, texts
+
+
+def make_scanned_pdf(number_of_pages: int, dpi: int = 200, seed: int = 0) -> Path:
+    """
+    Generate (or reuse) a PDF whose pages are images of text, with nothing in its text layer. The text of each
+    page is saved next to it (in a JSON file of the same name), to be compared with the output of OCR.
+    """
+    for path in [BENCHMARKS_DIR, SCANNED_FIXTURES]:
+        if not path.exists():
+            os.mkdir(path)
+
+    pdf_path: Path = SCANNED_FIXTURES.joinpath(f"scanned_{number_of_pages}_pages_{dpi}_dpi_{seed}.pdf")
+    if not (pdf_path.exists() and pdf_path.with_suffix(".json").exists()):
+        generator = random.Random(seed)
+        pages_and_texts: list[tuple[Image.Image, list[str]]] = [make_page(generator=generator, dpi=dpi) for _ in range(number_of_pages)]
+        pages: list[Image.Image] = [page for page, _ in pages_and_texts]
+
+        pages[0].save(pdf_path, format="PDF", resolution=dpi, save_all=True, append_images=pages[1:])
+        with open(pdf_path.with_suffix(".json"), mode="w") as file:
+            json.dump([texts for _, texts in pages_and_texts], file)
+
+        logger.info(f"Generated {pdf_path.name}")
+
+    return pdf_path
+
+
+def run_benchmark(
+    pdf_path: Path,
+    number_of_pages: int,
+    worker_counts: list[int],
+    tesseract_threads: int,
+    dpi: int,
+    window_size: int
+) -> dict[int, float]:
+    pages_per_second: dict[int, float] = {}
+    baseline: dict[int, bytes | str] | None = None
+
+    for workers in worker_counts:
+        pages: dict[int, OCRPage] = {}
+        start_time: float = time.perf_counter()
+        ocr_pdf(
+            pdf_path=pdf_path,
+            page_numbers=list(range(1, number_of_pages + 1)),
+            image_dir=None,
+            output_format=".txt",
+            language="eng",
+            preprocessing=PreprocessingConfig(dpi=dpi),
+            window_size=window_size,
+            workers=workers,
+            tesseract_threads=tesseract_threads,
+            record_pages=pages.update
+        )
+
+        pages_per_second[workers] = number_of_pages / (time.perf_counter() - start_time)
+        outputs: dict[int, bytes | str] = {page_number: page.output for page_number, page in pages.items()}
+        baseline = outputs if baseline == None else baseline
+
+        if outputs != baseline:
+            logger.error(f"OCR with {workers} workers produced different text from the serial run")
+
+        logger.success(f"{pdf_path.name} | {workers} workers: {pages_per_second[workers]:.2f} pages/s")
+
+    return pages_per_second
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--pages", type=int, default=40)
+    _ = parser.add_argument("--dpi", type=int, default=200)
+    _ = parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    _ = parser.add_argument("--tesseract-threads", type=int, default=1)
+    _ = parser.add_argument("--window-size", type=int, default=4)
+    args = parser.parse_args()
+
+    pdf_path: Path = make_scanned_pdf(number_of_pages=args.pages, dpi=args.dpi)
+    _ = run_benchmark(
+        pdf_path=pdf_path,
+        number_of_pages=args.pages,
+        worker_counts=sorted(set(args.workers)),
+        tesseract_threads=args.tesseract_threads,
+        dpi=args.dpi,
+        window_size=args.window_size
+    )
@@ -0,0 +1,69 @@
+"""
+Contains a benchmark of the extraction of text from PDFs across pools of processes of different sizes, on a
+collection of locally generated PDFs with a text layer (of different lengths, one of which is much longer than the
+rest, and some of which have core pages). The serial run reads each PDF in the main process, and the pages that every
+other run produces (their text and metadata, in order) must be identical to those of the serial run to be considered.
+"""
+import os
+import time
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from src.benchmarks.cleaning import make_text_pdf
+from src.data_processing.reading import read_pdfs
+
+
+def make_collection(number_of_pdfs: int, pages_per_pdf: int) -> list[tuple[Path, range | None]]:
+    pdfs: list[tuple[Path, range | None]] = [(make_text_pdf(number_of_pages=pages_per_pdf * 4, seed=0), None)]
+
+    for seed in range(1, number_of_pdfs):
+        core_pages: range | None = range(pages_per_pdf // 10, pages_per_pdf - pages_per_pdf // 10) if seed % 2 == 0 else None
+        pdfs.append((make_text_pdf(number_of_pages=pages_per_pdf, seed=seed), core_pages))
+
+    return pdfs
+
+
+def run_benchmark(pdfs: list[tuple[Path, range | None]], worker_counts: list[int], pages_per_task: int) -> dict[int, float]:
+    pages_per_second: dict[int, float] = {}
+    baseline: list[tuple[Path, list[Document]]] | None = None
+
+    for workers in worker_counts:
+        start_time: float = time.perf_counter()
+        outputs: list[tuple[Path, list[Document]]] = list(read_pdfs(pdfs=pdfs, workers=workers, pages_per_task=pages_per_task))
+        seconds_taken: float = time.perf_counter() - start_time
+
+        number_of_pages: int = sum(len(pages) for _, pages in outputs)
+        pages_per_second[workers] = number_of_pages / seconds_taken
+        baseline = outputs if baseline == None else baseline
+
+        if [path for path, _ in outputs] != [path for path, _ in pdfs]:
+            logger.error(f"The run with {workers} workers returned the PDFs in a different order")
+
+        if [(path, [(page.page_content, page.metadata) for page in pages]) for path, pages in outputs] != \
+                [(path, [(page.page_content, page.metadata) for page in pages]) for path, pages in baseline]:
+            logger.error(f"The run with {workers} workers produced different pages from the serial run")
+
+        logger.success(
+            f"{len(pdfs)} PDFs, {number_of_pages} pages | {workers} workers: {pages_per_second[workers]:.1f} pages/s "
+            f"({pages_per_second[workers] / pages_per_second[worker_counts[0]]:.1f}x)"
+        )
+
+    return pages_per_second
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--pdfs", type=int, default=6)
+    _ = parser.add_argument("--pages", type=int, default=150, help="The number of pages in each PDF but the first, which has four times as many")
+    _ = parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, os.cpu_count() or 1])
+    _ = parser.add_argument("--pages-per-task", type=int, default=16)
+    args = parser.parse_args()
+
+    _ = run_benchmark(
+        pdfs=make_collection(number_of_pdfs=args.pdfs, pages_per_pdf=args.pages),
+        worker_counts=sorted(set([1] + args.workers)),
+        pages_per_task=args.pages_per_task
+    )
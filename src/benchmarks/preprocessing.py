@@ -0,0 +1,131 @@
+"""
+Contains a benchmark of the settings that pages can be preprocessed with before OCR, on locally generated
+"scanned" PDFs whose text is known. For each setting, it reports how many pages are OCR'd per second, how many
+bytes the kept images of the pages take up, and the character error rate (CER) of the output against the text
+that the pages were generated from. The fastest setting whose CER is within the accuracy bar is picked out.
+"""
+import os
+import json
+import time
+import tempfile
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+
+from src.benchmarks.ocr import make_scanned_pdf
+from src.data_preparation.ocr import ocr_pdf
+from src.data_preparation.checkpoints import OCRPage
+from src.data_preparation.preprocessing import PreprocessingConfig
+
+
+SETTINGS: dict[str, PreprocessingConfig] = {
+    "colour, JPEG (the old default)": PreprocessingConfig(grayscale=False, storage_format="JPEG"),
+    "grayscale, not kept": PreprocessingConfig(),
+    "grayscale, PNG": PreprocessingConfig(storage_format="PNG"),
+    "binarized, PNG": PreprocessingConfig(binarize=True, storage_format="PNG"),
+    "deskewed, cropped and binarized, PNG": PreprocessingConfig(binarize=True, deskew=True, crop=True, storage_format="PNG"),
+    "150 DPI, binarized, PNG": PreprocessingConfig(dpi=150, binarize=True, storage_format="PNG"),
+    "300 DPI, binarized, PNG": PreprocessingConfig(dpi=300, binarize=True, storage_format="PNG"),
+}
+
+
+class SettingResult:
+    def __init__(self, name: str, pages_per_second: float, bytes_stored: int, character_error_rate: float) -> None:
+        self.name: str = name
+        self.pages_per_second: float = pages_per_second
+        self.bytes_stored: int = bytes_stored
+        self.character_error_rate: float = character_error_rate
+
+
+def compute_edit_distance(first: str, second: str) -> int:
+    previous_row: list[int] = list(range(len(second) + 1))
+
+    for i, first_character in enumerate(first, start=1):
+        current_row: list[int] = [i]
+        for j, second_character in enumerate(second, start=1):
+            current_row.append(
+                min(previous_row[j] + 1, current_row[j - 1] + 1, previous_row[j - 1] + (first_character != second_character))
+            )
+        previous_row = current_row
+
+    return previous_row[-1]
+
+
+def compute_character_error_rate(outputs: list[str], truths: list[str]) -> float:
+    """
+    Compare the output of OCR with the ground truth, page by page, ignoring differences in whitespace.
+    """
+    errors: int = 0
+    for output, truth in zip(outputs, truths, strict=True):
+        errors += compute_edit_distance(" ".join(output.split()), truth)
+
+    return errors / max(sum(len(truth) for truth in truths), 1)
+
+
+def run_setting(name: str, config: PreprocessingConfig, pdf_path: Path, truths: list[str], workers: int) -> SettingResult:
+    pages: dict[int, OCRPage] = {}
+    with tempfile.TemporaryDirectory() as image_dir:
+        start_time: float = time.perf_counter()
+        ocr_pdf(
+            pdf_path=pdf_path,
+            page_numbers=list(range(1, len(truths) + 1)),
+            image_dir=Path(image_dir) if config.storage_format != None else None,
+            output_format=".txt",
+            language="eng",
+            preprocessing=config,
+            window_size=4,
+            workers=workers,
+            tesseract_threads=1,
+            record_pages=pages.update
+        )
+
+        seconds_taken: float = time.perf_counter() - start_time
+        bytes_stored: int = sum(entry.stat().st_size for entry in os.scandir(image_dir))
+
+    texts: list[str] = [str(pages[page_number].output) for page_number in sorted(pages)]
+    return SettingResult(
+        name=name,
+        pages_per_second=len(truths) / seconds_taken,
+        bytes_stored=bytes_stored,
+        character_error_rate=compute_character_error_rate(outputs=texts, truths=truths)
+    )
+
+
+def run_benchmark(pdf_path: Path, workers: int, max_character_error_rate: float) -> list[SettingResult]:
+    with open(pdf_path.with_suffix(".json"), mode="r") as file:
+        truths: list[str] = [" ".join(lines) for lines in json.load(file)]
+
+    results: list[SettingResult] = []
+    for name, config in SETTINGS.items():
+        result: SettingResult = run_setting(name=name, config=config, pdf_path=pdf_path, truths=truths, workers=workers)
+        results.append(result)
+
+        logger.info(
+            f"{name}: {result.pages_per_second:.2f} pages/s | {result.bytes_stored / len(truths) / 1024:.0f} KiB stored per page "
+            f"| CER {result.character_error_rate:.2%}"
+        )
+
+    accurate_results: list[SettingResult] = [
+        result for result in results if result.character_error_rate <= max_character_error_rate
+    ]
+
+    if len(accurate_results) > 0:
+        fastest: SettingResult = max(accurate_results, key=lambda result: result.pages_per_second)
+        logger.success(f"The fastest setting with a CER of at most {max_character_error_rate:.2%} is: {fastest.name}")
+    else:
+        logger.warning(f"None of the settings had a CER of at most {max_character_error_rate:.2%}")
+
+    return results
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--pages", type=int, default=10)
+    _ = parser.add_argument("--dpi", type=int, default=200, help="The resolution that the scanned PDF is generated at")
+    _ = parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    _ = parser.add_argument("--max-cer", type=float, default=0.02)
+    args = parser.parse_args()
+
+    pdf_path: Path = make_scanned_pdf(number_of_pages=args.pages, dpi=args.dpi)
+    _ = run_benchmark(pdf_path=pdf_path, workers=args.workers, max_character_error_rate=args.max_cer)
@@ -0,0 +1,94 @@
+"""
+Contains a benchmark that classifies a large listing of synthetic file names with the rule engine (looking for
+each pattern in turn across the listing, and going through it once with the compiled matcher) and with the checks
+that it replaced (a substring test for every pair of file and biographer, followed by another scan for complete
+works). All of them must pick out exactly the same files for the comparison to count. The time that the pairwise
+checks and the search for each pattern take grows with the number of rules, while that of the compiled matcher
+stays roughly flat, and SINGLE_PASS_THRESHOLD is where the two searches cross over. The times of the rule engine
+include building the plan, which the pairwise checks don't do.
+"""
+import time
+import random
+import itertools
+from pathlib import Path
+from argparse import ArgumentParser
+
+from loguru import logger
+
+from src.data_preparation.sourcing import Author
+from src.data_preparation.rules import SHARED_RULES, SINGLE_PASS_THRESHOLD, FilePlan, FileRule, RuleSet, make_plan
+
+
+WORDS: list[str] = [
+    "history", "revolution", "letters", "speeches", "philosophy", "collected", "essays", "africa", "freedom", "state",
+    "capital", "labour", "notes", "volume", "selected", "writings", "diaries", "poems", "struggle", "science"
+]
+
+EXTENSIONS: list[str] = [".pdf", ".epub", ".mobi", ".txt"]
+
+
+def make_file_names(number_of_files: int, biographers: list[str], seed: int = 0) -> list[str]:
+    generator = random.Random(seed)
+    file_names: list[str] = []
+
+    for _ in range(number_of_files):
+        title: str = " ".join(generator.choices(WORDS, k=generator.randint(2, 6)))
+        roll: float = generator.random()
+
+        if roll < 0.05:
+            title = f"{title} complete works"
+        elif roll < 0.15:
+            title = f"{title} - {generator.choice(biographers)}"
+
+        file_names.append(title + generator.choice(EXTENSIONS))
+
+    return file_names
+
+
+def classify_pairwise(file_names: list[str], biographers: list[str]) -> set[str]:
+    to_delete: set[str] = set()
+    for file_name, biographer in itertools.product(file_names, biographers):
+        if biographer in file_name:
+            to_delete.add(file_name)
+
+    return to_delete | {file_name for file_name in file_names if "complete works" in file_name}
+
+
+def run_benchmark(number_of_files: int, number_of_biographers: int, repeats: int) -> None:
+    biographers: list[str] = [f"Biographer {number}" for number in range(number_of_biographers)]
+    author = Author(name="Synthetic Author", books_via_http=[], biographers_and_compilers=biographers)
+    file_names: list[str] = make_file_names(number_of_files=number_of_files, biographers=biographers)
+    file_paths: list[Path] = [Path(file_name) for file_name in file_names]
+
+    rules: list[FileRule] = RuleSet.for_author(author=author).rules
+    times: dict[str, list[float]] = {"pairwise": [], "each pattern": [], "compiled": []}
+
+    for _ in range(repeats):
+        start_time: float = time.perf_counter()
+        expected: set[str] = classify_pairwise(file_names=file_names, biographers=biographers)
+        times["pairwise"].append(time.perf_counter() - start_time)
+
+        for engine, single_pass in [("each pattern", False), ("compiled", True)]:
+            start_time = time.perf_counter()
+            plan: FilePlan = make_plan(file_paths=file_paths, rule_set=RuleSet(rules=rules, single_pass=single_pass))
+            times[engine].append(time.perf_counter() - start_time)
+
+            assert {file_path.name for file_path in plan.delete.keys()} == expected, f"The rule engine ({engine}) picked out different files"
+
+    default: str = "compiled" if number_of_biographers + len(SHARED_RULES) >= SINGLE_PASS_THRESHOLD else "each pattern"
+    logger.success(
+        f"{number_of_files} files, {number_of_biographers} biographers ({len(expected)} to delete) | "
+        + " | ".join(f"{engine}: {min(engine_times) * 1000:.1f} ms" for engine, engine_times in times.items())
+        + f" | default: {default}"
+    )
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--files", type=int, nargs="+", default=[10_000, 50_000])
+    _ = parser.add_argument("--biographers", type=int, nargs="+", default=[1, 5, 20, 50, 200])
+    _ = parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    for number_of_files, number_of_biographers in itertools.product(args.files, args.biographers):
+        run_benchmark(number_of_files=number_of_files, number_of_biographers=number_of_biographers, repeats=args.repeats)
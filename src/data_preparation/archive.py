@@ -1,109 +1,178 @@
-import json 
+"""
+Contains code that archives the details of every source we use, one record per book, in a SQLite store. Each
+author's records are upserted on their own, so archiving an author whose sources have changed only rewrites that
+author's rows, and the archive can be loaded by author or by type of source without reading all of it.
+"""
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
 from loguru import logger
 
-from src.setup.paths import ARCHIVE_DIR 
-from src.data_preparation.authors import prepare_sources
+from src.setup.types import ArchiveRecord
+from src.setup.paths import ARCHIVE_DB, DATA_DIR
+from src.data_preparation.authors import author_registry
 from src.data_preparation.sourcing import ViaHTTP, ViaTorrent, ViaScraper, Author
-from src.setup.types import HTTPArchive, TorrentArchive, ScrapedArchive, AuthorArchive 
+
+
+SOURCES: tuple[str, str, str] = ("http", "torrent", "scraper")
 
 
 class AuthorArchiver:
     def __init__(self, author: Author):
         self.author: Author = author
 
-    def archive_http_downloads(self, books: list[ViaHTTP] | None) -> HTTPArchive:
+    def archive_http_downloads(self, books: list[ViaHTTP] | None) -> dict[str, ArchiveRecord]:
         assert books != None
-        book_archive: HTTPArchive = {}
+        book_archive: dict[str, ArchiveRecord] = {}
         for book in books:
-            book_archive[self.author.name] =  []
-            book_details: dict[str, str | bool | int | None] = {
+            book_archive[book.url] = {
                 "title": book.title,
                 "url": book.url,
                 "format": book.format,
                 "needs_ocr": book.needs_ocr,
-                "start_page": book.start_page, 
-                "end_page": book.end_page, 
+                "start_page": book.start_page,
+                "end_page": book.end_page,
             }
 
-            book_archive[self.author.name].append(book_details)
-
         return book_archive
 
-    def archive_torrent_downloads(self, books: list[ViaTorrent] | None) -> TorrentArchive: 
+    def archive_torrent_downloads(self, books: list[ViaTorrent] | None) -> dict[str, ArchiveRecord]:
         assert books != None
-        torrent_archive: TorrentArchive = [] 
-        for batch in books:
-            torrent_archive.append({
-                f"magnet #{books.index(batch)}": batch.magnet,
+        torrent_archive: dict[str, ArchiveRecord] = {}
+        for number, batch in enumerate(books):
+            torrent_archive[batch.magnet] = {
+                f"magnet #{number}": batch.magnet,
                 "biographers_and_compilers": self.author.biographers_and_compilers
-            })
+            }
 
         return torrent_archive
 
-    def archive_scraped_details(self, books: list[ViaScraper] | None) -> ScrapedArchive: 
+    def archive_scraped_details(self, books: list[ViaScraper] | None) -> dict[str, ArchiveRecord]:
         assert books != None
-        archive: ScrapedArchive = {} 
+        archive: dict[str, ArchiveRecord] = {}
         for book in books:
-            archive[self.author.name] =  []
-            book_details: dict[str, str] = {"title": book.title, "url": book.url}
-            archive[self.author.name].append(book_details)
+            archive[book.url] = {"title": book.title, "url": book.url}
 
         return archive
 
-    def construct_archive(
-        self, 
-        books_from_http: list[ViaHTTP] | None, 
-        books_from_torrent: list[ViaTorrent] | None, 
-        books_from_scraper: list[ViaScraper] | None 
-        ) -> AuthorArchive:
-
-        match (books_from_http!= None, books_from_torrent != None, books_from_scraper != None):
-            case (True, True, True):
-                return (
-                        self.archive_http_downloads(books=books_from_http), 
-                        self.archive_torrent_downloads(books=books_from_torrent), 
-                        self.archive_scraped_details(books=books_from_scraper)
+    def construct_archive(self) -> dict[str, dict[str, ArchiveRecord]]:
+        """
+        Returns:
+            dict[str, dict[str, ArchiveRecord]]: the records of each type of source, keyed by the URL (or magnet
+                                                 link) of each book.
+        """
+        archive: dict[str, dict[str, ArchiveRecord]] = {}
+
+        if self.author.books_via_http != None:
+            archive["http"] = self.archive_http_downloads(books=self.author.books_via_http)
+        if self.author.books_via_torrent != None:
+            archive["torrent"] = self.archive_torrent_downloads(books=self.author.books_via_torrent)
+        if self.author.books_via_scraper != None:
+            archive["scraper"] = self.archive_scraped_details(books=self.author.books_via_scraper)
+
+        if len(archive) == 0:
+            logger.warning(f"No book metadata have been provided for {self.author.name} (regardless of source)")
+
+        return archive
+
+
+class ArchiveStore:
+    def __init__(self, database_path: Path = ARCHIVE_DB) -> None:
+        self.database_path: Path = database_path
+        self.connection: sqlite3.Connection | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection == None:
+            if not DATA_DIR.exists():
+                os.mkdir(DATA_DIR)
+
+            self.connection = sqlite3.connect(database=self.database_path, timeout=30, check_same_thread=False)
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS sources (
+                    author TEXT NOT NULL,
+                    source TEXT NOT NULL,
+                    key TEXT NOT NULL,
+                    position INTEGER NOT NULL,
+                    record TEXT NOT NULL,
+                    PRIMARY KEY (author, source, key)
+                )
+                """
+            )
+            _ = self.connection.execute("CREATE INDEX IF NOT EXISTS sources_by_type ON sources (source)")
+            self.connection.commit()
+
+        return self.connection
+
+    def upsert_author(self, author_name: str, archive: dict[str, dict[str, ArchiveRecord]]) -> int:
+        """
+        Bring the author's rows in line with their current sources, in a single transaction. Only the records
+        that have changed are written, and the records of books that are no longer among the sources are deleted.
+
+        Returns:
+            int: the number of rows that were written or deleted.
+        """
+        with self.lock, self.connect() as connection:
+            stored_rows: dict[tuple[str, str], tuple[int, str]] = {
+                (source, key): (position, record) for source, key, position, record in connection.execute(
+                    "SELECT source, key, position, record FROM sources WHERE author = ?", (author_name,)
                 )
+            }
 
-            case (True, False, False): 
-                return self.archive_http_downloads(books=books_from_http)
-            case (False, True, False):
-                return self.archive_torrent_downloads(books=books_from_torrent)
-            case(False, False, True):
-                return self.archive_scraped_details(books=books_from_scraper)
-            case(False, True, True):
-                return self.archive_http_downloads(books=books_from_http), self.archive_scraped_details(books=books_from_scraper)
-            case(True, False, True):
-                return self.archive_http_downloads(books=books_from_http), self.archive_scraped_details(books=books_from_scraper)
-            case (True, True, False): 
-                return self.archive_http_downloads(books=books_from_http), self.archive_torrent_downloads(books=books_from_torrent)
-            case (False, False, False):
-                logger.warning(f"No book metadata have been provided for {self.author.name} (regardless of source)")
-
-
-def make_final_archive(authors: list[Author]):
-    final_archive: list[AuthorArchive] = [] 
-    for author in authors:
-        books_from_http: list[ViaHTTP] | None = author.books_via_http 
-        books_from_torrent: list[ViaTorrent] | None = author.books_via_torrent
-        books_from_scraper: list[ViaScraper] | None = author.books_via_scraper
+            changed_rows: list[tuple[str, str, str, int, str]] = []
+            for source, records in archive.items():
+                assert source in SOURCES, f"The type of a source can only be one of {SOURCES}"
+                for position, (key, record) in enumerate(records.items()):
+                    serialised_record: str = json.dumps(record, sort_keys=True)
+                    if stored_rows.pop((source, key), None) != (position, serialised_record):
+                        changed_rows.append((author_name, source, key, position, serialised_record))
+
+            _ = connection.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?, ?, ?)", changed_rows)
+            _ = connection.executemany(
+                "DELETE FROM sources WHERE author = ? AND source = ? AND key = ?",
+                [(author_name, source, key) for source, key in stored_rows.keys()]  # Whatever is left is stale
+            )
+
+        return len(changed_rows) + len(stored_rows)
+
+    def load(self, author_name: str | None = None, source: str | None = None) -> list[ArchiveRecord]:
+        conditions: list[str] = []
+        parameters: list[str] = []
+
+        if author_name != None:
+            conditions.append("author = ?")
+            parameters.append(author_name)
+
+        if source != None:
+            conditions.append("source = ?")
+            parameters.append(source)
 
+        where_clause: str = f"WHERE {' AND '.join(conditions)}" if len(conditions) > 0 else ""
+        with self.lock:
+            rows: list[tuple[str, str, str]] = self.connect().execute(
+                f"SELECT author, source, record FROM sources {where_clause} ORDER BY author, source, position", parameters
+            ).fetchall()
+
+        return [{"author": author, "source": source, **json.loads(record)} for author, source, record in rows]
+
+
+def make_final_archive(authors: list[Author], store: ArchiveStore | None = None) -> None:
+    store = store if store != None else ArchiveStore()
+
+    for author in authors:
         archiver = AuthorArchiver(author=author)
-        author_archive: AuthorArchive = archiver.construct_archive(
-            books_from_http=books_from_http, 
-            books_from_torrent=books_from_torrent, 
-            books_from_scraper=books_from_scraper
-        ) 
+        rows_changed: int = store.upsert_author(author_name=author.name, archive=archiver.construct_archive())
 
-        final_archive.append(author_archive)
+        if rows_changed > 0:
+            logger.info(f"Updated {rows_changed} archived sources for {author.name}")
 
-    with open(ARCHIVE_DIR, mode="w") as file:
-        json.dump(final_archive, file)
-        
-    logger.success("Sources Archived") 
+    logger.success("Sources Archived")
 
 
 if __name__ == "__main__":
-    authors: list[Author] = prepare_sources()
+    authors: list[Author] = author_registry.all()
     make_final_archive(authors=authors)
-
@@ -1,5 +1,10 @@
-from loguru import logger
+import unicodedata
+from collections.abc import Callable
+
 from src.data_preparation.sourcing import ViaHTTP, Author, ViaScraper
+from src.data_preparation.downloading import DownloadScheduler
+from src.data_preparation.scraping_pipeline import ScrapingPipeline
+from src.data_preparation.torrenting import TorrentManager
 
 
 def prepare_sources():
@@ -464,8 +469,82 @@ def prepare_sources():
     ]
 
 
+class AuthorRegistry:
+    """
+    Builds the authors once per process, and indexes them by name and by nickname. The directories of an author 
+    are only created once that author is retrieved from the registry.
+    """
+    def __init__(self, factory: Callable[[], list[Author]] = prepare_sources) -> None:
+        self.factory: Callable[[], list[Author]] = factory
+        self.authors_by_name: dict[str, Author] = {}
+        self.authors_by_nickname: dict[str, list[Author]] = {}
+
+    def load(self) -> None:
+        if len(self.authors_by_name) > 0:
+            return
+
+        for author in self.factory():
+            self.authors_by_name[author.name] = author
+            for nickname in get_nicknames(name=author.name):
+                self.authors_by_nickname.setdefault(nickname, []).append(author)
+
+    def get(self, name: str) -> Author:
+        self.load()
+        if name not in self.authors_by_name:
+            raise Exception(f"There is no author called {name}")
+
+        author: Author = self.authors_by_name[name]
+        author.make_paths()
+        return author
+
+    def find(self, nickname: str) -> Author:
+        """
+        Look up an author by any part of their name (e.g. "marx" or "karl marx"), ignoring case and accents. 
+        Nicknames that aren't whole words of any name fall back to a search for authors whose names contain them.
+        """
+        self.load()
+        normalised_nickname: str = normalise_name(name=nickname)
+        matching_authors: list[Author] = self.authors_by_nickname.get(normalised_nickname, [])
+
+        if len(matching_authors) == 0:
+            matching_authors = [
+                author for name, author in self.authors_by_name.items() if normalised_nickname in normalise_name(name=name)
+            ]
+
+        if len(matching_authors) == 0:
+            raise Exception(f"The nickname {nickname} doesn't correspond to any existing author")
+        elif len(matching_authors) == 1:
+            return self.get(name=matching_authors[0].name)
+        else:
+            raise Exception(f"The nickname {nickname} correponds to {len(matching_authors)} authors. Pick a better nickname!")
+
+    def all(self) -> list[Author]:
+        self.load()
+        return [self.get(name=name) for name in self.authors_by_name.keys()]
+
+
+def normalise_name(name: str) -> str:
+    decomposed_name: str = unicodedata.normalize("NFKD", name.lower())
+    return "".join(character for character in decomposed_name if not unicodedata.combining(character))
+
+
+def get_nicknames(name: str) -> set[str]:
+    normalised_name: str = normalise_name(name=name)
+    words: list[str] = normalised_name.replace("(", " ").replace(")", " ").split()
+    return {normalised_name, *words}
+
+
+author_registry = AuthorRegistry()
+
+
 if __name__ == "__main__":
-    for author in prepare_sources():
-        author.download_books()               
-        logger.info("Next author...")
+    authors: list[Author] = author_registry.all()
+    scheduler = DownloadScheduler()
+    _ = scheduler.download_authors(authors=authors)
+
+    pipeline = ScrapingPipeline()
+    pipeline.scrape_authors(authors=authors)
+
+    manager = TorrentManager()
+    _ = manager.download_authors(authors=authors)
 
@@ -0,0 +1,61 @@
+"""
+Contains an index of each author's books, keyed by the exact name of the raw file that each book is saved under.
+It is built once per author (in each process), so that the details of the book behind a file (whether it was
+flagged as needing OCR, its core pages, where it came from, and its format) are looked up directly, instead of by
+scanning the author's lists of books for file names that contain the one in question.
+"""
+from pathlib import Path
+from functools import cache
+
+from src.data_preparation.sourcing import Author, ViaHTTP, ViaScraper
+
+
+class BookRecord:
+    def __init__(self, file_name: str, source: str, book: ViaHTTP | ViaScraper | None = None) -> None:
+        """
+        Args:
+            file_name: the name of the raw file.
+            source: where the file came from ("http", "scraper" or "torrent").
+            book: the book that the file was downloaded for. Files from torrents don't have one.
+        """
+        self.file_name: str = file_name
+        self.source: str = source
+        self.format: str = Path(file_name).suffix.lower()  # Raw files can have any extension, in either case
+        self.title: str = book.title if book != None else Path(file_name).stem
+        self.needs_ocr: bool = isinstance(book, ViaHTTP) and book.needs_ocr
+        self.start_page: int | None = book.start_page if isinstance(book, ViaHTTP) else None
+        self.end_page: int | None = book.end_page if isinstance(book, ViaHTTP) else None
+
+    @property
+    def core_pages(self) -> range | None:
+        """
+        Returns:
+            range | None: the (0-indexed) pages that make up the body of the book, or None if they weren't specified.
+        """
+        if (self.start_page != None) and (self.end_page != None):
+            return range(self.start_page, self.end_page)
+        elif (self.start_page == None) and (self.end_page == None):
+            return None
+        else:
+            raise Exception(f'"{self.file_name}" somehow has partial core page specifications.')
+
+
+class BookIndex:
+    def __init__(self, author: Author) -> None:
+        self.author: Author = author
+        self.records: dict[str, BookRecord] = {}
+
+        for book in author.books_via_http or []:
+            self.records[f"{book.file_name}.pdf"] = BookRecord(file_name=f"{book.file_name}.pdf", source="http", book=book)
+
+        for book in author.books_via_scraper or []:
+            self.records[book.file_name] = BookRecord(file_name=book.file_name, source="scraper", book=book)
+
+    def get(self, file_name: str) -> BookRecord:
+        record: BookRecord | None = self.records.get(file_name)
+        return record if record != None else BookRecord(file_name=file_name, source="torrent")  # Anything else came from a torrent
+
+
+@cache
+def get_book_index(author: Author) -> BookIndex:
+    return BookIndex(author=author)
@@ -0,0 +1,112 @@
+"""
+Contains an on-disk cache of what we know about each URL we fetch: the validators (ETag and Last-Modified) that
+the server sent along with it, and the size and checksum of the file we saved from it. This lets us send
+conditional requests, so that a source that hasn't changed costs us a 304 response instead of a full download.
+"""
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+
+import requests
+
+from src.setup.paths import HTTP_CACHE
+from src.setup.types import CacheEntry
+from src.data_preparation.utils import compute_file_hash
+
+
+class HTTPCache:
+    def __init__(self, cache_dir: Path = HTTP_CACHE) -> None:
+        self.cache_dir: Path = cache_dir
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_entry_path(self, url: str) -> Path:
+        return self.cache_dir.joinpath(hashlib.sha1(url.encode()).hexdigest() + ".json")
+
+    def read(self, url: str) -> CacheEntry | None:
+        entry_path: Path = self.get_entry_path(url=url)
+        if not entry_path.exists():
+            return None
+
+        with open(entry_path, mode="r") as file:
+            return json.load(file)
+
+    def update(self, url: str, **fields: str | int | None) -> None:
+        entry_path: Path = self.get_entry_path(url=url)
+        temporary_path: Path = entry_path.with_suffix(f".{threading.get_ident()}.tmp")
+
+        with self.lock:
+            if not self.cache_dir.exists():
+                os.mkdir(self.cache_dir)
+
+            entry: CacheEntry = self.read(url=url) or {"url": url}
+            entry.update(fields)
+
+            with open(temporary_path, mode="w") as file:
+                json.dump(entry, file)
+
+            os.replace(temporary_path, entry_path)
+
+    def has_validators(self, url: str) -> bool:
+        entry: CacheEntry | None = self.read(url=url)
+        return entry != None and (entry.get("etag") != None or entry.get("last_modified") != None)
+
+    def get_conditional_headers(self, url: str) -> dict[str, str]:
+        entry: CacheEntry | None = self.read(url=url)
+        headers: dict[str, str] = {}
+
+        if entry != None:
+            if isinstance(entry.get("etag"), str):
+                headers["If-None-Match"] = str(entry["etag"])
+            if isinstance(entry.get("last_modified"), str):
+                headers["If-Modified-Since"] = str(entry["last_modified"])
+
+        return headers
+
+    def get_partial_validator(self, url: str) -> str | None:
+        """
+        Return the validator that came with the response we were saving when a download was interrupted. Sent
+        as an If-Range header, it makes the server send the whole file (rather than the rest of it) if the file
+        has changed since then.
+        """
+        entry: CacheEntry | None = self.read(url=url)
+        if entry == None:
+            return None
+
+        validator: str | int | None = entry.get("partial_etag") or entry.get("partial_last_modified")
+        return validator if isinstance(validator, str) else None
+
+    def store_validators(self, url: str, response: requests.Response) -> None:
+        self.update(
+            url=url,
+            etag=response.headers.get("ETag"),
+            last_modified=response.headers.get("Last-Modified")
+        )
+
+    def store_partial_validators(self, url: str, response: requests.Response) -> None:
+        self.update(
+            url=url,
+            partial_etag=response.headers.get("ETag"),
+            partial_last_modified=response.headers.get("Last-Modified")
+        )
+
+    def complete_download(self, url: str, file_path: Path) -> None:
+        """
+        Record the size and checksum of a finished download, and adopt the validators of the response(s) that 
+        produced it, so that later runs can check whether the file has changed.
+        """
+        entry: CacheEntry = self.read(url=url) or {}
+        self.update(
+            url=url,
+            path=str(file_path),
+            size=file_path.stat().st_size,
+            sha256=compute_file_hash(file_path=file_path),
+            etag=entry.get("partial_etag"),
+            last_modified=entry.get("partial_last_modified"),
+            partial_etag=None,
+            partial_last_modified=None
+        )
+
+
+http_cache = HTTPCache()
@@ -0,0 +1,166 @@
+"""
+Contains a record (kept in SQLite) of the output of OCR for each page of a book: the page's text, or a PDF of the
+single page, and the confidence of OCR in it. Pages are recorded as soon as they have been OCR'd, so a run that is interrupted can be resumed by
+OCR'ing only the pages that are missing, and the final output can be rebuilt from the recorded pages. The pages of
+each book that were found to need OCR in the first place are recorded alongside them, as is the version of each
+book (and the settings) that each final output was built from, so that outputs that have gone stale are rebuilt.
+"""
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from src.setup.paths import DATA_DIR, OCR_PAGES_DB
+
+
+class OCRPage:
+    """
+    The output of OCR for a single page (its text, or a PDF of the page), along with Tesseract's mean confidence
+    in the words that it read on the page, when that is known.
+    """
+    def __init__(self, output: bytes | str, confidence: float | None = None) -> None:
+        self.output: bytes | str = output
+        self.confidence: float | None = confidence
+
+
+class OCRPageStore:
+    def __init__(self, database_path: Path = OCR_PAGES_DB) -> None:
+        self.database_path: Path = database_path
+        self.connection: sqlite3.Connection | None = None
+        self.connection_pid: int | None = None  # Each of the worker processes needs a connection of its own
+        self.lock: threading.Lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection == None or self.connection_pid != os.getpid():
+            if not DATA_DIR.exists():
+                os.mkdir(DATA_DIR)
+
+            self.connection = sqlite3.connect(database=self.database_path, timeout=30, check_same_thread=False)
+            self.connection_pid = os.getpid()
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ocr_pages (
+                    book_sha256 TEXT NOT NULL,
+                    page INTEGER NOT NULL,
+                    dpi INTEGER NOT NULL,
+                    preprocessing TEXT NOT NULL,
+                    language TEXT NOT NULL,
+                    output_format TEXT NOT NULL,
+                    output BLOB NOT NULL,
+                    confidence REAL,
+                    PRIMARY KEY (book_sha256, page, dpi, preprocessing, language, output_format)
+                )
+                """
+            )
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS ocr_outputs (
+                    output_path TEXT PRIMARY KEY,
+                    book_sha256 TEXT NOT NULL,
+                    settings TEXT NOT NULL
+                )
+                """
+            )
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS page_scans (
+                    book_sha256 TEXT NOT NULL,
+                    settings TEXT NOT NULL,
+                    pages_needing_ocr TEXT NOT NULL,
+                    PRIMARY KEY (book_sha256, settings)
+                )
+                """
+            )
+            self.connection.commit()
+
+        return self.connection
+
+    def get_page_numbers(self, book_sha256: str, dpi: int, preprocessing: str, language: str, output_format: str) -> set[int]:
+        """
+        Args:
+            book_sha256: the SHA-256 of the book's PDF, so that pages are never reused for a different version of it.
+            preprocessing: a description of the preprocessing that the images of the pages went through.
+
+        Returns:
+            set[int]: the (1-indexed) numbers of the pages that have been OCR'd with these settings, without reading
+                      their output.
+        """
+        with self.lock:
+            rows: list[tuple[int]] = self.connect().execute(
+                "SELECT page FROM ocr_pages WHERE book_sha256 = ? AND dpi = ? AND preprocessing = ? AND language = ? AND output_format = ?",
+                (book_sha256, dpi, preprocessing, language, output_format)
+            ).fetchall()
+
+        return {page for (page,) in rows}
+
+    def get_page(self, book_sha256: str, page: int, dpi: int, preprocessing: str, language: str, output_format: str) -> OCRPage | None:
+        """
+        Returns:
+            OCRPage | None: the recorded output of the page, if it has been OCR'd with these settings. Pages are read
+                            one at a time, since the output of each one can be a PDF with an image of the page in it.
+        """
+        with self.lock:
+            row: tuple[bytes | str, float | None] | None = self.connect().execute(
+                "SELECT output, confidence FROM ocr_pages WHERE book_sha256 = ? AND page = ? AND dpi = ? AND preprocessing = ? AND language = ? AND output_format = ?",
+                (book_sha256, page, dpi, preprocessing, language, output_format)
+            ).fetchone()
+
+        return OCRPage(output=row[0], confidence=row[1]) if row != None else None
+
+    def store_pages(
+        self,
+        book_sha256: str,
+        dpi: int,
+        preprocessing: str,
+        language: str,
+        output_format: str,
+        pages: dict[int, OCRPage]
+    ) -> None:
+        with self.lock, self.connect() as connection:
+            _ = connection.executemany(
+                "INSERT OR REPLACE INTO ocr_pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                [
+                    (book_sha256, number, dpi, preprocessing, language, output_format, page.output, page.confidence)
+                    for number, page in pages.items()
+                ]
+            )
+
+    def get_scan(self, book_sha256: str, settings: str) -> list[int] | None:
+        """
+        Return the pages of the book that a scan of its text layer (with the given settings) found to need OCR, if
+        the book has been scanned.
+        """
+        with self.lock:
+            row: tuple[str] | None = self.connect().execute(
+                "SELECT pages_needing_ocr FROM page_scans WHERE book_sha256 = ? AND settings = ?", (book_sha256, settings)
+            ).fetchone()
+
+        return json.loads(row[0]) if row != None else None
+
+    def store_scan(self, book_sha256: str, settings: str, pages_needing_ocr: list[int]) -> None:
+        with self.lock, self.connect() as connection:
+            _ = connection.execute(
+                "INSERT OR REPLACE INTO page_scans VALUES (?, ?, ?)", (book_sha256, settings, json.dumps(pages_needing_ocr))
+            )
+
+    def get_output(self, output_path: Path) -> tuple[str, str] | None:
+        """
+        Returns:
+            tuple[str, str] | None: the SHA-256 of the book that the final output of OCR at the given path was built
+                                    from, and a description of the settings that it was built with, if it was
+                                    recorded.
+        """
+        with self.lock:
+            row: tuple[str, str] | None = self.connect().execute(
+                "SELECT book_sha256, settings FROM ocr_outputs WHERE output_path = ?", (str(output_path),)
+            ).fetchone()
+
+        return row
+
+    def store_output(self, output_path: Path, book_sha256: str, settings: str) -> None:
+        with self.lock, self.connect() as connection:
+            _ = connection.execute("INSERT OR REPLACE INTO ocr_outputs VALUES (?, ?, ?)", (str(output_path), book_sha256, settings))
+
+
+ocr_pages = OCRPageStore()
@@ -0,0 +1,282 @@
+"""
+Contains code that finds the duplicates among an author's raw files, and decides which copy of each book to keep.
+Files are grouped in a single pass if they share a (normalised) title or identical contents. Texts that are near
+duplicates of each other (the same book in another format, or under a slightly different file name) are found by
+comparing MinHash signatures of their text, and only joined into a group if they are similar to all of its texts.
+The format preferences are then applied once to each group, without ever deleting the files that we download
+ourselves (over HTTP or by scraping), since the next download would only fetch them again.
+"""
+import re
+import heapq
+import hashlib
+import unicodedata
+from pathlib import Path
+
+from loguru import logger
+from pypdf import PdfReader
+
+from src.data_preparation.sourcing import Author
+from src.data_preparation.books import BookIndex, get_book_index
+from src.data_preparation.inventory import raw_file_inventory
+
+
+FORMAT_PREFERENCES: tuple[str, str, str] = (".pdf", ".epub", ".mobi")  # From most to least preferred
+PROTECTED_SOURCES: tuple[str, str] = ("http", "scraper")  # Deleting these would only have them downloaded again
+
+
+class RawFile:
+    def __init__(self, path: Path, sha256: str, source: str) -> None:
+        """
+        Args:
+            path: the path to the raw file.
+            sha256: the SHA-256 of the file's contents.
+            source: where the file came from ("http", "scraper" or "torrent"), according to the author's book index.
+        """
+        self.path: Path = path
+        self.name: str = path.name
+        self.sha256: str = sha256
+        self.source: str = source
+        self.extension: str = path.suffix.lower()
+        self.size: int = path.stat().st_size
+        self.title: str = normalise_title(file_name=self.name)
+
+
+class DuplicateGroup:
+    def __init__(self, files: list[RawFile], reasons: set[str]) -> None:
+        self.files: list[RawFile] = files
+        self.reasons: set[str] = reasons
+        self.keep: list[RawFile] = []
+        self.delete: list[RawFile] = []
+
+    def apply_format_preferences(self) -> None:
+        """
+        Keep the largest file in the most preferred format that the group has. Files that we download ourselves
+        (over HTTP or by scraping) and files in formats that we have no preference about are always kept. If one
+        of the files that we download is in a ranked format, it takes the place of the largest file, so that the
+        copies from torrents are the ones that get deleted.
+        """
+        protected_files: list[RawFile] = [
+            file for file in self.files if file.source in PROTECTED_SOURCES or file.extension not in FORMAT_PREFERENCES
+        ]
+
+        ranked_files: list[RawFile] = sorted(
+            [file for file in self.files if file not in protected_files],
+            key=lambda file: (FORMAT_PREFERENCES.index(file.extension), -file.size, file.name)
+        )
+
+        if any(file.extension in FORMAT_PREFERENCES for file in protected_files):
+            self.keep, self.delete = protected_files, ranked_files
+        else:
+            self.keep, self.delete = protected_files + ranked_files[:1], ranked_files[1:]
+
+    def describe(self) -> str:
+        kept: str = ", ".join(file.name for file in self.keep)
+        deleted: str = ", ".join(file.name for file in self.delete) or "nothing"
+        return f"Keeping {kept} | Deleting {deleted} | Grouped by {', '.join(sorted(self.reasons))}"
+
+
+class DuplicateFinder:
+    def __init__(
+        self,
+        author: Author,
+        signature_size: int = 256,
+        shingle_size: int = 5,
+        similarity_threshold: float = 0.7
+    ) -> None:
+
+        self.author: Author = author
+        self.signature_size: int = signature_size
+        self.shingle_size: int = shingle_size
+        self.similarity_threshold: float = similarity_threshold
+
+    def collect_files(self) -> list[RawFile]:
+        hashes: dict[str, str] = raw_file_inventory.get_hashes(author=self.author)
+        book_index: BookIndex = get_book_index(author=self.author)
+        return [
+            RawFile(path=path, sha256=hashes[path.name], source=book_index.get(file_name=path.name).source)
+            for path in raw_file_inventory.get_file_paths(author=self.author)
+        ]
+
+    def find_groups(self, files: list[RawFile], near_duplicates: bool = True) -> list[DuplicateGroup]:
+        """
+        Group the files that share a title or their contents, and then join groups whose texts are all similar to
+        each other. Similarity isn't transitive, so a text that is similar to only some of a group's texts is kept
+        out of it, rather than chaining dissimilar texts together through the ones in between.
+        """
+        parents: list[int] = list(range(len(files)))
+        members: dict[int, list[int]] = {index: [index] for index in range(len(files))}
+        reasons: dict[tuple[int, int], str] = {}
+
+        def find(index: int) -> int:
+            while parents[index] != index:
+                parents[index] = parents[parents[index]]
+                index = parents[index]
+            return index
+
+        def union(first: int, second: int, reason: str) -> None:
+            first_root, second_root = find(first), find(second)
+            if first_root != second_root:
+                parents[second_root] = first_root
+                members[first_root].extend(members.pop(second_root))
+                reasons[(first, second)] = reason
+
+        first_with_title: dict[str, int] = {}
+        first_with_hash: dict[str, int] = {}
+
+        for index, file in enumerate(files):
+            if file.sha256 in first_with_hash:
+                union(first_with_hash[file.sha256], index, reason="identical contents")
+            else:
+                first_with_hash[file.sha256] = index
+
+            if file.title in first_with_title:
+                union(first_with_title[file.title], index, reason="title")
+            else:
+                first_with_title[file.title] = index
+
+        if near_duplicates:
+            pairs: list[tuple[int, int, float]] = self.find_near_duplicates(files=files)
+            similar_contents: set[frozenset[str]] = {
+                frozenset([files[first].sha256, files[second].sha256]) for first, second, _ in pairs
+            }
+
+            def are_all_similar(first_indices: list[int], second_indices: list[int]) -> bool:
+                return all(
+                    files[first].sha256 == files[second].sha256
+                    or frozenset([files[first].sha256, files[second].sha256]) in similar_contents
+                    for first in first_indices for second in second_indices
+                )
+
+            for first, second, similarity in sorted(pairs, key=lambda pair: -pair[2]):  # The most similar pairs first
+                first_root, second_root = find(first), find(second)
+                if first_root != second_root and are_all_similar(members[first_root], members[second_root]):
+                    logger.info(f'"{files[first].name}" and "{files[second].name}" are {similarity:.0%} similar')
+                    union(first, second, reason="similar text")
+
+        groups: list[DuplicateGroup] = []
+        for indices in members.values():
+            if len(indices) > 1:
+                group_reasons: set[str] = {
+                    reason for (first, second), reason in reasons.items() if first in indices and second in indices
+                }
+                groups.append(DuplicateGroup(files=[files[index] for index in indices], reasons=group_reasons))
+
+        return groups
+
+    def find_near_duplicates(self, files: list[RawFile]) -> list[tuple[int, int, float]]:
+        """
+        Compare the signatures of every pair of texts whose contents differ. Files with identical contents share
+        a signature, so only one of them is compared with the others.
+        """
+        signatures: dict[str, list[int]] = {}
+        representatives: dict[str, int] = {}
+
+        for index, file in enumerate(files):
+            if file.sha256 not in signatures:
+                signatures[file.sha256] = self.get_signature(file=file)
+                representatives[file.sha256] = index
+
+        pairs: list[tuple[int, int, float]] = []
+        digests: list[str] = [digest for digest, signature in signatures.items() if len(signature) > 0]
+
+        for position, first_digest in enumerate(digests):
+            for second_digest in digests[position + 1:]:
+                similarity: float = estimate_similarity(
+                    first_signature=signatures[first_digest],
+                    second_signature=signatures[second_digest],
+                    signature_size=self.signature_size
+                )
+
+                if similarity >= self.similarity_threshold:
+                    pairs.append((representatives[first_digest], representatives[second_digest], similarity))
+
+        return pairs
+
+    def get_signature(self, file: RawFile) -> list[int]:
+        """
+        Return the bottom-k MinHash signature of the file's text: the smallest hashes of its word shingles.
+        Signatures are stored by content hash, so each distinct file is only read once.
+        """
+        signature: list[int] | None = raw_file_inventory.get_signature(sha256=file.sha256)
+        if signature == None:
+            words: list[str] = re.findall(r"\w+", normalise_text(text=read_text(file=file, author=self.author)))
+            shingles: set[str] = {
+                " ".join(words[start:start + self.shingle_size]) for start in range(len(words) - self.shingle_size + 1)
+            }
+
+            signature = sorted(heapq.nsmallest(self.signature_size, {hash_shingle(shingle) for shingle in shingles}))
+            raw_file_inventory.store_signature(sha256=file.sha256, signature=signature)
+
+        return signature
+
+    def plan(self, near_duplicates: bool = True) -> list[DuplicateGroup]:
+        groups: list[DuplicateGroup] = self.find_groups(files=self.collect_files(), near_duplicates=near_duplicates)
+        for group in groups:
+            group.apply_format_preferences()
+
+        return groups
+
+
+def report(author: Author, groups: list[DuplicateGroup]) -> None:
+    files_to_delete: int = sum(len(group.delete) for group in groups)
+    bytes_to_delete: int = sum(file.size for group in groups for file in group.delete)
+
+    for group in groups:
+        logger.info(f"{author.name} | {group.describe()}")
+
+    logger.success(
+        f"{author.name}: {len(groups)} groups of duplicates, {files_to_delete} files to delete "
+        f"({bytes_to_delete / 1024**2:.1f} MB)"
+    )
+
+
+def estimate_similarity(first_signature: list[int], second_signature: list[int], signature_size: int) -> float:
+    """
+    Estimate the Jaccard similarity of two texts from their bottom-k signatures: the share of the k smallest
+    hashes in the union of the two signatures that appear in both.
+    """
+    first_hashes, second_hashes = set(first_signature), set(second_signature)
+    smallest_of_union: list[int] = heapq.nsmallest(signature_size, first_hashes | second_hashes)
+    shared: int = len([value for value in smallest_of_union if value in first_hashes and value in second_hashes])
+    return shared / len(smallest_of_union) if len(smallest_of_union) > 0 else 0
+
+
+def hash_shingle(shingle: str) -> int:
+    return int.from_bytes(hashlib.blake2b(shingle.encode(), digest_size=8).digest(), byteorder="big")
+
+
+def normalise_text(text: str) -> str:
+    decomposed_text: str = unicodedata.normalize("NFKD", text.lower())
+    return "".join(character for character in decomposed_text if not unicodedata.combining(character))
+
+
+def normalise_title(file_name: str) -> str:
+    """
+    Reduce a file name to the title of the book: no extension, accents, punctuation, or the hash that is added
+    to the names of extracted files that would otherwise collide.
+    """
+    title: str = normalise_text(text=Path(file_name).stem)
+    title = re.sub(r"\s\([0-9a-f]{8}\)$", "", title)
+    return " ".join(re.findall(r"\w+", title))
+
+
+def read_text(file: RawFile, author: Author) -> str:
+    """
+    Returns:
+        str: the text of the file, which is empty if it can't be read (or has no text layer, like a scanned PDF).
+    """
+    from src.data_processing.reading import TextParser
+
+    try:
+        match file.extension:
+            case ".txt":
+                return file.path.read_text(errors="ignore")
+            case ".pdf":
+                return "\n".join(page.extract_text() or "" for page in PdfReader(file.path).pages)
+            case ".epub" | ".mobi":
+                return TextParser(author=author, extension=file.extension).parse(path=str(file.path))
+            case _:
+                return ""
+    except Exception as error:
+        logger.error(f"Unable to read the text of {file.name}. Error: {error}")
+        return ""
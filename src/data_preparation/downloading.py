@@ -0,0 +1,167 @@
+"""
+Contains code that downloads many books over HTTP at once, for one author or across all of them, while
+reusing a shared pool of keep-alive connections.
+"""
+import threading
+from pathlib import Path
+from time import perf_counter
+from itertools import zip_longest
+from urllib.parse import urlparse
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+
+import requests
+from tqdm import tqdm
+from loguru import logger
+from requests.adapters import HTTPAdapter
+
+from src.data_preparation.sourcing import Author, ViaHTTP
+from src.data_preparation.inventory import raw_file_inventory
+
+
+def make_session(max_hosts: int = 16, max_connections_per_host: int = 4) -> requests.Session:
+    """
+    Make a session whose connection pools are large enough for every worker to keep its own keep-alive
+    connection to a host, so that concurrent downloads don't queue up behind (or discard) pooled connections.
+
+    Args:
+        max_hosts: the number of hosts whose connection pools are kept around.
+        max_connections_per_host: the maximum number of connections to keep alive per host.
+
+    Returns:
+        requests.Session: the session to be shared by all the download workers.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=max_hosts, pool_maxsize=max_connections_per_host)
+    session.mount(prefix="http://", adapter=adapter)
+    session.mount(prefix="https://", adapter=adapter)
+    return session
+
+
+class DownloadJob:
+    def __init__(self, author_name: str, book: ViaHTTP, file_path: Path) -> None:
+        assert book.url != None
+        self.book: ViaHTTP = book
+        self.file_path: Path = file_path
+        self.author_name: str = author_name
+        self.host: str = urlparse(book.url).netloc
+
+
+class DownloadTotals:
+    def __init__(self) -> None:
+        self.downloaded: int = 0
+        self.skipped: int = 0
+        self.failed: list[str] = []
+        self.bytes_downloaded: int = 0
+        self.seconds_elapsed: float = 0
+
+    def record(self, job: DownloadJob, bytes_written: int | None) -> None:
+        match bytes_written:
+            case None:
+                self.failed.append(f'"{job.book.title}" by {job.author_name}')
+            case 0:
+                self.skipped += 1
+            case _:
+                self.downloaded += 1
+                self.bytes_downloaded += bytes_written
+
+    def log(self) -> None:
+        megabytes: float = self.bytes_downloaded / 1024**2
+        rate: float = megabytes / self.seconds_elapsed if self.seconds_elapsed > 0 else 0
+
+        logger.success(
+            f"Downloaded {self.downloaded} books ({megabytes:.1f} MB) in {self.seconds_elapsed:.1f}s at {rate:.2f} MB/s. "
+            f"Skipped {self.skipped} books that were already present."
+        )
+
+        if len(self.failed) > 0:
+            logger.error(f"Failed to download {len(self.failed)} books: {', '.join(self.failed)}")
+
+
+class DownloadScheduler:
+    def __init__(
+        self,
+        max_workers: int = 8,
+        max_workers_per_host: int = 4,
+        session: requests.Session | None = None
+    ) -> None:
+
+        self.max_workers: int = max_workers
+        self.max_workers_per_host: int = max_workers_per_host
+        self.session: requests.Session = session if session != None else make_session(
+            max_hosts=max_workers, 
+            max_connections_per_host=max_workers_per_host
+        )
+        self.host_limits: dict[str, threading.BoundedSemaphore] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_host_limit(self, host: str) -> threading.BoundedSemaphore:
+        with self.lock:
+            if host not in self.host_limits:
+                self.host_limits[host] = threading.BoundedSemaphore(value=self.max_workers_per_host)
+
+            return self.host_limits[host]
+
+    @staticmethod
+    def collect_jobs(authors: list[Author]) -> list[DownloadJob]:
+        jobs: list[DownloadJob] = []
+        for author in authors:
+            if author.books_via_http != None:
+                author.make_paths()
+                for book in author.books_via_http:
+                    if book.url == None:
+                        logger.warning(f'There is no URL for "{book.title}" by {author.name}')
+                        continue
+
+                    file_path: Path = author.path_to_raw_data.joinpath(f"{book.file_name}.pdf")
+                    jobs.append(DownloadJob(author_name=author.name, book=book, file_path=file_path))
+
+        return jobs
+
+    @staticmethod
+    def interleave_hosts(jobs: list[DownloadJob]) -> list[DownloadJob]:
+        """
+        Order the jobs so that consecutive ones go to different hosts where possible. Otherwise, the workers would
+        all pick up jobs for the same host and sit waiting on its limit while other hosts are left idle.
+        """
+        jobs_per_host: dict[str, list[DownloadJob]] = {}
+        for job in jobs:
+            jobs_per_host.setdefault(job.host, []).append(job)
+
+        return [job for batch in zip_longest(*jobs_per_host.values()) for job in batch if job != None]
+
+    def perform(self, job: DownloadJob) -> int | None:
+        with self.get_host_limit(host=job.host):
+            return job.book.download(file_path=str(job.file_path), session=self.session)
+
+    def run(self, jobs: list[DownloadJob]) -> DownloadTotals:
+        totals = DownloadTotals()
+        start_time: float = perf_counter()
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures: dict[Future[int | None], DownloadJob] = {
+                executor.submit(self.perform, job): job for job in self.interleave_hosts(jobs=jobs)
+            }
+
+            with tqdm(total=len(futures), desc="Downloading books...", unit="book") as progress_bar:
+                for future in as_completed(futures):
+                    job: DownloadJob = futures[future]
+                    try:
+                        bytes_written: int | None = future.result()
+                    except Exception as error:
+                        logger.error(f'Unable to download "{job.book.title}". Error: {error}')
+                        bytes_written = None
+
+                    totals.record(job=job, bytes_written=bytes_written)
+                    if bytes_written != None and bytes_written > 0:
+                        raw_file_inventory.record(author_name=job.author_name, file_path=job.file_path, origin="http")
+
+                    _ = progress_bar.update(1)
+                    progress_bar.set_postfix(MB=f"{totals.bytes_downloaded / 1024**2:.1f}", failed=len(totals.failed))
+
+        totals.seconds_elapsed = perf_counter() - start_time
+        totals.log()
+        return totals
+
+    def download_authors(self, authors: list[Author]) -> DownloadTotals:
+        return self.run(jobs=self.collect_jobs(authors=authors))
+
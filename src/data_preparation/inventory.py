@@ -0,0 +1,193 @@
+"""
+Contains a persistent inventory of the raw files of every author, kept in SQLite. Each author's raw directory is
+scanned (once per process, in a single pass) to bring the inventory up to date, and only files whose size or
+modification time have changed are hashed again. Everything else that needs to know which raw files we have
+queries the inventory instead of listing the directory again.
+"""
+import os
+import json
+import sqlite3
+import threading
+from pathlib import Path
+
+from src.setup.paths import DATA_DIR, INVENTORY_DB
+from src.data_preparation.sourcing import Author
+from src.data_preparation.books import get_book_index
+from src.data_preparation.utils import compute_file_hash
+
+
+ORIGINS: tuple[str, str, str] = ("http", "torrent", "scraper")
+
+
+class RawFileInventory:
+    def __init__(self, database_path: Path = INVENTORY_DB) -> None:
+        self.database_path: Path = database_path
+        self.connection: sqlite3.Connection | None = None
+        self.connection_pid: int | None = None  # Connections can't be shared with forked processes 
+        self.refreshed_authors: set[str] = set()
+        self.lock: threading.RLock = threading.RLock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection == None or self.connection_pid != os.getpid():
+            if not DATA_DIR.exists():
+                os.mkdir(DATA_DIR)
+
+            self.connection = sqlite3.connect(database=self.database_path, timeout=30, check_same_thread=False)
+            self.connection_pid = os.getpid()
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS raw_files (
+                    path TEXT PRIMARY KEY,
+                    author TEXT NOT NULL,
+                    name TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    mtime_ns INTEGER NOT NULL,
+                    sha256 TEXT NOT NULL,
+                    origin TEXT
+                )
+                """
+            )
+            _ = self.connection.execute("CREATE INDEX IF NOT EXISTS raw_files_by_author ON raw_files (author, name)")
+            _ = self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS text_signatures (sha256 TEXT PRIMARY KEY, signature TEXT NOT NULL)"
+            )
+            self.connection.commit()
+
+        return self.connection
+
+    def refresh(self, author: Author, force: bool = False) -> None:
+        """
+        Bring the author's part of the inventory up to date with a single pass over their raw directory. Unless
+        forced to, this only happens the first time the author's files are asked for in this process. After that,
+        the inventory is kept up to date by the code that adds and removes raw files.
+        """
+        with self.lock:
+            if author.name in self.refreshed_authors and not force:
+                return
+
+            author.make_paths()
+            connection: sqlite3.Connection = self.connect()
+            known_files: dict[str, tuple[int, int]] = {
+                path: (size, mtime_ns) for path, size, mtime_ns in connection.execute(
+                    "SELECT path, size, mtime_ns FROM raw_files WHERE author = ?", (author.name,)
+                )
+            }
+
+            present_paths: set[str] = set()
+            with os.scandir(author.path_to_raw_data) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+
+                    stats: os.stat_result = entry.stat()
+                    present_paths.add(entry.path)
+
+                    if known_files.get(entry.path) != (stats.st_size, stats.st_mtime_ns):
+                        self.upsert(
+                            author_name=author.name,
+                            file_path=Path(entry.path),
+                            stats=stats,
+                            origin=None if entry.path in known_files else infer_origin(author=author, file_name=entry.name)
+                        )
+
+            missing_paths: list[tuple[str]] = [(path,) for path in known_files.keys() if path not in present_paths]
+            _ = connection.executemany("DELETE FROM raw_files WHERE path = ?", missing_paths)
+            connection.commit()
+            self.refreshed_authors.add(author.name)
+
+    def upsert(self, author_name: str, file_path: Path, stats: os.stat_result, origin: str | None) -> None:
+        """
+        Add the file to the inventory (or update its entry). The origin of a file that is already known is only
+        replaced if a new one is given.
+        """
+        _ = self.connect().execute(
+            """
+            INSERT INTO raw_files (path, author, name, size, mtime_ns, sha256, origin) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (path) DO UPDATE SET
+                size = excluded.size,
+                mtime_ns = excluded.mtime_ns,
+                sha256 = excluded.sha256,
+                origin = COALESCE(excluded.origin, raw_files.origin)
+            """,
+            (str(file_path), author_name, file_path.name, stats.st_size, stats.st_mtime_ns, compute_file_hash(file_path), origin)
+        )
+
+    def record(self, author_name: str, file_path: Path, origin: str) -> None:
+        assert origin in ORIGINS, f"The origin of a file can only be one of {ORIGINS}"
+        with self.lock:
+            self.upsert(author_name=author_name, file_path=file_path, stats=file_path.stat(), origin=origin)
+            self.connect().commit()
+
+    def remove(self, file_path: Path) -> None:
+        self.remove_many(file_paths=[file_path])
+
+    def remove_many(self, file_paths: list[Path]) -> None:
+        with self.lock:
+            _ = self.connect().executemany("DELETE FROM raw_files WHERE path = ?", [(str(path),) for path in file_paths])
+            self.connect().commit()
+
+    def query(self, author: Author, column: str, extension: str | None = None, origin: str | None = None) -> list[str]:
+        assert column in ["path", "name", "sha256"]
+        self.refresh(author=author)
+
+        conditions: str = "author = ?"
+        parameters: list[str] = [author.name]
+
+        if extension != None:
+            conditions += " AND name GLOB ?"
+            parameters.append(f"*{extension}")
+
+        if origin != None:
+            conditions += " AND origin = ?"
+            parameters.append(origin)
+
+        with self.lock:
+            rows: list[tuple[str]] = self.connect().execute(
+                f"SELECT {column} FROM raw_files WHERE {conditions} ORDER BY name", parameters
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def get_file_paths(self, author: Author, extension: str | None = None, origin: str | None = None) -> list[Path]:
+        return [Path(path) for path in self.query(author=author, column="path", extension=extension, origin=origin)]
+
+    def get_file_names(self, author: Author, extension: str | None = None, origin: str | None = None) -> list[str]:
+        return self.query(author=author, column="name", extension=extension, origin=origin)
+
+    def get_hashes(self, author: Author) -> dict[str, str]:
+        self.refresh(author=author)
+        with self.lock:
+            rows: list[tuple[str, str]] = self.connect().execute(
+                "SELECT name, sha256 FROM raw_files WHERE author = ?", (author.name,)
+            ).fetchall()
+
+        return dict(rows)
+
+    def get_signature(self, sha256: str) -> list[int] | None:
+        """
+        Return the MinHash signature of the text of the file with the given contents, if one has been computed.
+        """
+        with self.lock:
+            row: tuple[str] | None = self.connect().execute(
+                "SELECT signature FROM text_signatures WHERE sha256 = ?", (sha256,)
+            ).fetchone()
+
+        return json.loads(row[0]) if row != None else None
+
+    def store_signature(self, sha256: str, signature: list[int]) -> None:
+        with self.lock:
+            _ = self.connect().execute(
+                "INSERT OR REPLACE INTO text_signatures (sha256, signature) VALUES (?, ?)", (sha256, json.dumps(signature))
+            )
+            self.connect().commit()
+
+
+def infer_origin(author: Author, file_name: str) -> str:
+    """
+    Work out where a file that we didn't see arrive came from, using the file names that the author's HTTP and
+    scraped books are saved under. Anything else can only have come from a torrent.
+    """
+    return get_book_index(author=author).get(file_name=file_name).source
+
+
+raw_file_inventory = RawFileInventory()
@@ -1,113 +1,80 @@
 import os
-import itertools
 from pathlib import Path
+from argparse import ArgumentParser
 
 from loguru import logger
 
 from src.data_preparation.sourcing import Author
-from src.data_preparation.authors import prepare_sources
-from src.data_preparation.utils import get_file_extension, get_file_name_without_extension
+from src.data_preparation.authors import author_registry
+from src.data_preparation.inventory import raw_file_inventory
+from src.data_preparation.rules import FilePlan, RuleSet, make_plan
+from src.data_preparation.deduplication import DuplicateFinder, DuplicateGroup, RawFile, report
 
 
 class VersionManager:
     def __init__(self, author: Author) -> None:
         self.author: Author = author
-        self.extensions: list[str] = [".pdf", ".epub", ".mobi"]
-
-        self.file_names: list[str] = [
-            item for item in os.listdir(self.author.path_to_raw_data) if 
-                Path.joinpath(self.author.path_to_raw_data, item).is_file()
-        ]        
-
-    def __get_file_path__(self, truncated_name: str, format: str) -> Path:
-        return Path.joinpath(self.author.path_to_raw_data, truncated_name + format)
-
-    def collect_file_names_and_extensions(self) -> dict[str, str]:
-        file_names_and_extensions: dict[str, str] = {} 
-        for file_name in self.file_names:
-            file_names_and_extensions[file_name] = get_file_extension(file_name_or_path=file_name) 
-
-        return file_names_and_extensions 
-        
-    def check_version_of_file_exists(self, truncated_name: str, format: str) -> bool: 
-        file_path = self.__get_file_path__(truncated_name=truncated_name, format=format) 
-        return file_path.exists()
-
-    def delete_version(self, truncated_name: str, format: str) -> None:
-        file_path = self.__get_file_path__(truncated_name=truncated_name, format=format) 
-        os.remove(file_path) 
-
-    def delete_by_preference(self, file_names_without_extensions: list[str], format_to_keep: str = "pdf") -> None:
-
-        deprioritised_extensions: list[str] = [extension for extension in self.extensions if extension != format_to_keep] 
-        for truncated_name in file_names_without_extensions:
-            pdf_exists: bool = self.check_version_of_file_exists(truncated_name=truncated_name, format=".pdf")
-            epub_exists: bool = self.check_version_of_file_exists(truncated_name=truncated_name, format=".epub")
-            mobi_exists: bool = self.check_version_of_file_exists(truncated_name=truncated_name, format=".mobi")
-
-            if pdf_exists:
-                for extension in deprioritised_extensions:
-                    try:
-                        self.delete_version(truncated_name=truncated_name, format=extension) 
-                    except Exception as error:
-                        logger.error(error)
-
-            elif epub_exists and mobi_exists:
-                self.delete_version(truncated_name=truncated_name, format=".mobi") 
-            elif epub_exists and not mobi_exists:
-                logger.success(f"Only the epub version of {truncated_name} exists.")
-            elif not epub_exists and mobi_exists:
-                logger.success(f"Only the mobi version of {truncated_name} exists.")
-            else:
-                logger.warning(f"Somehow there is no version of {truncated_name} in any format")
-
-    def remove_complete_works(self) -> None:
-        texts_that_are_complete_works: list[str] = [file for file in self.file_names if "complete works" in file] 
-        text_paths: list[Path] = [self.author.path_to_raw_data.joinpath(text) for text in texts_that_are_complete_works]
-        for path in text_paths:
-            os.remove(path)
-
-    def eliminate_duplicates(self):
-
-        file_names_and_extensions: dict[str, str] = self.collect_file_names_and_extensions()
-
-        file_names_without_extensions: list[str] = [
-            get_file_name_without_extension(name) for name in file_names_and_extensions.keys()
-        ]
-
-        for name in file_names_and_extensions.keys(): 
-            truncated_name: str = get_file_name_without_extension(name)
-            count: int = file_names_without_extensions.count(truncated_name)
-            if count == 1:
-                logger.success(f'There is no duplicate of "{truncated_name}"')
-            else:
-                logger.success(f'There are {count} copies of "{truncated_name}"')
-                self.delete_by_preference(file_names_without_extensions=file_names_without_extensions)
-
-    def remove_biographical_works(self) -> None:
-        
-        biographers_and_compilers: list[str] | None = self.author.biographers_and_compilers
-        
-        if biographers_and_compilers != None:
-            logger.warning(f"Checking for/removing texts by the biographers of {self.author.name}")
-            for file_name, biographer in itertools.product(self.file_names, biographers_and_compilers):
-                if biographer in file_name:
-                    truncated_name: str = get_file_name_without_extension(file_name_or_path=file_name)
-                    file_extension: str = get_file_extension(file_name_or_path=file_name)
-                    file_path: Path = self.__get_file_path__(truncated_name=truncated_name, format=file_extension)
-
-                    if file_path.exists():
-                        os.remove(file_path)
-        else:
-            logger.success(f"There are no biographers/compilers for any of the saved texts by {author.name}")
+        self.file_names: list[str] = raw_file_inventory.get_file_names(author=self.author)
+
+    def make_plan(self, near_duplicates: bool = True) -> FilePlan:
+        """
+        Classify all of the author's files in a single pass with the author's rules (which pick out biographical
+        works and complete works), and then find the duplicates among the files that the rules keep.
+
+        Args:
+            near_duplicates: whether to also group texts that are similar (rather than identical) to each other.
+
+        Returns:
+            FilePlan: the files to keep, and the files to delete (with the reason for deleting each one).
+        """
+        finder = DuplicateFinder(author=self.author)
+        files: list[RawFile] = finder.collect_files()
+        plan: FilePlan = make_plan(file_paths=[file.path for file in files], rule_set=RuleSet.for_author(author=self.author))
+
+        kept_paths: set[Path] = set(plan.keep)
+        groups: list[DuplicateGroup] = finder.find_groups(
+            files=[file for file in files if file.path in kept_paths], 
+            near_duplicates=near_duplicates
+        )
+
+        for group in groups:
+            group.apply_format_preferences()
+            for file in group.delete:
+                plan.add(file_path=file.path, reason=f"duplicate of {', '.join(kept.name for kept in group.keep)}")
+
+        plan.keep = [file_path for file_path in plan.keep if file_path not in plan.delete]
+        report(author=self.author, groups=groups)
+        return plan
+
+    def apply_plan(self, plan: FilePlan) -> None:
+        for file_path in plan.delete.keys():
+            os.remove(file_path)
+
+        raw_file_inventory.remove_many(file_paths=list(plan.delete.keys()))
+        deleted_names: set[str] = {file_path.name for file_path in plan.delete.keys()}
+        self.file_names = [file_name for file_name in self.file_names if file_name not in deleted_names]
+
+    def curate(self, dry_run: bool = False, near_duplicates: bool = True) -> FilePlan:
+        """
+        Decide which of the author's files to keep, and (unless this is a dry run) delete the rest in one batch.
+        """
+        plan: FilePlan = self.make_plan(near_duplicates=near_duplicates)
+        plan.report(author=self.author)
+
+        if not dry_run:
+            self.apply_plan(plan=plan)
+
+        return plan
 
 
 if __name__ == "__main__":
-    for author in prepare_sources():
+    parser = ArgumentParser()
+    _ = parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    for author in author_registry.all():
         manager = VersionManager(author=author)
         if manager.author.books_via_torrent != None:
             logger.success(f"Determining the final batch of texts to use for {author.name}")
-            manager.eliminate_duplicates()
-            manager.remove_biographical_works()
-            manager.remove_complete_works()
+            _ = manager.curate(dry_run=args.dry_run)
 
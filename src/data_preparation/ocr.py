@@ -1,112 +1,467 @@
 import os
+import json
+import time
 from io import BytesIO
 from pathlib import Path
+from collections.abc import Callable, Iterator
+from argparse import ArgumentParser
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
 
 import pdf2image
 from tqdm import tqdm
 from loguru import logger
 from PIL.Image import Image
-from pypdf import PdfWriter
+from pypdf import PdfReader, PdfWriter
 from pytesseract import pytesseract 
 
-from src.data_preparation.authors import prepare_sources
-from src.data_preparation.sourcing import Author, ViaHTTP
-from src.data_preparation.utils import get_file_extension
-from src.setup.paths import OCR_IMAGES, PDFS_AFTER_OCR, TXT_AFTER_OCR, make_fundamental_paths 
+from src.data_preparation.authors import author_registry
+from src.data_preparation.sourcing import Author
+from src.data_preparation.books import BookIndex, BookRecord, get_book_index
+from src.data_preparation.utils import compute_file_hash
+from src.data_preparation.inventory import raw_file_inventory
+from src.data_preparation.checkpoints import OCRPage, ocr_pages
+from src.data_preparation.text_layer import TextLayerScanner
+from src.data_preparation.preprocessing import PreprocessingConfig, preprocess_page
+from src.setup.paths import OCR_IMAGES, PAGES_AFTER_OCR, PDFS_AFTER_OCR, TXT_AFTER_OCR, make_fundamental_paths 
 
 
 class OCRModule:
-    def __init__(self, author: Author, keep_images: bool = True, image_format: str = "JPEG", output_format: str = ".pdf") -> None:
+    def __init__(
+        self, 
+        author: Author, 
+        output_format: str = ".pdf",
+        language: str = "eng",
+        workers: int | None = None,
+        tesseract_threads: int = 1,
+        window_size: int = 4,
+        preprocessing: PreprocessingConfig | None = None,
+        scanner: TextLayerScanner | None = None
+    ) -> None:
+
         self.author: Author = author 
-        self.keep_images: bool = keep_images
-        self.image_format: str = image_format
+        self.language: str = language
+        self.workers: int = workers if workers != None else (os.cpu_count() or 1)
+        self.tesseract_threads: int = tesseract_threads
+        self.window_size: int = window_size  # The number of pages that are rasterized at a time
+        self.scanner: TextLayerScanner = scanner or TextLayerScanner()
+        self.book_index: BookIndex = get_book_index(author=author)
+        self.preprocessing: PreprocessingConfig = preprocessing or PreprocessingConfig()
         self.output_format: str = output_format
         self.path_to_ocr_images: Path = OCR_IMAGES.joinpath(author.name) 
         self.path_to_text_after_ocr: Path = PDFS_AFTER_OCR.joinpath(author.name) if output_format == ".pdf" else TXT_AFTER_OCR.joinpath(author.name)
+        self.path_to_pages_after_ocr: Path = PAGES_AFTER_OCR.joinpath(author.name)
 
         make_fundamental_paths()
         self.create_ocr_paths_for_author()
         assert self.output_format in [".txt", ".pdf"], "Texts that have undergone OCR can only be output as .text and PDF files" 
 
     def create_ocr_paths_for_author(self):
-        for path in [self.path_to_ocr_images, self.path_to_text_after_ocr]:
+        for path in [self.path_to_ocr_images, self.path_to_text_after_ocr, self.path_to_pages_after_ocr]:
             if not Path(path).exists():
                 os.mkdir(path)
 
-    def get_path_to_images_from_book(self, book: ViaHTTP) -> Path :
-        path_to_ocr_images_of_book: Path = self.path_to_ocr_images.joinpath(book.file_name)
+    def get_path_to_images_from_book(self, file_path: Path) -> Path :
+        path_to_ocr_images_of_book: Path = self.path_to_ocr_images.joinpath(file_path.stem)
         if not path_to_ocr_images_of_book.exists():
             os.mkdir(path_to_ocr_images_of_book)
 
         return path_to_ocr_images_of_book 
 
-    def is_book_already_processed(self, book: ViaHTTP) -> bool:
-        if self.path_to_text_after_ocr.joinpath(f"{book.file_name}" + self.output_format).exists():
-            logger.success(f'"{book.title}" by {self.author.name} has already been processed.')
+    def get_output_path(self, file_path: Path) -> Path:
+        return self.path_to_text_after_ocr.joinpath(file_path.stem + self.output_format)
+
+    def get_pages_path(self, file_path: Path) -> Path:
+        return self.path_to_pages_after_ocr.joinpath(file_path.stem + ".jsonl")
+
+    def get_book(self, file_path: Path) -> BookRecord:
+        return self.book_index.get(file_name=file_path.name)
+
+    def get_pages_needing_ocr(self, file_path: Path, page_numbers: range | None = None) -> list[int]:
+        """
+        Find the core pages of the PDF that need OCR. Books that have been flagged as needing OCR have all of their
+        core pages OCR'd, whatever their text layer looks like. For every other PDF, this is decided for each page
+        by a scan of its text layer.
+        """
+        book: BookRecord = self.get_book(file_path=file_path)
+        if page_numbers == None:
+            page_numbers = self.get_page_numbers(file_path=file_path)
+
+        if book.needs_ocr:
+            return list(page_numbers)
+        else:
+            book_sha256: str = self.get_book_hash(file_path=file_path)
+            return [page_number for page_number in self.scanner.scan(pdf_path=file_path, book_sha256=book_sha256) if page_number in page_numbers]
+
+    def get_page_numbers(self, file_path: Path) -> range:
+        """
+        Returns:
+            range: the (1-indexed) numbers of the pages of the PDF that OCR covers.
+        """
+        return get_core_page_numbers(book=self.get_book(file_path=file_path), page_count=len(PdfReader(file_path).pages))
+
+    def get_book_hash(self, file_path: Path) -> str:
+        return raw_file_inventory.get_hashes(author=self.author).get(file_path.name) or compute_file_hash(file_path)
+
+    def requires_ocr(self, file_path: Path) -> bool:
+        return self.get_book(file_path=file_path).format == ".pdf" and len(self.get_pages_needing_ocr(file_path=file_path)) > 0
+
+    def describe_settings(self, page_numbers: range) -> str:
+        """
+        Describe the settings that the final output of OCR is built with, including the pages that it covers.
+        """
+        return f"dpi={self.preprocessing.dpi};preprocessing={self.preprocessing.describe()};language={self.language};pages={page_numbers.start}-{page_numbers.stop}"
+
+    def has_output(self, file_path: Path, settings: str | None = None) -> bool:
+        """
+        Check that the final output of OCR (the merged book and its pages) exists, and was built from the current
+        version of the PDF (and, if they are given, with the given settings).
+        """
+        output_path: Path = self.get_output_path(file_path=file_path)
+        if not (output_path.exists() and self.get_pages_path(file_path=file_path).exists()):
+            return False
+
+        recorded: tuple[str, str] | None = ocr_pages.get_output(output_path=output_path)
+        if recorded == None:
+            return False  # It can't be known which version of the PDF (or which settings) the output came from
+
+        book_sha256, recorded_settings = recorded
+        return book_sha256 == self.get_book_hash(file_path=file_path) and (settings == None or recorded_settings == settings)
+
+    def has_current_output(self, file_path: Path) -> bool:
+        """
+        Check that the final output of OCR was built from the current version of the PDF, for its current core pages
+        and with the current settings, rather than being left over from a run for other pages, for instance.
+        """
+        return self.has_output(file_path=file_path, settings=self.describe_settings(page_numbers=self.get_page_numbers(file_path=file_path)))
+
+    def is_book_already_processed(self, file_path: Path, page_numbers: range) -> bool:
+        if self.has_output(file_path=file_path, settings=self.describe_settings(page_numbers=page_numbers)):
+            logger.success(f'"{file_path.stem}" by {self.author.name} has already been processed.')
             return True
         else:
             return False
-            
 
     def extract_text_from_images(self) -> None:
-        if self.author.books_via_http != None:  # At the moment, the only books that are confirmed to need OCR are among those I got through HTTP 
-            for book in self.author.books_via_http:
-
-                if book.needs_ocr and not self.is_book_already_processed(book=book):
-                    logger.warning(f'"{book.title}" by {self.author.name} requires OCR')
-                    path_to_ocr_images_of_book: Path = self.get_path_to_images_from_book(book=book) 
-                    book_file_path: Path = self.author.path_to_raw_data.joinpath(f"{book.file_name}" + ".pdf")
-
-                    if not path_to_ocr_images_of_book.exists():
-                        os.mkdir(path_to_ocr_images_of_book)
-
-                    logger.info("Taking an image of each page")
-                    images_from_books: list[Image] = pdf2image.convert_from_path(pdf_path=book_file_path)
-
-                    full_text = ""
-                    merger = PdfWriter()
-
-                    for i, image in tqdm(
-                        iterable=enumerate(images_from_books),
-                        desc="Extracting text from each page..."
-                    ):
-                        page_image_path: Path = path_to_ocr_images_of_book.joinpath(f"Page {i+1}.jpg")
-                        if not page_image_path.exists():
-                            if (book.start_page != None) and (book.end_page != None):
-                                if (i < book.start_page) or (i > book.end_page):
-                                   continue 
-
-                            if self.keep_images:
-                                image.save(page_image_path, format=self.image_format)
-
-                            if self.output_format == "pdf":
-                                pdf_after_ocr: bytes|str = pytesseract.image_to_pdf_or_hocr(image=image, lang="eng", extension="pdf") 
-                                if isinstance(pdf_after_ocr, bytes):
-                                    merger.append(BytesIO(pdf_after_ocr)) 
-                                else:
-                                    raise Exception(f'After OCR, the PDF of "{book.title}" is coming out as a string instead of a bytes object')
-                            else: 
-                                raw_text_in_image: bytes|str|dict[str, bytes|str] = pytesseract.image_to_string(image=image, lang="eng") 
-                                if isinstance(raw_text_in_image, str):
-                                    full_text += f"/n/n {raw_text_in_image}"
-                                else:
-                                    raise Exception(f'After OCR, the string content of of "{book.title}" is coming out as a bytes object or a dictionary')
-
-                    file_extension = ".pdf" if self.output_format == "pdf" else "txt"
-                    path_to_write_into: Path = self.path_to_text_after_ocr.joinpath(book.file_name + file_extension)
-
-                    if self.output_format == "pdf":
-                        with open(path_to_write_into, mode="wb") as file:
-                                _ = merger.write(file)
-                    else:
-                        with open(path_to_write_into, mode="w") as txt_file:
-                            _ = txt_file.write(full_text)
-
-                    logger.success("Saved the processed book as a new PDF")
+        for file_path in raw_file_inventory.get_file_paths(author=self.author, extension=".pdf"):
+            self.process_file(file_path=file_path)
+
+    def process_file(self, file_path: Path) -> None:
+        """
+        Run OCR on the pages of the PDF that need it, and merge their output with the text layer of the others.
+        """
+        reader = PdfReader(file_path)
+        page_numbers: range = get_core_page_numbers(book=self.get_book(file_path=file_path), page_count=len(reader.pages))
+
+        if self.is_book_already_processed(file_path=file_path, page_numbers=page_numbers):
+            return
+
+        pages_needing_ocr: list[int] = self.get_pages_needing_ocr(file_path=file_path, page_numbers=page_numbers)
+
+        if len(pages_needing_ocr) == 0:
+            logger.success(f'Every page of "{file_path.stem}" by {self.author.name} has a text layer, so it needs no OCR')
+            return
+
+        logger.warning(f'{len(pages_needing_ocr)} of the {len(page_numbers)} pages of "{file_path.stem}" by {self.author.name} require OCR')
+
+        # Pages that were OCR'd (with the same settings) by an earlier run that didn't finish are not OCR'd again
+        book_sha256: str = self.get_book_hash(file_path=file_path)
+        recorded_pages: set[int] = ocr_pages.get_page_numbers(book_sha256=book_sha256, **self.describe_page_settings())
+        missing_pages: list[int] = [page_number for page_number in pages_needing_ocr if page_number not in recorded_pages]
+
+        if len(missing_pages) < len(pages_needing_ocr):
+            logger.info(f"Resuming OCR of \"{file_path.stem}\": {len(pages_needing_ocr) - len(missing_pages)} of {len(pages_needing_ocr)} pages are already done")
+
+        started_at: float = time.time()
+        ocr_pdf(
+            pdf_path=file_path,
+            page_numbers=missing_pages,
+            image_dir=self.get_path_to_images_from_book(file_path=file_path) if self.preprocessing.storage_format != None else None,
+            output_format=self.output_format,
+            language=self.language,
+            preprocessing=self.preprocessing,
+            window_size=self.window_size,
+            workers=self.workers,
+            tesseract_threads=self.tesseract_threads,
+            record_pages=lambda new_pages: ocr_pages.store_pages(book_sha256=book_sha256, pages=new_pages, **self.describe_page_settings())
+        )
+
+        seconds_taken: float = time.time() - started_at
+        logger.info(f"OCR'd {len(missing_pages)} pages in {seconds_taken:.1f}s ({len(missing_pages) / max(seconds_taken, 1e-9):.2f} pages/s)")
+
+        self.save_output(
+            file_path=file_path, reader=reader, page_numbers=page_numbers, book_sha256=book_sha256, pages_after_ocr=set(pages_needing_ocr)
+        )
+        ocr_pages.store_output(
+            output_path=self.get_output_path(file_path=file_path),
+            book_sha256=book_sha256,
+            settings=self.describe_settings(page_numbers=page_numbers)
+        )
+
+    def describe_page_settings(self) -> dict[str, int | str]:
+        """
+        Returns:
+            dict[str, int | str]: the settings that the output of each page is recorded with.
+        """
+        return {
+            "dpi": self.preprocessing.dpi,
+            "preprocessing": self.preprocessing.describe(),
+            "language": self.language,
+            "output_format": self.output_format
+        }
+
+    def read_pages(
+        self, file_path: Path, reader: PdfReader, page_numbers: range, book_sha256: str, pages_after_ocr: set[int]
+    ) -> Iterator[tuple[int, str, OCRPage | None]]:
+        """
+        Read the core pages of the book in order, taking the recorded output of OCR for the pages that went through
+        it, and the text layer for the rest. The output of each page is read from the store only when its turn
+        comes, so no more than one of them is held in memory at a time.
+
+        Returns:
+            Iterator[tuple[int, str, OCRPage | None]]: the number and text of each page, and its output after OCR (if
+                                                        it went through OCR).
+        """
+        for page_number in page_numbers:
+            if page_number not in pages_after_ocr:
+                yield page_number, reader.pages[page_number - 1].extract_text(), None
+                continue
+
+            page: OCRPage | None = ocr_pages.get_page(book_sha256=book_sha256, page=page_number, **self.describe_page_settings())
+            if page == None:
+                raise Exception(f'Page {page_number} of "{file_path.stem}" was never recorded after OCR')
+
+            yield page_number, get_page_text(page=page), page
+
+    def save_output(self, file_path: Path, reader: PdfReader, page_numbers: range, book_sha256: str, pages_after_ocr: set[int]) -> None:
+        """
+        Write the core pages of the book, in order, taking the output of OCR for the pages that went through it,
+        and the original page (or the text of its text layer) for the rest. The text of each page is also written
+        on a line of its own, with the page's number and the confidence of OCR in it, for the cleaner to read
+        without having to parse the merged output again. Both are written in a single pass over the pages, which
+        are read back from the store one at a time, so the only thing that grows with the length of the book is the
+        merged PDF, which the writer holds until it is written (and which is no bigger than the file it becomes).
+        """
+        path_to_write_into: Path = self.get_output_path(file_path=file_path)
+        pages_path: Path = self.get_pages_path(file_path=file_path)
+        temporary_path: Path = pages_path.with_suffix(".jsonl.part")  # So that a partly written file is never read
+        output_mode: str = "wb" if self.output_format == ".pdf" else "w"
+        merger = PdfWriter()
+
+        with open(temporary_path, mode="w") as pages_file, open(path_to_write_into, mode=output_mode) as output_file:
+            pages: Iterator[tuple[int, str, OCRPage | None]] = self.read_pages(
+                file_path=file_path, reader=reader, page_numbers=page_numbers, book_sha256=book_sha256, pages_after_ocr=pages_after_ocr
+            )
+
+            for position, (page_number, text, page) in enumerate(pages):
+                record: dict[str, int | str | float | bool | None] = {
+                    "page": page_number,
+                    "text": text,
+                    "confidence": page.confidence if page != None else None,
+                    "ocr": page != None
+                }
+                _ = pages_file.write(json.dumps(record) + "\n")
+
+                if self.output_format == ".txt":
+                    _ = output_file.write(text if position == 0 else "\n\n" + text)
+                elif page == None:
+                    _ = merger.add_page(reader.pages[page_number - 1])
+                elif isinstance(page.output, bytes):
+                    merger.append(BytesIO(page.output))
+                else:
+                    raise Exception(f'After OCR, the PDF of "{file_path.stem}" is coming out as a string instead of a bytes object')
+
+            if self.output_format == ".pdf":
+                _ = merger.write(output_file)
+
+        os.replace(temporary_path, pages_path)
+        logger.success(f"Saved the processed book as {path_to_write_into.name}")
+
+
+def ocr_pdf(
+    pdf_path: Path,
+    page_numbers: list[int],
+    image_dir: Path | None,
+    output_format: str,
+    language: str,
+    preprocessing: PreprocessingConfig,
+    window_size: int,
+    workers: int,
+    tesseract_threads: int,
+    record_pages: Callable[[dict[int, OCRPage]], None]
+) -> None:
+    """
+    Run OCR on the given pages of the PDF, a small window of pages at a time. Each window is rasterized (and only
+    at the pages in it) by the process that OCRs it, and its images are dropped as soon as they have been OCR'd,
+    so no more than one window of images per worker is ever held in memory, however long the book is. The output
+    of each window is handed over as soon as it is ready and isn't kept, so neither is the output of the book. 
+    Windows are spread over a pool of processes, unless only one worker is asked for.
+
+    Args:
+        page_numbers: the (1-indexed) numbers of the pages to OCR.
+        record_pages: called with the output of each window (a single-page PDF or the text of each of its pages, 
+                      keyed by page number) as soon as it is ready, so that it can be kept even if the run is 
+                      interrupted.
+    """
+    windows: list[tuple[int, int]] = make_windows(page_numbers=page_numbers, window_size=window_size)
+
+    def collect(first_page: int, window_output: list[OCRPage]) -> None:
+        pages: dict[int, OCRPage] = dict(enumerate(window_output, start=first_page))
+        record_pages(pages)
+        _ = progress_bar.update(len(pages))
+
+    with tqdm(total=len(page_numbers), desc="Extracting text from each page...") as progress_bar:
+        if workers == 1:
+            limit_tesseract_threads(threads=tesseract_threads)
+            for first_page, last_page in windows:
+                collect(first_page, ocr_window(pdf_path, first_page, last_page, preprocessing, image_dir, output_format, language))
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=limit_tesseract_threads, initargs=(tesseract_threads,)) as pool:
+                futures: dict[Future[list[OCRPage]], int] = {
+                    pool.submit(ocr_window, pdf_path, first_page, last_page, preprocessing, image_dir, output_format, language): first_page
+                    for first_page, last_page in windows
+                }
+
+                for future in as_completed(futures):
+                    collect(futures[future], future.result())
+
+
+def make_windows(page_numbers: list[int], window_size: int) -> list[tuple[int, int]]:
+    """
+    Split the page numbers into windows of consecutive pages, none of which are longer than the window size.
+
+    Returns:
+        list[tuple[int, int]]: the first and last page of each window.
+    """
+    windows: list[tuple[int, int]] = []
+    for page_number in sorted(page_numbers):
+        if len(windows) > 0 and windows[-1][1] == page_number - 1 and page_number - windows[-1][0] < window_size:
+            windows[-1] = (windows[-1][0], page_number)
+        else:
+            windows.append((page_number, page_number))
+
+    return windows
+
+
+def ocr_window(
+    pdf_path: Path,
+    first_page: int,
+    last_page: int,
+    preprocessing: PreprocessingConfig,
+    image_dir: Path | None,
+    output_format: str,
+    language: str
+) -> list[OCRPage]:
+    images: list[Image] = pdf2image.convert_from_path(
+        pdf_path=pdf_path, dpi=preprocessing.dpi, first_page=first_page, last_page=last_page, grayscale=preprocessing.grayscale
+    )
+    outputs: list[OCRPage] = []
+
+    for page_number in range(first_page, last_page + 1):
+        image: Image = preprocess_page(image=images.pop(0), config=preprocessing)
+        image_path: Path | None = image_dir.joinpath(f"Page {page_number}{preprocessing.image_extension}") if image_dir != None else None
+        outputs.append(ocr_page(image, image_path, output_format, language, preprocessing.storage_format))
+        image.close()
+
+    return outputs
+
+
+def ocr_page(image: Image, image_path: Path | None, output_format: str, language: str, storage_format: str | None) -> OCRPage:
+    """
+    Run OCR on a single page (in a worker process, unless OCR is running serially), saving the image of the page
+    along the way if a path is given for it. Black and white pages are stored with a single bit per pixel.
+    """
+    if image_path != None:
+        is_binary: bool = image.mode == "L" and set(image.histogram()[1:255]) == {0}
+        (image.convert("1") if is_binary else image).save(image_path, format=storage_format, optimize=True)
+
+    if output_format == ".pdf":
+        return OCRPage(output=pytesseract.image_to_pdf_or_hocr(image=image, lang=language, extension="pdf"))
+    else:
+        words: dict[str, list[str | int | float]] = pytesseract.image_to_data(image=image, lang=language, output_type=pytesseract.Output.DICT)
+        return read_words(words=words)
+
+
+def read_words(words: dict[str, list[str | int | float]]) -> OCRPage:
+    """
+    Put the words that Tesseract read back together into lines and paragraphs (a line break between the lines of
+    a paragraph, and a blank line between paragraphs), and average its confidence in each of them.
+
+    Args:
+        words: the output of pytesseract's image_to_data, with a list of values for each of its columns.
+    """
+    lines: dict[tuple[int, int, int], list[str]] = {}
+    confidences: list[float] = []
+
+    for block, paragraph, line, word, confidence in zip(words["block_num"], words["par_num"], words["line_num"], words["text"], words["conf"]):
+        if float(confidence) < 0 or str(word).strip() == "":
+            continue  # Rows for blocks, paragraphs and lines rather than words have a confidence of -1
+
+        lines.setdefault((int(block), int(paragraph), int(line)), []).append(str(word))
+        confidences.append(float(confidence))
+
+    parts: list[str] = []
+    previous_paragraph: tuple[int, int] | None = None
+
+    for (block, paragraph, _), line_words in lines.items():
+        if previous_paragraph != None:
+            parts.append("\n" if previous_paragraph == (block, paragraph) else "\n\n")
+
+        parts.append(" ".join(line_words))
+        previous_paragraph = (block, paragraph)
+
+    confidence: float | None = round(sum(confidences) / len(confidences), 1) if len(confidences) > 0 else None
+    return OCRPage(output="".join(parts), confidence=confidence)
+
+
+def get_page_text(page: OCRPage) -> str:
+    if isinstance(page.output, str):
+        return page.output
+    else:
+        return PdfReader(BytesIO(page.output)).pages[0].extract_text()  # A single page, rather than the whole merged book
+
+
+def limit_tesseract_threads(threads: int) -> None:
+    """
+    Tesseract's own threads would compete with the other workers for the same cores, so each worker's calls are
+    limited to the given number of threads.
+    """
+    os.environ["OMP_THREAD_LIMIT"] = str(threads)
+
+
+def get_core_page_numbers(book: BookRecord, page_count: int) -> range:
+    """
+    Returns:
+        range: the (1-indexed) numbers of the pages to OCR, which are the book's core pages (if they were
+               specified) or all of its pages.
+    """
+    core_pages: range | None = book.core_pages
+    if core_pages != None:
+        return range(max(core_pages.start, 0) + 1, min(core_pages.stop, page_count) + 1)
+    else:
+        return range(1, page_count + 1)
 
 
 if __name__ == "__main__":
-    for author in prepare_sources():
-        module = OCRModule(author=author)
+    parser = ArgumentParser()
+    _ = parser.add_argument("--workers", type=int, default=None)
+    _ = parser.add_argument("--tesseract-threads", type=int, default=1)
+    _ = parser.add_argument("--dpi", type=int, default=200)
+    _ = parser.add_argument("--binarize", action="store_true")
+    _ = parser.add_argument("--deskew", action="store_true")
+    _ = parser.add_argument("--crop", action="store_true")
+    _ = parser.add_argument("--storage-format", default=None, help='The format to keep the image of each page in (e.g. "PNG")')
+    _ = parser.add_argument("--window-size", type=int, default=4)
+    args = parser.parse_args()
+
+    for author in author_registry.all():
+        module = OCRModule(
+            author=author,
+            workers=args.workers,
+            tesseract_threads=args.tesseract_threads,
+            window_size=args.window_size,
+            preprocessing=PreprocessingConfig(
+                dpi=args.dpi, binarize=args.binarize, deskew=args.deskew, crop=args.crop, storage_format=args.storage_format
+            )
+        )
         module.extract_text_from_images() 
 
@@ -0,0 +1,151 @@
+"""
+Contains the preprocessing that the image of each page goes through between being rasterized and being OCR'd:
+conversion to grayscale, binarization, deskewing and cropping to the box that holds the page's content. The
+resolution that pages are rasterized at, and the format (if any) that their images are kept in, are configured
+here as well, since they trade speed and disk space against accuracy in the same way.
+"""
+from PIL import Image, ImageOps
+
+
+class PreprocessingConfig:
+    def __init__(
+        self,
+        dpi: int = 200,
+        grayscale: bool = True,
+        binarize: bool = False,
+        deskew: bool = False,
+        crop: bool = False,
+        storage_format: str | None = None,
+        max_skew: float = 3.0,
+        skew_step: float = 0.25,
+        crop_margin: int = 10
+    ) -> None:
+        """
+        Args:
+            dpi: the resolution that pages are rasterized at.
+            grayscale: whether to drop colour before OCR.
+            binarize: whether to turn pages into black and white, with a threshold chosen for each page by Otsu's
+                      method. This implies grayscale.
+            deskew: whether to straighten pages that were scanned at an angle (of up to max_skew degrees).
+            crop: whether to crop pages to the box that holds their content (plus a margin of crop_margin pixels).
+            storage_format: the format that the image of each page is kept in ("PNG" is lossless), or None if the
+                            images are not to be kept at all.
+        """
+        self.dpi: int = dpi
+        self.grayscale: bool = grayscale or binarize
+        self.binarize: bool = binarize
+        self.deskew: bool = deskew
+        self.crop: bool = crop
+        self.storage_format: str | None = storage_format
+        self.max_skew: float = max_skew
+        self.skew_step: float = skew_step
+        self.crop_margin: int = crop_margin
+
+    def describe(self) -> str:
+        """
+        Describe the settings that change what OCR produces (the DPI and storage format don't), so that the output
+        of OCR that ran with different settings is never mixed up.
+        """
+        steps: list[str] = [
+            name for name, enabled in [("grayscale", self.grayscale), ("binarize", self.binarize), ("crop", self.crop)] if enabled
+        ]
+        if self.deskew:
+            steps.append(f"deskew({self.max_skew},{self.skew_step})")
+
+        return "+".join(steps) or "none"
+
+    @property
+    def image_extension(self) -> str:
+        return ".jpg" if self.storage_format == "JPEG" else f".{str(self.storage_format).lower()}"
+
+
+def preprocess_page(image: Image.Image, config: PreprocessingConfig) -> Image.Image:
+    if config.grayscale and image.mode != "L":
+        image = image.convert("L")
+
+    if config.deskew:
+        angle: float = find_skew_angle(image=image, max_skew=config.max_skew, step=config.skew_step)
+        if angle != 0:
+            image = image.rotate(angle=angle, resample=Image.Resampling.BICUBIC, fillcolor="white")
+
+    if config.crop:
+        image = crop_to_content(image=image, margin=config.crop_margin)
+
+    if config.binarize:
+        threshold: int = find_otsu_threshold(histogram=image.histogram())
+        image = image.point(lambda value: 255 if value > threshold else 0)
+
+    return image
+
+
+def find_skew_angle(image: Image.Image, max_skew: float, step: float, sample_width: int = 600) -> float:
+    """
+    Find the angle by which the page has to be rotated for its lines of text to run horizontally. The lines are
+    horizontal when the darkness of the rows of pixels varies the most (dark lines of text, then light gaps), so
+    a downscaled copy of the page is rotated through each candidate angle, and the angle at which the variance of
+    its row averages is highest wins. Averaging the rows is done by shrinking the image to a single column.
+    """
+    scale: float = min(1, sample_width / image.width)
+    sample: Image.Image = ImageOps.invert(image.convert("L").resize((int(image.width * scale), int(image.height * scale))))
+
+    best_angle: float = 0
+    best_variance: float = -1
+    number_of_steps: int = int(max_skew / step)
+
+    for step_number in range(-number_of_steps, number_of_steps + 1):
+        angle: float = step_number * step
+        rotated: Image.Image = sample.rotate(angle=angle, resample=Image.Resampling.BILINEAR)
+        row_averages: list[int] = list(rotated.resize((1, rotated.height), resample=Image.Resampling.BOX).getdata())
+
+        mean: float = sum(row_averages) / len(row_averages)
+        variance: float = sum((average - mean) ** 2 for average in row_averages) / len(row_averages)
+        if variance > best_variance:
+            best_angle, best_variance = angle, variance
+
+    return best_angle
+
+
+def crop_to_content(image: Image.Image, margin: int, block_size: int = 8, ink_threshold: int = 230) -> Image.Image:
+    """
+    Crop the page to the box that holds its content. Ink is looked for in a copy of the page in which each block of
+    pixels is averaged, so that specks of noise in the margins (which fade into their blocks) are left out of it.
+    """
+    blocks: Image.Image = image.convert("L").reduce(block_size)
+    box: tuple[int, int, int, int] | None = blocks.point(lambda value: 255 if value < ink_threshold else 0).getbbox()
+
+    if box == None:
+        return image  # A blank page
+
+    left, top, right, bottom = (edge * block_size for edge in box)
+    return image.crop((max(left - margin, 0), max(top - margin, 0), min(right + margin, image.width), min(bottom + margin, image.height)))
+
+
+def find_otsu_threshold(histogram: list[int]) -> int:
+    """
+    Choose the threshold that best separates the dark and light pixels of a page, by maximising the variance
+    between the two classes (Otsu's method).
+    """
+    total_pixels: int = sum(histogram)
+    total_intensity: int = sum(value * count for value, count in enumerate(histogram))
+
+    best_threshold: int = 127
+    best_variance: float = -1
+    background_pixels: int = 0
+    background_intensity: int = 0
+
+    for value, count in enumerate(histogram):
+        background_pixels += count
+        background_intensity += value * count
+        foreground_pixels: int = total_pixels - background_pixels
+
+        if background_pixels == 0 or foreground_pixels == 0:
+            continue
+
+        background_mean: float = background_intensity / background_pixels
+        foreground_mean: float = (total_intensity - background_intensity) / foreground_pixels
+        variance: float = background_pixels * foreground_pixels * (background_mean - foreground_mean) ** 2
+
+        if variance > best_variance:
+            best_threshold, best_variance = value, variance
+
+    return best_threshold
@@ -0,0 +1,177 @@
+"""
+Contains a rule engine that decides which of an author's raw files to keep. The rules (the shared ones, and those
+that come from the author's details, like the names of their biographers) are compiled once into a single regular
+expression, so every file is classified in one pass over a listing of the file names instead of one pass per rule.
+When there are only a few patterns, looking for each of them across the listing with str.find is faster still.
+"""
+import re
+import bisect
+import itertools
+from pathlib import Path
+
+from loguru import logger
+
+from src.data_preparation.sourcing import Author
+
+
+# Below this many patterns (all of them plain substrings), looking for each one across a listing with str.find is
+# faster than going through the listing once with the matcher (see src/benchmarks/rules.py)
+SINGLE_PASS_THRESHOLD: int = 20
+
+
+class FileRule:
+    def __init__(self, name: str, patterns: list[str], literal: bool = True) -> None:
+        """
+        Args:
+            name: the reason that will be given for deleting the files that match the rule.
+            patterns: the substrings (or, if literal is False, the regular expressions) that the rule looks for in
+                      file names. Like the checks that they replace, they are case-sensitive.
+            literal: whether the patterns are plain substrings.
+        """
+        self.name: str = name
+        self.patterns: list[str] = patterns
+        self.literal: bool = literal
+
+    def to_regex(self) -> str:
+        return "|".join(re.escape(pattern) if self.literal else f"(?:{pattern})" for pattern in self.patterns)
+
+
+SHARED_RULES: list[FileRule] = [
+    FileRule(name="complete works", patterns=["complete works"]),
+]
+
+
+class RuleSet:
+    def __init__(self, rules: list[FileRule], single_pass: bool | None = None) -> None:
+        """
+        Args:
+            rules: the rules, in order of precedence (for matches that start at the same position of a file name).
+            single_pass: whether a listing of file names is to be gone through once with the matcher, rather than
+                         once for each of the patterns. Either way, the rule whose match starts leftmost in a file
+                         name wins. If None, this is decided by the number of patterns.
+        """
+        from src.data_processing.normalization import make_trie_regex
+
+        self.rules: list[FileRule] = [rule for rule in rules if len(rule.patterns) > 0]
+        self.group_names: dict[str, str] = {f"rule_{number}": rule.name for number, rule in enumerate(self.rules)}
+        self.literal: bool = all(rule.literal for rule in self.rules)
+
+        # Each pattern, along with the name of its rule, in order of precedence
+        self.literals: list[tuple[str, str]] = [(pattern, rule.name) for rule in self.rules for pattern in rule.patterns]
+        self.single_pass: bool = single_pass if single_pass != None else len(self.literals) >= SINGLE_PASS_THRESHOLD
+
+        # A named group for each rule would keep the regex engine from skipping ahead to the characters that the
+        # patterns start with. So when every pattern is a plain substring, the matcher has no groups: it only finds
+        # where the leftmost match starts, and the rule is then found among the patterns that match there.
+        pattern: str = make_trie_regex(targets=[literal for literal, _ in self.literals]) if self.literal else "|".join(
+            f"(?P<{group_name}>{rule.to_regex()})" for group_name, rule in zip(self.group_names.keys(), self.rules)
+        )
+        self.matcher: re.Pattern[str] | None = re.compile(pattern) if len(self.rules) > 0 else None
+
+    @classmethod
+    def for_author(cls, author: Author) -> "RuleSet":
+        author_rules: list[FileRule] = [
+            FileRule(name="biographical work", patterns=author.biographers_and_compilers or [])
+        ]
+        return cls(rules=SHARED_RULES + author_rules)
+
+    def classify(self, file_name: str) -> str | None:
+        """
+        Returns:
+            str | None: the name of the rule that the file name matches (the leftmost match wins), or None if it
+                        matches none of them.
+        """
+        if self.matcher == None:
+            return None
+
+        match: re.Match[str] | None = self.matcher.search(file_name)
+        if match == None:
+            return None
+        elif self.literal:
+            return self.literals[self.find_precedence(file_name=file_name, position=match.start())][1]
+        else:
+            return self.group_names[str(match.lastgroup)]
+
+    def classify_all(self, file_names: list[str]) -> list[str | None]:
+        """
+        Classify every file name at once. When the patterns are plain substrings, the names are joined into a single
+        listing (separated by NUL characters, which no file name or pattern can contain, so no match can span two
+        names), and only the names that match anything are looked at in Python. With few patterns, each of them is
+        looked for across the whole listing with str.find. With more, the matcher goes through the listing once.
+
+        Returns:
+            list[str | None]: the name of the rule that each file name matches, or None if it matches none of them.
+        """
+        if self.matcher == None or not self.literal:
+            return [self.classify(file_name=file_name) for file_name in file_names]
+
+        listing: str = "\0".join(file_names)
+        starts: list[int] = list(itertools.accumulate((len(file_name) + 1 for file_name in file_names), initial=0))
+
+        # The position of the leftmost match in each file name that matches anything, and the precedence of its pattern
+        leftmost: dict[int, tuple[int, int]] = {}
+
+        if not self.single_pass:
+            for precedence, (literal, _) in enumerate(self.literals):
+                position: int = listing.find(literal)
+                while position != -1:
+                    index: int = bisect.bisect_right(starts, position) - 1
+                    candidate: tuple[int, int] = (position - starts[index], precedence)
+                    if index not in leftmost or candidate < leftmost[index]:
+                        leftmost[index] = candidate
+
+                    position = listing.find(literal, position + 1)
+        else:
+            for match in self.matcher.finditer(listing):
+                index = bisect.bisect_right(starts, match.start()) - 1
+                if index not in leftmost:  # Later matches in the same name don't start leftmost
+                    position = match.start() - starts[index]
+                    leftmost[index] = (position, self.find_precedence(file_name=file_names[index], position=position))
+
+        reasons: list[str | None] = [None] * len(file_names)
+        for index, (_, precedence) in leftmost.items():
+            reasons[index] = self.literals[precedence][1]
+
+        return reasons
+
+    def find_precedence(self, file_name: str, position: int) -> int:
+        """
+        Returns:
+            int: the index of the first of the patterns that match at the (leftmost) position of a match in the file
+                 name, which is the one that an alternation of the patterns would pick.
+        """
+        return next(
+            precedence for precedence, (literal, _) in enumerate(self.literals) if file_name.startswith(literal, position)
+        )
+
+
+class FilePlan:
+    """
+    The outcome of classifying an author's files: the files to keep, and the files to delete along with the
+    reason for deleting each one.
+    """
+    def __init__(self) -> None:
+        self.keep: list[Path] = []
+        self.delete: dict[Path, str] = {}
+
+    def add(self, file_path: Path, reason: str | None) -> None:
+        if reason == None:
+            self.keep.append(file_path)
+        else:
+            self.delete[file_path] = reason
+
+    def report(self, author: Author) -> None:
+        for file_path, reason in self.delete.items():
+            logger.info(f"{author.name} | Deleting {file_path.name} ({reason})")
+
+        logger.success(f"{author.name}: keeping {len(self.keep)} files, and deleting {len(self.delete)}")
+
+
+def make_plan(file_paths: list[Path], rule_set: RuleSet) -> FilePlan:
+    plan = FilePlan()
+    reasons: list[str | None] = rule_set.classify_all(file_names=[file_path.name for file_path in file_paths])
+
+    for file_path, reason in zip(file_paths, reasons):
+        plan.add(file_path=file_path, reason=reason)
+
+    return plan
@@ -1,32 +1,244 @@
+import os
+import re
+import html
+from pathlib import Path
+
 import requests
+from loguru import logger
 from bs4 import BeautifulSoup 
+from importlib.util import find_spec
+
+from src.data_preparation.caching import HTTPCache
+
+
+TEXT_EXTRACTION_BACKENDS: tuple[str, str] = ("html.parser", "lxml")
+
+# Elements whose content isn't parsed as markup (by html.parser, or by the parsers of newer versions of Python)
+RAW_TEXT_ELEMENTS: tuple[str, ...] = (
+    "script", "style", "textarea", "title", "xmp", "iframe", "noembed", "noframes", "noscript", "plaintext"
+)
+
+# Comments, scripts and styles (none of which are part of the text that we extract), and tags, any of whose 
+# quoted attributes may contain ">"
+MARKUP_WITHOUT_TEXT: re.Pattern[str] = re.compile(
+    r"""<!--.*?-->"""
+    r"""|<(script|style)\b(?:[^>"']|"[^"]*"|'[^']*')*>.*?</\1>"""
+    r"""|</?([a-zA-Z][^\s/>]*)(?:[^>"']|"[^"]*"|'[^']*')*>""",
+    re.DOTALL | re.IGNORECASE
+)
+RAW_TEXT_OPENINGS: re.Pattern[str] = re.compile(r"<(" + "|".join(RAW_TEXT_ELEMENTS) + r")\b", re.IGNORECASE)
+MALFORMED_REFERENCE: re.Pattern[str] = re.compile(r"&(?!#[0-9]+;|#[xX][0-9a-fA-F]+;|[a-zA-Z][a-zA-Z0-9]*;)")
 
 
 def scrape(
     url: str, 
+    file_path: Path,
     initial_marker: str | None = None,
-    terminal_marker: str | None = None
-) -> str | None:
+    terminal_marker: str | None = None,
+    session: requests.Session | None = None,
+    cache: HTTPCache | None = None,
+    conditional: bool = False,
+    backend: str = "html.parser"
+) -> bool:
+    """
+    Fetch the page, and write its text (or the part of it that lies between the two markers) into the file. If a
+    cache is provided, the validators of the page are recorded in it once the text has been written, and a
+    conditional request can be made so that the page is only fetched (and parsed) again if it has changed since.
 
-    response: requests.Response = requests.get(url=url)
+    Returns:
+        bool: whether the text was written, which it isn't if the page hasn't changed (and then nothing is parsed).
+    """
+    response: requests.Response = fetch_page(url=url, session=session, cache=cache, conditional=conditional)
+
+    if response.status_code == 304:
+        return False
+    elif response.status_code == 200:
+        text: str = extract_text(
+            markup=response.text, 
+            url=url, 
+            initial_marker=initial_marker, 
+            terminal_marker=terminal_marker, 
+            backend=backend
+        )
+        save_text(file_path=file_path, text=text, url=url, response=response, cache=cache)
+        return True
+    else:
+        raise Exception(f"Unable to make HTTP request. Status code: {response.status_code}") 
+
+
+def fetch_page(
+    url: str, 
+    session: requests.Session | None = None,
+    cache: HTTPCache | None = None,
+    conditional: bool = False
+) -> requests.Response:
+
+    """
+    Fetch the page, conditionally on the validators in the cache if asked to. The validators of the response are
+    not stored here, but by save_text once the page's text has been written, since a page whose text was never
+    saved would otherwise be taken to be unchanged (with a 304 response) the next time that it is fetched.
+    """
+    headers: dict[str, str] = cache.get_conditional_headers(url=url) if (cache != None and conditional) else {}
+    requester = session if session != None else requests
+    return requester.get(url=url, headers=headers, timeout=60)
+
+
+def save_text(file_path: Path, text: str, url: str, response: requests.Response, cache: HTTPCache | None) -> None:
+    """
+    Write the text of the page through a temporary file (so that a partly written file is never left in place of
+    the text), and only then record the validators of the response that it came from.
+    """
+    temporary_path: Path = file_path.with_name(file_path.name + ".part")
+    _ = temporary_path.write_text(text)
+    os.replace(temporary_path, file_path)
+
+    if cache != None:
+        cache.store_validators(url=url, response=response)
+
+
+def extract_text(
+    markup: str, 
+    url: str, 
+    initial_marker: str | None = None, 
+    terminal_marker: str | None = None,
+    backend: str = "html.parser",
+    bounded: bool = True
+) -> str:
+    """
+    Extract the text of the page, or the part of it that lies between the last occurrences of the two markers.
+
+    Args:
+        markup: the HTML of the page.
+        url: the URL of the page (only used in error messages).
+        initial_marker: the text that the extract starts with.
+        terminal_marker: the text that marks the end of the extract.
+        backend: the parser that Beautiful Soup should use. "lxml" is a C-accelerated alternative to the default, 
+                 but it is only used when asked for, since its text isn't always the same as that of html.parser 
+                 (the whitespace around a doctype, for one). html.parser is used instead if lxml isn't installed.
+        bounded: whether to stop parsing at the terminal marker, instead of parsing the rest of the page only to 
+                 throw its text away. The cut is only made with html.parser (which reads the page as a stream), 
+                 and only where it can't change the extracted text.
+
+    Returns:
+        str: the extracted text
+    """
     initial_marker_provided: bool = isinstance(initial_marker, str)
     terminal_marker_provided: bool = isinstance(terminal_marker, str)
 
-    if response.status_code == 200:
-        soup = BeautifulSoup(markup=response.text, features="html.parser")
-        raw_text: str = soup.text
+    if initial_marker_provided != terminal_marker_provided:
+        raise Exception(f"Partial scraping requested for {url} without one of the markers")
+
+    features: str = get_parser_features(backend=backend)
+    if bounded and features == "html.parser" and initial_marker_provided and terminal_marker_provided:
+        markup = truncate_after_terminal_marker(markup=markup, initial_marker=initial_marker, terminal_marker=terminal_marker)
+
+    soup = BeautifulSoup(markup=markup, features=features)
+    raw_text: str = soup.text
 
-        if (not initial_marker_provided and not terminal_marker_provided):
-            return raw_text 
+    if (not initial_marker_provided and not terminal_marker_provided):
+        return raw_text 
+    else:
+        start_index: int = raw_text.rfind(initial_marker)
+        terminal_index: int = raw_text.rfind(terminal_marker)
+        return raw_text[start_index:terminal_index]
 
-        elif (initial_marker_provided and terminal_marker_provided):
-            start_index: int = raw_text.rfind(initial_marker)
-            terminal_index: int = raw_text.rfind(terminal_marker)
-            return raw_text[start_index:terminal_index]
 
-        else:
-            raise Exception(f"Partial scraping requested for {url} without one of the markers")
+def get_parser_features(backend: str) -> str:
+    assert backend in TEXT_EXTRACTION_BACKENDS, f"The backend can only be one of {TEXT_EXTRACTION_BACKENDS}"
 
+    if backend == "lxml" and find_spec("lxml") == None:
+        logger.warning("lxml is not installed, so pages will be parsed with html.parser instead")
+        return "html.parser"
     else:
-        raise Exception(f"Unable to make HTTP request. Status code: {response.status_code}") 
-        
+        return backend
+
+
+def truncate_after_terminal_marker(markup: str, initial_marker: str, terminal_marker: str) -> str:
+    """
+    Cut the markup off right after the last place where the terminal marker appears in it, so that the parser 
+    never sees the rest of the page. html.parser reads the page as a stream, so the text of what's left is 
+    exactly the start of the page's text, and the markers are found in the same places as before, provided that:
+
+    - the marker shows up in the markup just as it does in the text, and we don't cut inside a tag, a comment,
+      an entity or an element (like a script) whose content isn't parsed as markup. 
+    - neither marker shows up in the text of the rest of the page, even split by tags or written as entities.
+
+    The text of the rest is worked out from its tags, comments, scripts, styles and entities alone, so the markup 
+    is returned whole whenever the rest has anything in it that we can't account for in that way.
+    """
+    markers_are_literal: bool = all(
+        marker.isascii() and not any(character in marker for character in "&<>") for marker in [initial_marker, terminal_marker]
+    )
+
+    # An occurrence of the initial marker that began before the terminal marker and ended after the cut would
+    # have the terminal marker in it, and we wouldn't see where it begins
+    terminal_index: int = markup.rfind(terminal_marker)
+    if not markers_are_literal or terminal_index == -1 or terminal_marker in initial_marker:
+        return markup
+
+    cut_index: int = terminal_index + len(terminal_marker)
+    if not is_in_text(markup=markup, index=terminal_index):
+        return markup
+
+    text_of_rest: str | None = get_text_of_rest(markup=markup[cut_index:])
+    if text_of_rest == None:
+        return markup
+
+    # Any later occurrence of either marker would end after the cut, so it shows up in this text (which starts 
+    # with the marker that we cut after) somewhere past its start.
+    text_after_cut: str = terminal_marker + text_of_rest
+    for marker in [initial_marker, terminal_marker]:
+        if text_after_cut.find(marker, max(1, len(terminal_marker) - len(marker) + 1)) != -1:
+            return markup
+
+    return markup[:cut_index]
+
+
+def is_in_text(markup: str, index: int) -> bool:
+    """
+    Whether the character at the index is part of the text of the page, rather than of a tag, a comment, an entity
+    or the content of an element (like a script) that isn't parsed as markup.
+    """
+    tag_start: int = markup.rfind("<", 0, index)
+    if tag_start != -1:
+        tag = MARKUP_WITHOUT_TEXT.match(markup, tag_start)
+        if tag == None or tag.end() > index:
+            return False
+
+    if re.search(r"&#?[a-zA-Z0-9]*$", markup[max(0, index - 40):index]) != None:
+        return False
+
+    openings: list[re.Match[str]] = list(RAW_TEXT_OPENINGS.finditer(markup, 0, index))
+    if len(openings) == 0:
+        return True
+    else:
+        last_opening: re.Match[str] = openings[-1]
+        return re.search(f"</{last_opening.group(1)}", markup[last_opening.end():index], re.IGNORECASE) != None
+
+
+def get_text_of_rest(markup: str) -> str | None:
+    """
+    Work out the text of the rest of a page (which starts in its text) from its tags, comments, scripts, styles 
+    and entities alone.
+
+    Returns:
+        str | None: the text, or None if the markup has anything else in it (like an element whose content isn't
+                    parsed as markup, or a malformed entity), whose text we can't be sure of.
+    """
+    parts: list[str] = []
+    position: int = 0
+
+    for match in MARKUP_WITHOUT_TEXT.finditer(markup):
+        parts.append(markup[position:match.start()])
+        position = match.end()
+
+        tag_name: str | None = match.group(2)
+        opens_raw_text: bool = tag_name != None and not match.group(0).startswith("</") and tag_name.lower() in RAW_TEXT_ELEMENTS
+        if opens_raw_text or match.group(0).startswith(("<!-->", "<!--->")):
+            return None
+
+    parts.append(markup[position:])
+    if any("<" in part or MALFORMED_REFERENCE.search(part) != None for part in parts):
+        return None
+    else:
+        return "".join(html.unescape(part) for part in parts)
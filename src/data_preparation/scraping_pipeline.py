@@ -0,0 +1,204 @@
+"""
+Contains a pipeline that scrapes many pages at once. Pages are fetched by a pool of threads that share a pooled
+session (with a rate limit per domain, and retries with backoff), and handed over to a pool of processes to be
+parsed as soon as they arrive, so that fetching and parsing overlap.
+"""
+import os
+import time
+import threading
+from pathlib import Path
+from urllib.parse import urlparse
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+import requests
+from tqdm import tqdm
+from loguru import logger
+
+from src.data_preparation.caching import http_cache
+from src.data_preparation.inventory import raw_file_inventory
+from src.data_preparation.downloading import make_session
+from src.data_preparation.sourcing import Author, ViaScraper
+from src.data_preparation.scraping import extract_text, fetch_page, save_text
+from src.data_preparation.utils import StageStats
+
+
+class DomainRateLimiter:
+    def __init__(self, requests_per_second: float) -> None:
+        self.interval: float = 1 / requests_per_second
+        self.next_slots: dict[str, float] = {}
+        self.lock: threading.Lock = threading.Lock()
+
+    def wait(self, domain: str) -> None:
+        """
+        Reserve the next free slot for the domain, and sleep until it arrives.
+        """
+        with self.lock:
+            now: float = time.monotonic()
+            slot: float = max(now, self.next_slots.get(domain, now))
+            self.next_slots[domain] = slot + self.interval
+
+        time.sleep(max(0, slot - now))
+
+
+class ScrapeJob:
+    def __init__(self, author_name: str, book: ViaScraper, file_path: Path) -> None:
+        self.book: ViaScraper = book
+        self.file_path: Path = file_path
+        self.author_name: str = author_name
+        self.domain: str = urlparse(book.url).netloc
+        self.conditional: bool = file_path.exists()
+
+
+def timed_extract_text(
+    markup: str,
+    url: str,
+    initial_marker: str | None,
+    terminal_marker: str | None,
+    backend: str
+) -> tuple[str, float, float]:
+    """
+    Run in the worker processes, returning the text alongside the times at which the parse started and finished.
+    """
+    started_at: float = time.time()
+    text: str = extract_text(
+        markup=markup, 
+        url=url, 
+        initial_marker=initial_marker, 
+        terminal_marker=terminal_marker, 
+        backend=backend
+    )
+    return text, started_at, time.time()
+
+
+class ScrapingPipeline:
+    def __init__(
+        self,
+        fetch_workers: int = 8,
+        parse_workers: int | None = None,
+        requests_per_second_per_domain: float = 2,
+        max_attempts: int = 4,
+        backoff_seconds: float = 1,
+        backend: str = "html.parser",
+        session: requests.Session | None = None
+    ) -> None:
+
+        self.fetch_workers: int = fetch_workers
+        self.parse_workers: int = parse_workers if parse_workers != None else (os.cpu_count() or 1)
+        self.max_attempts: int = max_attempts
+        self.backoff_seconds: float = backoff_seconds
+        self.backend: str = backend
+        self.rate_limiter = DomainRateLimiter(requests_per_second=requests_per_second_per_domain)
+        self.session: requests.Session = session if session != None else make_session(
+            max_hosts=fetch_workers,
+            max_connections_per_host=fetch_workers
+        )
+
+        self.fetch_stats = StageStats(name="Fetching", unit="pages")
+        self.parse_stats = StageStats(name="Parsing", unit="pages")
+
+    @staticmethod
+    def collect_jobs(authors: list[Author]) -> list[ScrapeJob]:
+        jobs: list[ScrapeJob] = []
+        for author in authors:
+            if author.books_via_scraper != None:
+                author.make_paths()
+                for book in author.books_via_scraper:
+                    file_path: Path = author.path_to_raw_data.joinpath(book.file_name)
+                    job = ScrapeJob(author_name=author.name, book=book, file_path=file_path)
+
+                    if job.conditional and not http_cache.has_validators(url=book.url):
+                        continue  # There's nothing to check our copy against, so we keep it
+
+                    jobs.append(job)
+
+        return jobs
+
+    def fetch(self, job: ScrapeJob) -> requests.Response | None:
+        """
+        Fetch the page, retrying with exponential backoff if the connection fails or the server asks us to slow
+        down. Returns None if the page hasn't changed since we last scraped it.
+        """
+        for attempt in range(1, self.max_attempts + 1):
+            self.rate_limiter.wait(domain=job.domain)
+            started_at: float = time.time()
+
+            try:
+                response: requests.Response = fetch_page(
+                    url=job.book.url,
+                    session=self.session,
+                    cache=http_cache,
+                    conditional=job.conditional
+                )
+            except (requests.ConnectionError, requests.Timeout) as error:
+                logger.warning(f'Attempt {attempt} to fetch "{job.book.title}" failed. Error: {error}')
+                delay: float = self.backoff_seconds * 2 ** (attempt - 1)
+            else:
+                match response.status_code:
+                    case 200 | 304:
+                        self.fetch_stats.record(started_at=started_at, finished_at=time.time())
+                        return response if response.status_code == 200 else None
+                    case 429 | 500 | 502 | 503 | 504:
+                        logger.warning(f'Attempt {attempt} to fetch "{job.book.title}" failed. Status code: {response.status_code}')
+                        delay = get_retry_delay(response=response, default=self.backoff_seconds * 2 ** (attempt - 1))
+                    case _:
+                        raise Exception(f"Unable to make HTTP request. Status code: {response.status_code}")
+
+            if attempt < self.max_attempts:
+                time.sleep(delay)
+
+        raise Exception(f'Unable to fetch "{job.book.title}" after {self.max_attempts} attempts')
+
+    def run(self, jobs: list[ScrapeJob]) -> None:
+        failures: list[str] = []
+
+        with (
+            ThreadPoolExecutor(max_workers=self.fetch_workers) as fetchers,
+            ProcessPoolExecutor(max_workers=self.parse_workers) as parsers,
+            tqdm(total=len(jobs), desc="Scraping books...", unit="book") as progress_bar
+        ):
+            fetches: dict[Future[requests.Response | None], ScrapeJob] = {fetchers.submit(self.fetch, job): job for job in jobs}
+            parses: dict[Future[tuple[str, float, float]], tuple[ScrapeJob, requests.Response]] = {}
+
+            for future in as_completed(fetches):
+                job: ScrapeJob = fetches[future]
+                try:
+                    response: requests.Response | None = future.result()
+                except Exception as error:
+                    failures.append(f'"{job.book.title}" by {job.author_name} ({error})')
+                    _ = progress_bar.update(1)
+                    continue
+
+                if response == None:
+                    logger.success(f'"{job.book.title}" has not changed since it was scraped')
+                    _ = progress_bar.update(1)
+                else:
+                    parse = parsers.submit(
+                        timed_extract_text, response.text, job.book.url, job.book.initial_marker, job.book.terminal_marker, self.backend
+                    )
+                    parses[parse] = (job, response)
+
+            for future in as_completed(parses):
+                job, response = parses[future]
+                try:
+                    text, started_at, finished_at = future.result()
+                    save_text(file_path=job.file_path, text=text, url=job.book.url, response=response, cache=http_cache)
+                    raw_file_inventory.record(author_name=job.author_name, file_path=job.file_path, origin="scraper")
+                    self.parse_stats.record(started_at=started_at, finished_at=finished_at)
+                except Exception as error:
+                    failures.append(f'"{job.book.title}" by {job.author_name} ({error})')
+
+                _ = progress_bar.update(1)
+
+        self.fetch_stats.log()
+        self.parse_stats.log()
+
+        if len(failures) > 0:
+            raise Exception(f"Scraping of {len(failures)} books failed: {', '.join(failures)}")
+
+    def scrape_authors(self, authors: list[Author]) -> None:
+        self.run(jobs=self.collect_jobs(authors=authors))
+
+
+def get_retry_delay(response: requests.Response, default: float) -> float:
+    retry_after: str | None = response.headers.get("Retry-After")
+    return float(retry_after) if (retry_after != None and retry_after.isdigit()) else default
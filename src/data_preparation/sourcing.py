@@ -1,22 +1,21 @@
 import os
-import json
-import asyncio
+import hashlib
 import shutil
 import requests
-from glob import glob
 from pathlib import Path
 
 from tqdm import tqdm
 from loguru import logger
-from torrentp import TorrentDownloader
 
-from src.data_preparation.scraping import scrape 
-from src.setup.paths import CHROMA_DIR, DATA_DIR, OCR_IMAGES, IMAGES_IN_DOWNLOADS, make_fundamental_paths
+from src.setup.types import CacheEntry
+from src.data_preparation.caching import http_cache
+from src.data_preparation.utils import compute_file_hash
+from src.setup.paths import CHROMA_DIR, DATA_DIR, OCR_IMAGES, IMAGES_IN_DOWNLOADS, PARTIAL_DOWNLOADS, make_fundamental_paths
 
 
 def find_raw_data_for_author(author_name: str) -> Path:
-    from src.data_preparation.authors import prepare_sources
-    return [author.path_to_raw_data for author in prepare_sources() if author_name == author.name][0]
+    from src.data_preparation.authors import author_registry
+    return author_registry.get(name=author_name).path_to_raw_data
 
 
 class ViaScraper:
@@ -33,26 +32,7 @@ class ViaScraper:
         self.is_interview: bool = is_interview
         self.file_name: str = f"{self.title}.txt"
         self.initial_marker: str | None = initial_marker
-        self.terminal_marker: str | None = terminal_marker 
-
-    def download(self, author_name: str) -> None:
-
-        destination_path: Path = find_raw_data_for_author(author_name=author_name)
-        file_path: Path = destination_path.joinpath(f"{self.file_name}")
-        
-        if not Path(file_path).exists():
-            logger.warning(f'Attempting to scrape "{self.title}"')
-            
-            text: str | None = scrape(
-                url=self.url, 
-                initial_marker=self.initial_marker,
-                terminal_marker=self.terminal_marker
-            ) 
-
-            if isinstance(text, str):
-                _ = Path(file_path).write_text(text)
-            else:
-                raise Exception(f"Scraping of {self.title} failed")
+        self.terminal_marker: str | None = terminal_marker
 
 
 class ViaHTTP:
@@ -63,7 +43,8 @@ class ViaHTTP:
         format: str = "pdf",
         needs_ocr: bool = False, 
         start_page: int | None = None, 
-        end_page: int | None = None
+        end_page: int | None = None,
+        checksum: str | None = None
     ) -> None:
 
         self.title: str = title
@@ -72,75 +53,232 @@ class ViaHTTP:
         self.needs_ocr: bool = needs_ocr
         self.start_page: int | None = start_page
         self.end_page: int | None = end_page
+        self.checksum: str | None = checksum  # The expected SHA-256 digest of the file, where it is known 
         self.file_name: str = title.lower().replace(" ", "_") 
-        make_fundamental_paths()
-         
-    def download(self, file_path: str) -> None:
+
+    def download(
+        self, 
+        file_path: str, 
+        session: requests.Session | None = None, 
+        chunk_size: int = 64 * 1024,
+        max_attempts: int = 3
+    ) -> int | None:
+        """
+        Stream the book into a partial file in fixed-size chunks, resuming with a Range request if the connection 
+        drops, and only move it into place once its size (and checksum, if we know it) has been verified. If we 
+        already have a complete copy, a conditional request is made instead, so the book is only downloaded again 
+        if it has changed. A shared session can be provided so that requests reuse pooled keep-alive connections.
+
+        Returns:
+            int | None: the size of the file that was moved into place (0 if the saved copy is up to date), or None 
+                        if the download failed. A download that was resumed is counted in full, and so is one whose 
+                        partial file already held every byte (when the server answers the Range request with a 416).
+        """
         assert self.url != None
-        if not Path(file_path).exists():
-            logger.warning(f'Downloading "{self.title}"...')
+        make_fundamental_paths()
+        must_revalidate: bool = self.is_download_complete(file_path=file_path)
+
+        if must_revalidate and not http_cache.has_validators(url=self.url):
+            return 0  # There's nothing to check our copy against, so we keep it 
+
+        partial_path: Path = self.get_partial_path(file_path=file_path)
+        expected_size: int | None = None
+
+        for attempt in range(1, max_attempts + 1):
             try:
-                response = requests.get(url=self.url)
-                if response.status_code == 200:
-                    with open(file_path, mode="wb") as file:
-                        _ = file.write(response.content)
+                with self.request(partial_path=partial_path, session=session, conditional=must_revalidate) as response:
+                    if response.status_code == 304:
+                        logger.success(f'"{self.title}" has not changed since it was downloaded')
+                        return 0
+
+                    if attempt == 1:
+                        logger.warning(f'Downloading "{self.title}"...')
+
+                    must_revalidate = False  # Any retries should pick up from wherever this response leaves off 
+                    expected_size = get_expected_size(response=response)
 
-                    logger.success(f'Downloaded "{self.title}"')
-               
+                    self.write_response(response=response, partial_path=partial_path, chunk_size=chunk_size)
+                break
+
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError) as error:
+                logger.warning(f'Attempt {attempt} to download "{self.title}" was interrupted. Error: {error}')
             except Exception as error:
                 logger.error(f"Unable to download {self.title}. Error: {error}")
+                return None
+        else:
+            logger.error(f'Unable to download "{self.title}" after {max_attempts} attempts. Progress is kept for the next run.')
+            return None
+
+        if not self.verify_partial_download(partial_path=partial_path, expected_size=expected_size):
+            return None
+
+        os.replace(partial_path, file_path)
+        http_cache.complete_download(url=self.url, file_path=Path(file_path))
+        logger.success(f'Downloaded "{self.title}"')
+        return Path(file_path).stat().st_size
+
+    def request(self, partial_path: Path, session: requests.Session | None, conditional: bool) -> requests.Response:
+        assert self.url != None
+        bytes_already_present: int = partial_path.stat().st_size if partial_path.exists() else 0
+        headers: dict[str, str] = {"Accept-Encoding": "identity"}  # Byte ranges are only meaningful on the raw file
+
+        if conditional:
+            headers.update(http_cache.get_conditional_headers(url=self.url))
+
+        elif bytes_already_present > 0:
+            headers["Range"] = f"bytes={bytes_already_present}-"
+            partial_validator: str | int | None = http_cache.get_partial_validator(url=self.url)
+            if isinstance(partial_validator, str):
+                headers["If-Range"] = partial_validator
+
+        requester = session if session != None else requests
+        return requester.get(url=self.url, headers=headers, stream=True, timeout=60)
+
+    def write_response(self, response: requests.Response, partial_path: Path, chunk_size: int) -> None:
+        """
+        Write the response body into the partial file chunk by chunk.
+        """
+        assert self.url != None
+        match response.status_code:
+            case 206:
+                mode: str = "ab"
+                logger.info(f'Resuming "{self.title}" from {partial_path.stat().st_size} bytes')
+            case 200:
+                mode = "wb"  # Either a fresh download, or the file changed since we started on it
+            case 416:
+                return  # The partial file already holds every byte that the server has
+            case _:
+                raise Exception(f"Status code: {response.status_code}")
+
+        http_cache.store_partial_validators(url=self.url, response=response)
+
+        with open(partial_path, mode=mode) as file:
+            for chunk in response.iter_content(chunk_size=chunk_size):
+                _ = file.write(chunk)
+
+    def verify_partial_download(self, partial_path: Path, expected_size: int | None) -> bool:
+        size: int = partial_path.stat().st_size
+
+        if (expected_size != None) and (size != expected_size):
+            logger.error(f'"{self.title}" is {size} bytes long instead of {expected_size}. Progress is kept for the next run.')
+            return False
+
+        if (self.checksum != None) and (compute_file_hash(file_path=partial_path) != self.checksum):
+            logger.error(f'The checksum of "{self.title}" doesn\'t match the expected one. Discarding the download.')
+            os.remove(partial_path)
+            return False
+
+        return True
+
+    def is_download_complete(self, file_path: str) -> bool:
+        """
+        Check that the file is not just present, but also matches the checksum we expect, or failing that, 
+        the size that was recorded when it was downloaded. Files that predate these records are trusted as they are. 
+        """
+        assert self.url != None
+        if not Path(file_path).exists():
+            return False
+
+        if self.checksum != None:
+            matches: bool = compute_file_hash(file_path=file_path) == self.checksum
+        else:
+            entry: CacheEntry | None = http_cache.read(url=self.url)
+            recorded_size: str | int | None = None if entry == None else entry.get("size")
+            matches = recorded_size == None or recorded_size == Path(file_path).stat().st_size
+
+        if not matches:
+            logger.warning(f'The saved copy of "{self.title}" is incomplete or corrupted. It will be downloaded again.')
+
+        return matches
+
+    def get_partial_path(self, file_path: str) -> Path:
+        path_digest: str = hashlib.sha1(str(file_path).encode()).hexdigest()[:16]
+        return PARTIAL_DOWNLOADS.joinpath(f"{Path(file_path).name}.{path_digest}.part")
     
 
+def get_expected_size(response: requests.Response) -> int | None:
+    """
+    Work out the full size of the file from the Content-Range header of a partial response (e.g. "bytes 100-999/1000"), 
+    or from the Content-Length header of a complete one. 
+    """
+    content_range: str | None = response.headers.get("Content-Range")
+    content_length: str | None = response.headers.get("Content-Length")
+    is_compressed: bool = response.headers.get("Content-Encoding", "identity") != "identity"
+
+    if content_range != None and not content_range.endswith("/*"):
+        return int(content_range.rsplit("/", maxsplit=1)[-1])
+    elif content_length != None and response.status_code == 200 and not is_compressed:
+        return int(content_length)
+    else:
+        return None
+
+
 class ViaTorrent:
     def __init__(self, magnet: str) -> None:
         self.magnet: str = magnet 
 
-    def download(self, file_path: str):
-        torrent = TorrentDownloader(file_path=self.magnet, save_path=file_path)
-        asyncio.run(torrent.start_download())
-       
-    def extract_files(self, download_path: str, author_name: str) -> None:
+    def extract_files(self, download_path: str, author_name: str, destination_path: str | None = None) -> None:
+        """
+        Extract the books and images in the download in a single pass over it. Each file is added to the content
+        store, and linked into the author's directories from there, so that files that several torrents share
+        are only stored once. Files are logged in the author's manifests as soon as they have been extracted.
+        """
+        from src.data_preparation.inventory import raw_file_inventory
+        from src.data_preparation.storage import DownloadManifest, content_store, log_store_usage, scan_files
 
-        contents: list[str] = glob(download_path + "/**/*", recursive=True) 
-        files: list[str] = [object for object in contents if os.path.isfile(object)]
-        directories: list[str] = [object for object in contents if object not in files]
+        destination_dir: Path = Path(destination_path if destination_path != None else download_path)
+        author_image_dir: Path = IMAGES_IN_DOWNLOADS.joinpath(author_name)
         text_extensions: tuple[str, str, str, str, str] = ("txt", "pdf", "epub", "mobi", "azw3")
         image_extensions: tuple[str, str] = ("jpg", "png")
 
-        paths_of_downloaded_files: list[str] = []
-        paths_of_downloaded_images: list[str] = []
-        author_image_dir: Path = IMAGES_IN_DOWNLOADS.joinpath(author_name)
+        file_manifest = DownloadManifest(path=get_manifest_path(author_name=author_name, images=False))
+        image_manifest = DownloadManifest(path=get_manifest_path(author_name=author_name, images=True))
+        directories: list[str] = [entry.path for entry in os.scandir(download_path) if entry.is_dir(follow_symlinks=False)]
+
+        files_seen: int = 0
+        bytes_seen: int = 0
+        files_stored: int = 0
+        bytes_stored: int = 0
 
-        for file in tqdm(
-            iterable=files,
+        for entry in tqdm(
+            iterable=scan_files(root=Path(download_path)),
             desc="Extracting files of interest..."
         ):
-            file_base_name: str = os.path.basename(file)
-            file_is_text: bool = file.lower().endswith(text_extensions) 
-            file_is_image: bool = file.lower().endswith(image_extensions) 
-
-            if file_is_text: 
-                if not Path(download_path).joinpath(file_base_name).exists():
-                    shutil.move(file, download_path)
-
-                paths_of_downloaded_files.append(
-                    str(Path(download_path + f"/{file_base_name}"))
+            file_is_text: bool = entry.name.lower().endswith(text_extensions) 
+            file_is_image: bool = entry.name.lower().endswith(image_extensions) 
+
+            if not (file_is_text or file_is_image) or Path(entry.path).parent == destination_dir:
+                continue  # Files that were already sitting in the destination directory aren't part of the download
+
+            size: int = entry.stat().st_size
+            blob_path, digest, is_new = content_store.add(file_path=Path(entry.path))
+
+            files_seen += 1
+            bytes_seen += size
+            files_stored += int(is_new)
+            bytes_stored += size if is_new else 0
+
+            if file_is_text:
+                file_path: Path = content_store.link(
+                    blob_path=blob_path, 
+                    digest=digest, 
+                    destination_dir=destination_dir, 
+                    file_name=entry.name
                 )
 
-            elif file_is_image: 
-                if not Path(author_image_dir.joinpath(f"{file_base_name}")).exists():
-                    shutil.move(file, author_image_dir)
-
-                paths_of_downloaded_images.append(
-                    str(author_image_dir.joinpath(f"{file_base_name}"))
+                raw_file_inventory.record(author_name=author_name, file_path=file_path, origin="torrent")
+                file_manifest.append(file_path=file_path, digest=digest)
+            else:
+                image_path: Path = content_store.link(
+                    blob_path=blob_path, 
+                    digest=digest, 
+                    destination_dir=author_image_dir, 
+                    file_name=entry.name
                 )
-        
-        self.log_downloaded_files(
-            author_name=author_name, 
-            paths_of_downloaded_files=paths_of_downloaded_files,
-            paths_of_downloaded_images=paths_of_downloaded_images
-        )
 
+                image_manifest.append(file_path=image_path, digest=digest)
+
+        log_store_usage(files_seen=files_seen, bytes_seen=bytes_seen, files_stored=files_stored, bytes_stored=bytes_stored)
         self.remove_book_directories(directories=directories)
 
     @staticmethod
@@ -153,28 +291,12 @@ class ViaTorrent:
             if Path(directory).exists():
                 shutil.rmtree(directory)
 
-    def log_downloaded_files(
-        self, 
-        author_name: str, 
-        paths_of_downloaded_files: list[str],
-        paths_of_downloaded_images: list[str]
-    ) -> None:
-
-        author_path: Path = find_raw_data_for_author(author_name=author_name).parent
-        author_image_dir: Path = IMAGES_IN_DOWNLOADS.joinpath(author_name)
-
-        object_types_and_paths: dict[Path, list[str]] = {
-            author_path.joinpath("downloaded_files.json"): paths_of_downloaded_files,
-            author_image_dir.joinpath("downloaded_images.json"): paths_of_downloaded_images 
-        }
-
-        for path, logs in object_types_and_paths.items(): 
-
-            if Path(path).exists():
-                os.remove(path)
 
-            with open(path, mode="w") as file:
-                json.dump(logs, file)
+def get_manifest_path(author_name: str, images: bool) -> Path:
+    if images:
+        return IMAGES_IN_DOWNLOADS.joinpath(author_name, "downloaded_images.jsonl")
+    else:
+        return find_raw_data_for_author(author_name=author_name).parent.joinpath("downloaded_files.jsonl")
 
 
 class Author:
@@ -194,91 +316,97 @@ class Author:
         self.books_via_torrent: list[ViaTorrent] | None = books_via_torrent 
         self.books_via_scraper: list[ViaScraper] | None = books_via_scraper 
         self.biographers_and_compilers: list[str] | None = biographers_and_compilers
+        self.paths_made: bool = False  # The author's directories are only created once the author is actually used
 
-        self.make_paths()
-
-        self.file_paths: list[Path] = [
-            self.path_to_raw_data.joinpath(file) for file in os.listdir(self.path_to_raw_data) if 
-                self.path_to_raw_data.joinpath(file).is_file()  
-                # Might seem unecessary if you assume that the directory will only ever contain files, but
-                # I'm not willing to assume that.
-        ]
+    @property
+    def file_paths(self) -> list[Path]:
+        from src.data_preparation.inventory import raw_file_inventory
+        return raw_file_inventory.get_file_paths(author=self)
 
     def download_books(self) -> None:
+        """
+        Download the author's books by each of the methods for which books have been provided.
+
+        Raises an exception if any book that was to be downloaded over HTTP, or any torrent, could not be downloaded,
+        so that the downloads are not considered complete.
+        """
+        failures: list[str] = []
 
         match (self.books_via_http != None, self.books_via_torrent != None, self.books_via_scraper != None):
 
             case (True, True, True):
-                self.download_via_http()
+                failures += self.download_via_http()
                 self.download_via_scraper()
-                self.download_via_torrents()
+                failures += self.download_via_torrents()
 
             case (True, False, False): 
-                self.download_via_http()
+                failures += self.download_via_http()
             case (False, True, False):
-                self.download_via_torrents()
+                failures += self.download_via_torrents()
             case(False, False, True):
                 self.download_via_scraper()
 
             case(False, True, True):
-                self.download_via_torrents()
+                failures += self.download_via_torrents()
                 self.download_via_scraper()
             case(True, False, True):
-                self.download_via_http()
+                failures += self.download_via_http()
                 self.download_via_scraper()
             case (True, True, False): 
-                self.download_via_http()
-                self.download_via_torrents()
+                failures += self.download_via_http()
+                failures += self.download_via_torrents()
 
             case (False, False, False):
                 raise Exception(f"Across download methods, no information on any books have been provided for {self.name}") 
 
-    def download_via_http(self) -> None: 
+        if len(failures) > 0:
+            raise Exception(f"Failed to download {len(failures)} of {self.name}'s sources: {', '.join(failures)}")
+
+    def download_via_http(self) -> list[str]: 
+        from src.data_preparation.downloading import DownloadScheduler, DownloadTotals
         assert self.books_via_http != None
 
-        book_paths: list[str] = []
-        for book in self.books_via_http:
-            file_path: Path = self.path_to_raw_data.joinpath(f"{book.file_name}.pdf")
-            book.download(file_path=str(file_path))
-            book_paths.append(str(file_path))
+        scheduler = DownloadScheduler()
+        totals: DownloadTotals = scheduler.download_authors(authors=[self])
+        return totals.failed
 
-    def download_via_torrents(self) -> None:
+    def download_via_torrents(self) -> list[str]:
+        from src.data_preparation.torrenting import TorrentManager
         assert self.books_via_torrent != None
-        
-        for book in self.books_via_torrent:
-            if self.must_torrent():
-                self.leech(book=book)
+
+        manager = TorrentManager()
+        return manager.download_authors(authors=[self])
 
     def download_via_scraper(self) -> None:
+        from src.data_preparation.scraping_pipeline import ScrapingPipeline
         assert self.books_via_scraper != None
 
-        for book in self.books_via_scraper:
-            book.download(author_name=self.name)
+        pipeline = ScrapingPipeline()
+        pipeline.scrape_authors(authors=[self])
 
     def must_torrent(self) -> bool:
-        contents: list[str] = glob(str(self.path_to_raw_data) + "/**/*", recursive=True) 
-        files_only: list[str] = [object for object in contents if os.path.isfile(object)]
-        log_path: Path = self.path_to_data.joinpath("downloaded_files.json")
+        from src.data_preparation.inventory import raw_file_inventory
+        from src.data_preparation.storage import DownloadManifest
+        manifest = DownloadManifest(path=self.path_to_data.joinpath("downloaded_files.jsonl"))
 
-        if not Path(log_path).exists():
+        if not manifest.exists():
             return True
         else:
-            with open(log_path, mode="r", encoding="utf-8") as file:
-                logged_paths: list[str] = json.load(file)
+            logged_paths: list[str] = manifest.read()
+            available_paths: set[str] = {str(path) for path in raw_file_inventory.get_file_paths(author=self)}
             
-            if (len(files_only) == len(logged_paths)) and len(logged_paths) != 0:
+            if all(path in available_paths for path in logged_paths) and len(logged_paths) != 0:
                 logger.success(f"All files associated with {self.name} are available")
                 return False
             else:
                 logger.warning(f"Some of {self.name}'s files are missing.")
                 return True
 
-    def leech(self, book: ViaTorrent):
-        book.download(file_path=str(self.path_to_raw_data))
-        book.extract_files(download_path=str(self.path_to_raw_data), author_name=self.name)
-
     def make_paths(self):
+        if self.paths_made:
+            return
 
+        make_fundamental_paths()
         paths_to_create: list[Path] = [
             self.path_to_data,
             self.path_to_raw_data,
@@ -291,3 +419,5 @@ class Author:
             if not Path(path).exists():
                 os.mkdir(path=path)
 
+        self.paths_made = True
+
@@ -0,0 +1,139 @@
+"""
+Contains a content-addressed store for the files that we extract from torrents, and the manifests that record
+which files each author's torrents gave us. Every distinct file is stored once (under its SHA-256), and appears
+in the directories of the authors that need it as a hard link to the stored copy, so the space that extracted
+files take up grows with the amount of distinct content rather than with how many torrents contain it.
+"""
+import os
+import json
+import shutil
+import threading
+from pathlib import Path
+from collections.abc import Iterator
+
+from loguru import logger
+
+from src.setup.paths import CONTENT_STORE
+from src.data_preparation.utils import compute_file_hash
+
+
+class ContentStore:
+    def __init__(self, store_dir: Path = CONTENT_STORE) -> None:
+        self.store_dir: Path = store_dir
+        self.lock: threading.Lock = threading.Lock()
+
+    def get_blob_path(self, digest: str, extension: str) -> Path:
+        return self.store_dir.joinpath(digest[:2], digest + extension.lower())
+
+    def add(self, file_path: Path) -> tuple[Path, str, bool]:
+        """
+        Move the file into the store, unless a file with the same contents is already there, in which case the
+        file is simply deleted.
+
+        Returns:
+            tuple[Path, str, bool]: the path of the stored copy, the SHA-256 of its contents, and whether those
+                                    contents are new to the store.
+        """
+        digest: str = compute_file_hash(file_path=file_path)
+        blob_path: Path = self.get_blob_path(digest=digest, extension=file_path.suffix)
+
+        with self.lock:
+            if blob_path.exists():
+                os.remove(file_path)
+                return blob_path, digest, False
+
+            os.makedirs(blob_path.parent, exist_ok=True)
+            _ = shutil.move(file_path, blob_path)
+            return blob_path, digest, True
+
+    def link(self, blob_path: Path, digest: str, destination_dir: Path, file_name: str) -> Path:
+        """
+        Make the stored file available under the given name in the destination directory. If that name is
+        already taken by a file with different contents, the new file is given a name that includes (part of) its
+        hash instead of being dropped.
+        """
+        destination: Path = destination_dir.joinpath(file_name)
+
+        with self.lock:
+            if destination.exists():
+                if is_same_content(path=destination, blob_path=blob_path, digest=digest):
+                    return destination
+
+                destination = destination_dir.joinpath(f"{destination.stem} ({digest[:8]}){destination.suffix}")
+                if destination.exists():
+                    return destination
+
+            try:
+                os.link(blob_path, destination)
+            except OSError:  # The store and the destination are on different filesystems
+                _ = shutil.copy2(blob_path, destination)
+
+        return destination
+
+
+class DownloadManifest:
+    """
+    An append-only record (in JSON Lines) of the files that were extracted for an author, written as each file
+    is extracted, so that an interrupted extraction still leaves a record of what it got through.
+    """
+    def __init__(self, path: Path) -> None:
+        self.path: Path = path
+        self.lock: threading.Lock = threading.Lock()
+
+    def append(self, file_path: Path, digest: str) -> None:
+        with self.lock, open(self.path, mode="a", encoding="utf-8") as file:
+            _ = file.write(json.dumps({"path": str(file_path), "sha256": digest}) + "\n")
+
+    def read(self) -> list[str]:
+        """
+        Returns:
+            list[str]: the paths of the logged files, including those in the JSON log that preceded this manifest.
+        """
+        paths: list[str] = []
+        legacy_path: Path = self.path.with_suffix(".json")
+
+        if legacy_path.exists():
+            with open(legacy_path, mode="r", encoding="utf-8") as file:
+                paths.extend(json.load(file))
+
+        if self.path.exists():
+            with open(self.path, mode="r", encoding="utf-8") as file:
+                paths.extend(json.loads(line)["path"] for line in file if line.strip() != "")
+
+        return list(dict.fromkeys(paths))
+
+    def exists(self) -> bool:
+        return self.path.exists() or self.path.with_suffix(".json").exists()
+
+
+def scan_files(root: Path) -> Iterator[os.DirEntry[str]]:
+    """
+    Walk the directory tree in a single pass, yielding each of the files in it.
+    """
+    pending: list[Path | str] = [root]
+    while len(pending) > 0:
+        with os.scandir(pending.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry
+
+
+def is_same_content(path: Path, blob_path: Path, digest: str) -> bool:
+    if os.path.samefile(path, blob_path):
+        return True
+    elif path.stat().st_size != blob_path.stat().st_size:
+        return False
+    else:
+        return compute_file_hash(file_path=path) == digest
+
+
+def log_store_usage(files_seen: int, bytes_seen: int, files_stored: int, bytes_stored: int) -> None:
+    logger.info(
+        f"Extracted {files_seen} files ({bytes_seen / 1024**2:.1f} MB), of which {files_stored} "
+        f"({bytes_stored / 1024**2:.1f} MB) had contents that weren't already stored"
+    )
+
+
+content_store = ContentStore()
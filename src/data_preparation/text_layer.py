@@ -0,0 +1,77 @@
+"""
+Contains a quick pre-pass over the pages of a PDF, which decides from each page's text layer whether the page can
+be read as it is, or whether it is only an image of text that has to go through OCR. A page needs OCR if it
+contains images, and the text that pypdf extracts from it is too sparse for the size of the page (few glyphs per
+square inch), or is mostly made up of characters that don't belong in words (which is what fonts with broken
+encodings produce). Scans are recorded by the contents of the PDF, so each version of a file is only scanned once.
+"""
+from pathlib import Path
+
+from pypdf import PdfReader, PageObject
+from pypdf.generic import DictionaryObject
+
+from src.data_preparation.checkpoints import ocr_pages
+from src.data_preparation.utils import compute_file_hash
+
+
+class TextLayerScanner:
+    def __init__(self, min_glyph_density: float = 1.0, min_word_character_ratio: float = 0.6) -> None:
+        """
+        Args:
+            min_glyph_density: the number of (non-whitespace) characters per square inch of the page below which
+                               the page's text layer is considered to be missing. A page of prose has around 25.
+            min_word_character_ratio: the share of those characters that must be letters or digits for the text
+                                      layer to be considered legible.
+        """
+        self.min_glyph_density: float = min_glyph_density
+        self.min_word_character_ratio: float = min_word_character_ratio
+        self.settings: str = f"density={min_glyph_density};ratio={min_word_character_ratio}"
+
+    def scan(self, pdf_path: Path, book_sha256: str | None = None) -> list[int]:
+        """
+        Returns:
+            list[int]: the (1-indexed) numbers of the pages of the PDF that need OCR.
+        """
+        book_sha256 = book_sha256 or compute_file_hash(pdf_path)
+        pages_needing_ocr: list[int] | None = ocr_pages.get_scan(book_sha256=book_sha256, settings=self.settings)
+
+        if pages_needing_ocr == None:
+            reader = PdfReader(pdf_path)
+            pages_needing_ocr = [
+                page_number for page_number, page in enumerate(reader.pages, start=1) if self.page_needs_ocr(page=page)
+            ]
+            ocr_pages.store_scan(book_sha256=book_sha256, settings=self.settings, pages_needing_ocr=pages_needing_ocr)
+
+        return pages_needing_ocr
+
+    def page_needs_ocr(self, page: PageObject) -> bool:
+        if not has_images(page=page):
+            return False  # There is nothing on the page that OCR could read
+
+        characters: list[str] = [character for character in page.extract_text() if not character.isspace()]
+        area_in_square_inches: float = float(page.mediabox.width) * float(page.mediabox.height) / 72**2
+
+        if len(characters) / max(area_in_square_inches, 1e-9) < self.min_glyph_density:
+            return True
+
+        word_characters: int = sum(character.isalnum() for character in characters)
+        return word_characters / len(characters) < self.min_word_character_ratio
+
+
+def has_images(page: PageObject) -> bool:
+    """
+    Check the objects that the page draws for images, without decoding any of them. Forms are counted as images,
+    since scanners often wrap the image of each page in one. The page's resources, and its dictionary of objects,
+    are usually indirect references, which have to be resolved before they can be looked into.
+    """
+    resources = page.get("/Resources")
+    resources = resources.get_object() if resources != None else None
+    if not isinstance(resources, DictionaryObject):
+        return False
+
+    x_objects = resources.get("/XObject")
+    x_objects = x_objects.get_object() if x_objects != None else None
+    if not isinstance(x_objects, DictionaryObject):
+        return False
+
+    return any(x_object.get_object().get("/Subtype") in ["/Image", "/Form"] for x_object in x_objects.values())
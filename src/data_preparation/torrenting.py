@@ -0,0 +1,168 @@
+"""
+Contains a manager that downloads every pending torrent (across authors) in a single libtorrent session driven
+by one event loop, so that the torrents share bandwidth and peers instead of being downloaded one after another.
+The files of each torrent are extracted as soon as that torrent finishes, while the others carry on downloading.
+"""
+import os
+import time
+import shutil
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+
+import libtorrent as lt
+from loguru import logger
+
+from src.data_preparation.sourcing import Author, ViaTorrent
+from src.data_preparation.utils import StageStats
+
+
+class TorrentJob:
+    def __init__(self, author: Author, torrent: ViaTorrent) -> None:
+        self.author: Author = author
+        self.torrent: ViaTorrent = torrent
+        self.name: str = torrent.magnet[:60]
+
+        # Each torrent is downloaded into a directory of its own, so that it can be extracted without touching
+        # the files of torrents that are still downloading.
+        magnet_digest: str = hashlib.sha1(torrent.magnet.encode()).hexdigest()[:12]
+        self.staging_path: Path = author.path_to_data.joinpath("torrents", magnet_digest)
+
+        self.progress: float = 0
+        self.bytes_downloaded: int = 0
+        self.download_rate: int = 0
+        self.finished: bool = False
+
+
+class TorrentManager:
+    def __init__(
+        self,
+        max_active_torrents: int = 4,
+        poll_seconds: float = 2,
+        report_seconds: float = 30,
+        port: int = 0,
+        session: lt.session | None = None
+    ) -> None:
+
+        self.max_active_torrents: int = max_active_torrents
+        self.poll_seconds: float = poll_seconds
+        self.report_seconds: float = report_seconds
+
+        # By default, the system picks a free port for the session, so that the sessions that ingest's processes
+        # open at the same time don't all try to listen on the same one.
+        self.session: lt.session = session if session != None else lt.session({"listen_interfaces": f"0.0.0.0:{port}"})
+        self.extraction_locks: dict[str, threading.Lock] = {}
+
+        self.download_stats = StageStats(name="Torrent downloads", unit="torrents")
+        self.extraction_stats = StageStats(name="Torrent extraction", unit="torrents")
+
+    @staticmethod
+    def collect_jobs(authors: list[Author]) -> list[TorrentJob]:
+        jobs: list[TorrentJob] = []
+        for author in authors:
+            if author.books_via_torrent != None and author.must_torrent():
+                jobs.extend(TorrentJob(author=author, torrent=torrent) for torrent in author.books_via_torrent)
+
+        return jobs
+
+    async def download(self, job: TorrentJob) -> None:
+        """
+        Add the torrent to the shared session and follow its progress until it has been fully downloaded.
+        """
+        parameters: lt.add_torrent_params = lt.parse_magnet_uri(job.torrent.magnet)
+        parameters.save_path = str(job.staging_path)
+        handle: lt.torrent_handle = self.session.add_torrent(parameters)
+
+        try:
+            while True:
+                status: lt.torrent_status = handle.status()
+                job.progress = status.progress
+                job.bytes_downloaded = status.total_done
+                job.download_rate = status.download_rate
+
+                if status.is_seeding or status.is_finished:
+                    break
+
+                await asyncio.sleep(self.poll_seconds)
+        finally:
+            self.session.remove_torrent(handle)
+
+    def extract(self, job: TorrentJob) -> None:
+        lock: threading.Lock = self.extraction_locks.setdefault(job.author.name, threading.Lock())
+
+        with lock:  # Torrents of the same author are extracted into the same directory
+            started_at: float = time.time()
+            job.torrent.extract_files(
+                download_path=str(job.staging_path),
+                author_name=job.author.name,
+                destination_path=str(job.author.path_to_raw_data)
+            )
+
+            shutil.rmtree(job.staging_path)
+            self.extraction_stats.record(started_at=started_at, finished_at=time.time())
+
+    async def run_job(self, job: TorrentJob, semaphore: asyncio.Semaphore) -> None:
+        async with semaphore:
+            os.makedirs(job.staging_path, exist_ok=True)
+            started_at: float = time.time()
+            await self.download(job=job)
+            job.finished = True
+            self.download_stats.record(started_at=started_at, finished_at=time.time())
+            logger.success(f"Finished downloading a torrent for {job.author.name}: {job.name}")
+
+        # This happens outside the semaphore, so that the next torrent can start downloading during extraction
+        await asyncio.to_thread(self.extract, job)
+
+    async def report_progress(self, jobs: list[TorrentJob], started_at: float) -> None:
+        while True:
+            await asyncio.sleep(self.report_seconds)
+            for job in jobs:
+                if 0 < job.progress and not job.finished:
+                    logger.info(
+                        f"{job.author.name} | {job.name}: {job.progress * 100:.1f}% "
+                        f"({job.bytes_downloaded / 1024**2:.1f} MB at {job.download_rate / 1024:.1f} KB/s)"
+                    )
+
+            log_throughput(jobs=jobs, seconds_elapsed=time.time() - started_at)
+
+    async def run(self, jobs: list[TorrentJob]) -> list[str]:
+        """
+        Download (and extract) the torrents, a few at a time.
+
+        Returns:
+            list[str]: a description of each torrent that could not be downloaded or extracted.
+        """
+        started_at: float = time.time()
+        semaphore = asyncio.Semaphore(value=self.max_active_torrents)
+        reporter: asyncio.Task[None] = asyncio.create_task(self.report_progress(jobs=jobs, started_at=started_at))
+
+        outcomes: list[None | BaseException] = await asyncio.gather(
+            *(self.run_job(job=job, semaphore=semaphore) for job in jobs), return_exceptions=True
+        )
+
+        _ = reporter.cancel()
+        failed: list[str] = []
+        for job, outcome in zip(jobs, outcomes):
+            if isinstance(outcome, BaseException):
+                logger.error(f"Unable to download a torrent for {job.author.name} ({job.name}). Error: {outcome}")
+                failed.append(f"the torrent {job.name} for {job.author.name}")
+
+        log_throughput(jobs=jobs, seconds_elapsed=time.time() - started_at)
+        self.download_stats.log()
+        self.extraction_stats.log()
+        return failed
+
+    def download_authors(self, authors: list[Author]) -> list[str]:
+        jobs: list[TorrentJob] = self.collect_jobs(authors=authors)
+        return asyncio.run(self.run(jobs=jobs)) if len(jobs) > 0 else []
+
+
+def log_throughput(jobs: list[TorrentJob], seconds_elapsed: float) -> None:
+    megabytes: float = sum(job.bytes_downloaded for job in jobs) / 1024**2
+    finished_jobs: int = len([job for job in jobs if job.finished])
+
+    logger.info(
+        f"{finished_jobs}/{len(jobs)} torrents finished | {megabytes:.1f} MB downloaded at "
+        f"{megabytes / max(seconds_elapsed, 1e-9):.2f} MB/s overall"
+    )
@@ -1,3 +1,18 @@
+import hashlib
+import threading
+from pathlib import Path
+
+from loguru import logger
+
+
+def compute_file_hash(file_path: Path | str, algorithm: str = "sha256", chunk_size: int = 1024**2) -> str:
+    digest = hashlib.new(algorithm)
+    with open(file_path, mode="rb") as file:
+        while chunk := file.read(chunk_size):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
 def get_file_extension(file_name_or_path: str) -> str:
     extension_place: int = get_place_of_extension(file_name_or_path=file_name_or_path)
     return file_name_or_path[-extension_place:] 
@@ -16,3 +31,42 @@ def get_place_of_extension(file_name_or_path: str) -> int:
         assert is_pdf_or_txt, f"{file_name_or_path} is neither a .mobi, .epub, .txt nor .pdf file. Unable to return the location of the extension"
         return 4
 
+
+
+class StageStats:
+    """
+    Collects the latency of each item that passes through a stage of a pipeline, so that the throughput and 
+    latency of the stage can be reported once the pipeline has run.
+    """
+    def __init__(self, name: str, unit: str = "items") -> None:
+        self.name: str = name
+        self.unit: str = unit
+        self.units_processed: int = 0
+        self.latencies: list[float] = []
+        self.first_start: float | None = None
+        self.last_finish: float | None = None
+        self.lock: threading.Lock = threading.Lock()
+
+    def record(self, started_at: float, finished_at: float, units: int = 1) -> None:
+        with self.lock:
+            self.units_processed += units
+            self.latencies.append(finished_at - started_at)
+            self.first_start = started_at if self.first_start == None else min(self.first_start, started_at)
+            self.last_finish = finished_at if self.last_finish == None else max(self.last_finish, finished_at)
+
+    def get_throughput(self) -> float:
+        if self.first_start == None or self.last_finish == None or self.last_finish == self.first_start:
+            return 0
+        return self.units_processed / (self.last_finish - self.first_start)
+
+    def get_percentile(self, percentile: float) -> float:
+        if len(self.latencies) == 0:
+            return 0
+        ordered_latencies: list[float] = sorted(self.latencies)
+        return ordered_latencies[min(len(ordered_latencies) - 1, int(percentile * len(ordered_latencies)))]
+
+    def log(self) -> None:
+        logger.info(
+            f"{self.name}: {self.units_processed} {self.unit} at {self.get_throughput():.2f} {self.unit}/s | "
+            f"latency p50={self.get_percentile(0.5):.3f}s, p95={self.get_percentile(0.95):.3f}s, max={self.get_percentile(1):.3f}s"
+        )
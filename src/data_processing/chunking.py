@@ -1,3 +1,5 @@
+from functools import cache
+
 from loguru import logger
 from langchain_core.documents import Document
 from sentence_transformers import SentenceTransformer    
@@ -50,6 +52,7 @@ def split_documents(documents: list[Document]) -> list[Document]:
     return chunks
 
 
+@cache
 def get_max_sequence_length(embedding_model_name: str = embed_config.embedding_model_name) -> int:
     """
     Determine the maximum sequence length of the embedding model and return it 
@@ -89,6 +92,7 @@ def some_pages_too_big_for_embedding(max_seq_length: int, documents: list[Docume
         return False 
 
 
+@cache
 def get_tokenizer(name: str = embed_config.embedding_model_name) -> PreTrainedTokenizer:
     return AutoTokenizer.from_pretrained(pretrained_model_name_or_path=name)
 
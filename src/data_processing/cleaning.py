@@ -1,223 +1,136 @@
 """
 Contains code that cleans the raw text in the documents of a given book
 """
+import json
 from pathlib import Path
+from collections.abc import Iterable
 from loguru import logger
 from langchain_core.documents import Document
-from langchain_community.document_loaders import PyPDFLoader
 
 from src.data_preparation.ocr import OCRModule
 from src.data_preparation.sourcing import Author
-from src.data_processing.reading import TextParser 
-from src.data_preparation.utils import get_file_extension
-from src.data_preparation.management import VersionManager
+from src.data_processing.reading import read_books, read_chapters, read_pdf_pages, read_pdfs
+from src.data_processing.normalization import Normalizer
+from src.data_preparation.books import BookIndex, BookRecord, get_book_index
 
 
 class Cleaner:
-    def __init__(self, author: Author):
+    def __init__(self, author: Author, workers: int | None = None):
         self.author: Author = author
-        self.ocr_object: OCRModule = OCRModule(author=self.author)
-        self.ocr_object.extract_text_from_images()
-
-    def get_file_name(self, file_path: Path) -> str:
-        manager = VersionManager(author=self.author)
-        matching_file_name: list[str] = [file_name for file_name in manager.file_names if file_name in str(file_path)]
-
-        # This assert statement is temporary, and will be replaced by the code that eliminates duplicates (once it works the way I want) 
-        assert len(matching_file_name) == 1, f"There is more than one file called {matching_file_name} in {self.author.path_to_raw_data}"
-        return matching_file_name[0]
-
-    def get_core_pages(self, file_name: str) -> range | None:
-        if self.author.books_via_http:
-            for book in self.author.books_via_http:
-                if (file_name in book.file_name) and (book.start_page and book.end_page):
-                    return range(book.start_page, book.end_page)
-        else:
-            logger.warning(f"{self.author.name} has no texts that contain have specified start and end pages")
-
-    def get_path_to_text_after_ocr(self, file_name: str) -> Path:
-        file_extension: str = get_file_extension(file_name_or_path=file_name)
-        path_to_text_after_ocr: Path = self.ocr_object.path_to_text_after_ocr
-        return path_to_text_after_ocr.joinpath(file_name + file_extension)
-
-    def file_requires_ocr(self, file_name: str) -> bool:
-
-        names_of_files_requiring_ocr: list[str] = []
-        if self.author.books_via_http != None:
-            for book in self.author.books_via_http:
-                if book.needs_ocr:
-                    names_of_files_requiring_ocr.append(book.file_name)
-        else:
-            logger.warning(f"{self.author.name} has no texts that require OCR")
-
-        return True if file_name in names_of_files_requiring_ocr else False
+        self.workers: int | None = workers  # The number of processes that PDFs, EPUB and MOBI files are read in
+        self.ocr_object: OCRModule = OCRModule(author=self.author)  # Only used to find the output of OCR, which has to be run beforehand
+        self.book_index: BookIndex = get_book_index(author=self.author)
+        self.normalizer: Normalizer = Normalizer.for_author(author=self.author)
 
     def execute(self) -> list[Document] | None:
         logger.info(f"Cleaning the texts by {self.author.name}")
 
         author_documents: list[Document] = []
-        for file_path in self.author.file_paths:
-            file_name: str = self.get_file_name(file_path=file_path)
-
-            if self.file_requires_ocr(file_name=file_name):
-                file_path: Path = self.get_path_to_text_after_ocr(file_name=file_name)  # We clean the version of the document that has been processed by OCR instead of the original 
-                extension = get_file_extension(file_name_or_path=str(file_path))
-            else:
-                extension = get_file_extension(file_name_or_path=file_name)
-
-            try:
-                core_pages: bool | range | None = look_up_core_pages(author=self.author, file_name=file_name, target="values") 
-            except Exception as error:
-                raise(error)
-
-            if extension == ".pdf": 
-                assert isinstance(core_pages, range) or (core_pages == None)
-                documents = self.clean_pdf(file_path=file_path, core_pages=core_pages)
-                author_documents.extend(documents)
-
-            elif (extension == ".epub") or (extension == ".mobi"): 
-                documents = self.clean_epub_or_mobi(extension=extension)
-                author_documents.extend(documents)
-
-            elif (extension == ".txt"):
-                with open(file_path, mode="r") as txt_file:
-                    raw_text: str = txt_file.read()
-                    
-                documents = [Document(page_content=raw_text)] 
-                documents = self.perform_cleaning(documents)
-                author_documents.extend(documents)
+        ebook_paths: list[Path] = []
+        pdfs: list[tuple[Path, range | None]] = []
 
+        for file_path in self.author.file_paths:
+            file_format: str = self.book_index.get(file_name=file_path.name).format
+
+            if file_format in [".epub", ".mobi"]:
+                ebook_paths.append(file_path)
+                continue
+            elif file_format not in [".pdf", ".txt"]:
+                logger.warning(f"Skipping {file_path.name}, since no cleaning process has been implemented for {file_format or 'extensionless'} files")
+                continue
+
+            source_path, extension, core_pages = self.find_text(file_path=file_path)
+            if extension == ".pdf":
+                pdfs.append((source_path, core_pages))
             else:
-                raise NotImplementedError(f"Cleaning halted at {file_path}. No cleaning process implemented for {extension} files")
+                author_documents.extend(self.clean_file(file_path=file_path))
 
-        return author_documents
+        for _, pages in read_pdfs(pdfs=pdfs, workers=self.workers):
+            author_documents.extend(self.perform_cleaning(documents=pages))
 
-    def clean_pdf(self, file_path: Path, core_pages: range | None) -> list[Document]:
+        for _, chapters in read_books(paths=ebook_paths, workers=self.workers):
+            author_documents.extend(self.perform_cleaning(documents=chapters))
 
-        loader = PyPDFLoader(file_path=file_path)
-        pages: list[Document] = loader.load()
+        return author_documents
 
-        if core_pages:
-            pages: list[Document] = self.remove_non_core_pages(documents=pages, core_pages=core_pages) 
+    def find_text(self, file_path: Path) -> tuple[Path, str, range | None]:
+        """
+        Find the file that the text of a raw file is to be cleaned from: the pages that OCR wrote, if the file
+        needed OCR and the current version of it has been through it (for its current core pages, with the current
+        settings), and the raw file itself otherwise.
 
-        return self.perform_cleaning(documents=pages)
+        Returns:
+            tuple[Path, str, range | None]: the path of that file, its extension, and its (0-indexed) pages to clean
+                                            (None for all of them).
+        """
+        book: BookRecord = self.book_index.get(file_name=file_path.name)
+        requires_ocr: bool = self.ocr_object.requires_ocr(file_path=file_path)
 
-    def clean_epub_or_mobi(self, extension: str) -> list[Document]:
+        if requires_ocr and self.ocr_object.has_current_output(file_path=file_path):
+            # The text of each (core) page as OCR left it, so the merged output of OCR needn't be parsed again
+            return self.ocr_object.get_pages_path(file_path=file_path), ".jsonl", None
 
-        documents: list[Document] = []
-        assert extension in [".epub", ".mobi"]
-        parser = TextParser(author=self.author, extension=extension)
-        
-        if parser.has_files():
-            file: list[Path] = parser.get_files()
-            text: str = parser.parse(path=str(file))
-            document = Document(page_content=text)
-            documents.append(document)
+        if requires_ocr:
+            logger.warning(f"{book.file_name} has pages that need OCR, but (this version of it) hasn't been through it yet, so its text may be incomplete")
 
-        return self.perform_cleaning(documents=documents) 
+        return file_path, book.format, book.core_pages
 
-    def perform_cleaning(self, documents: list[Document]) -> list[Document]: 
+    def clean_file(self, file_path: Path) -> list[Document]:
+        source_path, extension, core_pages = self.find_text(file_path=file_path)
 
-        documents_without_new_lines: list[Document] = self.remove_new_line_markers(documents=documents)
-        
-        for document in documents_without_new_lines:
-            document.page_content = self.fix_known_spelling_issues(text=document.page_content)
+        if extension == ".jsonl":
+            return self.perform_cleaning(documents=read_pages_after_ocr(pages_path=source_path, source=file_path))
 
-        return documents_without_new_lines 
+        elif extension == ".pdf": 
+            assert isinstance(core_pages, range) or (core_pages == None)
+            return self.clean_pdf(file_path=source_path, core_pages=core_pages)
 
-    @staticmethod
-    def remove_non_core_pages(documents: list[Document], core_pages: range) -> list[Document]:
-        """
-        Scan all the Document objects in a given book, and remove those that come from most pages that are not core
-        to the book in question.
+        elif (extension == ".epub") or (extension == ".mobi"): 
+            return self.clean_epub_or_mobi(file_path=source_path)
 
-        Args:
-            documents: list of Document objects representing the information of each page of a given book
-            book: the book whose text we are cleaning
+        elif (extension == ".txt"):
+            with open(source_path, mode="r") as txt_file:
+                raw_text: str = txt_file.read()
+                
+            documents = [Document(page_content=raw_text)] 
+            return self.perform_cleaning(documents)
 
-        Returns:
-           list[Document]: list of Document objects that contain the information of the core pages of the book. 
-        """
-        for document in documents:
-            metadata: dict[str, str | int] = document.metadata
-            if metadata["page"] not in core_pages: 
-                documents.remove(document)
-
-        return documents 
+        else:
+            raise NotImplementedError(f"Cleaning halted at {source_path}. No cleaning process implemented for {extension} files")
 
-    def fix_known_spelling_issues(self, text: str) -> str:
+    def clean_pdf(self, file_path: Path, core_pages: range | None) -> list[Document]:
         """
-        Replace a target string with a preferred one.
-
-        Args:
-            text: the text to be searched for the target string
-
-        Returns:
-           str: the string following all the changes. 
+        Clean the text of the core pages of the PDF (or of every page, if its core pages weren't specified). Only
+        those pages are decoded, and each one is cleaned as soon as it has been read.
         """
-        if "kwame nkrumah" == self.author.name.lower(): # Because Nkrumah is currently the only person for whom I have identified such issues. 
-            target_strings_and_replacements = {
-                r"\xad": "", 
-                "19 66": "1966",
-                "I 966": "1966",
-                "Cl.A": "C.I.A",
-                r"\'coup\'": "coup",
-                "fkunkeys": "flunkeys" 
-            }
+        return self.perform_cleaning(documents=read_pdf_pages(path=file_path, pages=core_pages))
 
-            for target_string in target_strings_and_replacements.keys():
-                replacement = target_strings_and_replacements[target_string]
-                text = text.replace(target_string, replacement)
+    def clean_epub_or_mobi(self, file_path: Path) -> list[Document]:
+        chapters: list[Document] = list(read_chapters(path=file_path))
+        return self.perform_cleaning(documents=chapters) 
 
-        return text 
-
-
-    @staticmethod
-    def remove_new_line_markers(documents: list[Document]) -> list[Document]:
+    def perform_cleaning(self, documents: Iterable[Document]) -> list[Document]: 
         """
-        Look at the text contained in each Document object, remove the new line markers inside these texts, and 
-        put those cleaner texts back into that Document object.
-        
-        Args:
-            documents: Document objects whose text is to be cleaned up a bit. 
-
-        Returns:
-            list[Document]: the list of all the Document objects with cleaner text. 
+        Replace the new line markers in the text of each Document with spaces, and fix the known errors in the
+        author's texts, in a single pass over each text.
         """
-        for document in documents:
-            raw_text = document.page_content
-            document.page_content = raw_text.replace("\n", " ").strip()
-
-        return documents
-
-
-def look_up_core_pages(author: Author, file_name: str, target: str) -> bool | range | None:
-
-    assert target in ["presence", "values"], f'The "target" argument is can only be "presence" or "values"'
+        return self.normalizer.normalize_documents(documents=documents)
 
-    if author.books_via_http != None:
-        for book in author.books_via_http:
-            file_found: bool = file_name in book.file_name
-            start_page_specified: bool = book.start_page != None  
-            end_page_specified: bool = book.end_page != None  
 
-            match (file_found, start_page_specified, end_page_specified):
-                case (True, True, True):
-                    return True if target == "presence" else range(book.start_page, book.end_page) 
+def read_pages_after_ocr(pages_path: Path, source: Path) -> list[Document]:
+    """
+    Read the pages that OCR wrote into Documents, one per page, with the source and (0-indexed) page number that
+    read_pdf_pages would have given them, along with the confidence of OCR in the page's text.
+    """
+    documents: list[Document] = []
+    with open(pages_path, mode="r") as file:
+        for line in file:
+            record = json.loads(line)
+            metadata: dict[str, str | int | float | bool] = {"source": str(source), "page": record["page"] - 1, "ocr": record["ocr"]}
 
-                case (True, False, False):
-                    logger.warning(f'"{file_name}" isn\'t equipped with any information on the core pages')
-                    if target == "presence":
-                        return False 
-                    else:
-                        logger.error(f"We don't have any specified start and end pages for {book.file_name}")
-                        return None
+            if record["confidence"] != None:
+                metadata["confidence"] = record["confidence"]  # Chroma doesn't accept metadata that is None
 
-                case (True, True, False) | (True, False, True):
-                    raise Exception(f'"{file_name}" somehow has partial core page specifications.')
-                case (False, True, True) | (False, False, False) | (False, False, True) | (False, True, False):
-                    continue
-    else:
-        logger.warning(f'There are no books by "{author.name}" that provide any information on the core pages.')
-        return False if target == "presence" else None
+            documents.append(Document(page_content=record["text"], metadata=metadata))
 
+    return documents
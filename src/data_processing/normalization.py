@@ -0,0 +1,122 @@
+"""
+Contains a normalization engine for the text of each page (or chapter) of a book. The replacements that fix the
+known errors in an author's texts are read from a file of rules (keyed by the author's name) rather than written
+into the code, and are compiled once per author. New line markers are replaced by spaces before any rule is
+applied, so a space in a target also stands for a line break in the original text.
+"""
+import re
+import json
+from pathlib import Path
+from functools import cache
+from collections.abc import Iterable
+
+from langchain_core.documents import Document
+
+from src.data_preparation.sourcing import Author
+from src.setup.paths import NORMALIZATION_RULES
+
+
+# CPython's str.replace runs at the speed of C, while the regex engine steps through the text in its own interpreter,
+# so a single regular expression only beats one str.replace per rule once there are a couple of hundred rules (see
+# src/benchmarks/normalization.py). Below that, each rule gets its own pass.
+SINGLE_PASS_THRESHOLD: int = 200
+
+
+@cache
+def load_rules(rules_path: Path = NORMALIZATION_RULES) -> dict[str, dict[str, str]]:
+    """
+    Returns:
+        dict[str, dict[str, str]]: the replacement for each target string, keyed by the (lowercased) name of the
+                                   author whose texts the targets are to be replaced in.
+    """
+    with open(rules_path, mode="r") as file:
+        rules: dict[str, dict[str, str]] = json.load(file)
+
+    return {author_name.lower(): replacements for author_name, replacements in rules.items()}
+
+
+class Normalizer:
+    def __init__(self, replacements: dict[str, str], single_pass: bool | None = None) -> None:
+        """
+        Args:
+            replacements: the replacement for each target string, in the order in which they are to be applied.
+            single_pass: whether to find every target in a single pass over the text, with a regular expression
+                         that has been compiled out of all of them. In that case, each target is replaced in the
+                         text as it was before any replacements (rather than in the output of the rules before it),
+                         and the longest of the targets that start at the same position wins. If None, this is
+                         decided by the number of rules.
+        """
+        assert all(len(target) > 0 for target in replacements)
+        self.replacements: dict[str, str] = replacements
+        self.single_pass: bool = single_pass if single_pass != None else len(replacements) >= SINGLE_PASS_THRESHOLD
+        self.matcher: re.Pattern[str] | None = re.compile(make_trie_regex(targets=list(replacements))) \
+            if self.single_pass and len(replacements) > 0 else None
+
+    @classmethod
+    def for_author(cls, author: Author) -> "Normalizer":
+        return get_normalizer(author_name=author.name)
+
+    def normalize(self, text: str) -> str:
+        """
+        Replace the new line markers in the text with spaces, strip it, and replace each target string in it.
+        """
+        text = text.replace("\n", " ").strip()
+
+        if self.matcher != None:
+            return self.matcher.sub(self.replace, text)
+
+        for target, replacement in self.replacements.items():
+            text = text.replace(target, replacement)
+
+        return text
+
+    def normalize_documents(self, documents: Iterable[Document]) -> list[Document]:
+        """
+        Normalize the text of each of a batch of Documents (like all the pages of a book) in place. They can be
+        given as a generator, in which case each one is normalized as soon as it has been produced.
+
+        Returns:
+            list[Document]: the same Document objects, with normalized text.
+        """
+        normalize = self.normalize
+        normalized_documents: list[Document] = []
+
+        for document in documents:
+            document.page_content = normalize(text=document.page_content)
+            normalized_documents.append(document)
+
+        return normalized_documents
+
+    def replace(self, match: re.Match[str]) -> str:
+        return self.replacements[match.group()]
+
+
+def make_trie_regex(targets: list[str]) -> str:
+    """
+    Compile the targets into a regular expression shaped like a trie of their characters, so that the regex engine
+    rules out most positions in the text after looking at a single character, instead of trying each target there
+    in turn. There are no capturing groups, which would keep the engine from skipping ahead to the characters that
+    the targets start with.
+    """
+    trie: dict[str, dict] = {}
+    for target in targets:
+        node: dict[str, dict] = trie
+        for character in target:
+            node = node.setdefault(character, {})
+        node[""] = {}  # Marks the end of a target
+
+    def to_regex(node: dict[str, dict]) -> str:
+        branches: list[str] = [re.escape(character) + to_regex(child) for character, child in node.items() if character != ""]
+        if len(branches) == 0:
+            return ""
+        elif len(branches) == 1 and "" not in node:
+            return branches[0]
+        else:
+            return "(?:{}){}".format("|".join(branches), "?" if "" in node else "")
+
+    return to_regex(node=trie)
+
+
+@cache
+def get_normalizer(author_name: str) -> Normalizer:
+    return Normalizer(replacements=load_rules().get(author_name.lower(), {}))
@@ -1,42 +1,330 @@
+"""
+Contains code that reads the text of EPUB and MOBI files chapter by chapter, yielding a Document for each chapter
+(with the chapter's number and title, and the book's title, in its metadata) instead of a single string for the
+whole book. Several books can be read at once by a pool of processes. The text of PDFs is read page by page, and
+only from the pages that are asked for. Several PDFs, and separate ranges of pages within each one, can be read at
+once by a pool of processes as well.
+"""
+import re
 import os
+import shutil
+import multiprocessing
+from pathlib import Path
+from collections import deque
+from importlib.util import find_spec
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+
 import mobi
 import ebooklib
-from pathlib import Path
 from ebooklib import epub
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, UnicodeDammit
+from pypdf import PdfReader
+from langchain_core.documents import Document
 
 from src.data_preparation.sourcing import Author
+from src.data_preparation.inventory import raw_file_inventory
+
+
+HEADING_TAGS: list[str] = ["h1", "h2", "h3"]
+NON_TEXT_TAGS: list[str] = ["head", "script", "style", "template"]
+WHITESPACE_PRESERVING_TAGS: list[str] = ["pre", "textarea"]
+ASCII_WHITESPACE: dict[int, None] = dict.fromkeys(map(ord, " \n\t\f\r"))
 
 
 class TextParser:
     def __init__(self, author: Author, extension: str) -> None:
         self.author: Author = author
-        self.extension: str = extension 
+        self.extension: str = extension
         assert self.extension in [".epub", ".mobi"]
 
     def get_files(self) -> list[Path]:
-        return [
-            self.author.path_to_raw_data.joinpath(file) 
-            for file in os.listdir(self.author.path_to_raw_data) if file.endswith(self.extension)
-        ]
+        return raw_file_inventory.get_file_paths(author=self.author, extension=self.extension)
 
     def has_files(self) -> bool:
-        files: list[Path] = self.get_files() 
-        return False if len(files) == 0 else True 
+        files: list[Path] = self.get_files()
+        return False if len(files) == 0 else True
 
     def parse(self, path: str) -> str:
+        return "\n\n".join(chapter.page_content for chapter in read_chapters(path=Path(path)))
+
+
+def read_chapters(path: Path) -> Iterator[Document]:
+    """
+    Yield a Document for each chapter of the EPUB or MOBI file, in reading order. Chapters without any text (like
+    covers) are skipped.
+    """
+    if path.suffix.lower() == ".mobi":
+        yield from read_mobi_chapters(path=path)
+    else:
+        yield from read_epub_chapters(path=path, source=path)
+
+
+def read_epub_chapters(path: Path, source: Path) -> Iterator[Document]:
+    book: epub.EpubBook = epub.read_epub(name=str(path))
+    book_titles: list[tuple[str, dict[str, str]]] = book.get_metadata(namespace="DC", name="title")
+    book_title: str | None = book_titles[0][0] if len(book_titles) > 0 else None
+    toc_titles: dict[str, str] = get_toc_titles(entries=book.toc)
+
+    items: list[epub.EpubItem] = [book.get_item_with_id(item_id) for item_id, _ in book.spine]
+    if len(items) == 0:
+        items = list(book.get_items_of_type(ebooklib.ITEM_DOCUMENT))
+
+    chapter_number: int = 0
+    for item in items:
+        if item == None or item.get_type() != ebooklib.ITEM_DOCUMENT:
+            continue
+
+        text, heading = html_to_text(markup=item.get_content())
+        if text.strip() == "":
+            continue
+
+        chapter_number += 1
+        yield make_chapter(
+            text=text,
+            source=source,
+            chapter_number=chapter_number,
+            chapter_title=toc_titles.get(item.get_name()) or heading,
+            book_title=book_title
+        )
+
+
+def read_mobi_chapters(path: Path) -> Iterator[Document]:
+    """
+    Unpack the MOBI file, which turns into an EPUB (for newer files) or a single HTML file whose chapters are
+    separated by page breaks (for older ones), and read the chapters of whichever it turned into.
+    """
+    temporary_dir, extracted_path = mobi.extract(infile=str(path))
+
+    try:
+        if extracted_path.endswith(".epub"):
+            yield from read_epub_chapters(path=Path(extracted_path), source=path)
+        else:
+            with open(extracted_path, mode="rb") as file:
+                markup: bytes = file.read()
+
+            chapter_number: int = 0
+            for section in re.split(rb"<mbp:pagebreak\s*/?>", markup, flags=re.IGNORECASE):
+                text, heading = html_to_text(markup=section)
+                if text.strip() == "":
+                    continue
+
+                chapter_number += 1
+                yield make_chapter(text=text, source=path, chapter_number=chapter_number, chapter_title=heading, book_title=None)
+    finally:
+        shutil.rmtree(temporary_dir, ignore_errors=True)
+
+
+def read_pdf_pages(path: Path, pages: range | None = None) -> Iterator[Document]:
+    """
+    Yield a Document for each of the given (0-indexed) pages of the PDF, in order, with the same text and page
+    metadata (source, page, page_label and total_pages) as PyPDFLoader gives them. Pages are only decoded when
+    they are reached, so the pages outside the range (like the front and back matter of a book) are never decoded
+    at all. Pages of the range that are past the end of the PDF are left out.
+    """
+    reader = PdfReader(path)
+    page_count: int = len(reader.pages)
+    page_numbers: range = range(page_count) if pages == None else range(max(pages.start, 0), min(pages.stop, page_count))
+    page_labels: list[str] = reader.page_labels  # Worked out afresh each time that the property is read
+
+    for page_number in page_numbers:
+        yield Document(
+            page_content=reader.pages[page_number].extract_text().strip(),
+            metadata={"source": str(path), "page": page_number, "page_label": page_labels[page_number], "total_pages": page_count}
+        )
+
+
+def make_chapter(text: str, source: Path, chapter_number: int, chapter_title: str | None, book_title: str | None) -> Document:
+    metadata: dict[str, str | int] = {"source": str(source), "chapter": chapter_number}
+
+    # Chroma doesn't accept metadata that is None
+    if chapter_title != None:
+        metadata["chapter_title"] = chapter_title
+    if book_title != None:
+        metadata["title"] = book_title
+
+    return Document(page_content=text, metadata=metadata)
+
+
+def get_toc_titles(entries: list[object]) -> dict[str, str]:
+    """
+    Returns:
+        dict[str, str]: the title that the table of contents gives each of the book's files, keyed by file name.
+    """
+    titles: dict[str, str] = {}
+    for entry in entries:
+        if isinstance(entry, tuple):
+            section, children = entry
+            if getattr(section, "href", None):
+                _ = titles.setdefault(section.href.split("#")[0], section.title)
+
+            for href, title in get_toc_titles(entries=list(children)).items():
+                _ = titles.setdefault(href, title)
+
+        elif isinstance(entry, epub.Link):
+            _ = titles.setdefault(entry.href.split("#")[0], entry.title)
+
+    return titles
+
+
+def html_to_text(markup: bytes) -> tuple[str, str | None]:
+    """
+    Extract the text of a chapter, and its first heading. This is done with lxml's own tree when lxml is installed,
+    which is much quicker than building a Beautiful Soup tree over it. Either way, the text is that of every text
+    node in the document's body, one after the other (with Beautiful Soup's handling of whitespace and encodings),
+    so the contents of stylesheets and scripts, and everything outside the body (like the document's title), are
+    left out. The only difference is that lxml drops any whitespace at the very start of a section that has no
+    body, which cleaning strips anyway.
+
+    Returns:
+        tuple[str, str | None]: the text, and the first heading (if there is one).
+    """
+    if find_spec("lxml") != None:
+        import lxml.html
+
+        # Sections of old MOBI files don't declare their encoding, which lxml would then take to be Latin-1
+        encoding: str | None = UnicodeDammit(markup, is_html=True).original_encoding
+
+        try:
+            tree = lxml.html.fromstring(markup, parser=lxml.html.HTMLParser(encoding=encoding))
+        except Exception:
+            return "", None  # Nothing that can be parsed, like an empty section between two page breaks
+
+        collapse_blank_strings(tree=tree)
+        for element in tree.xpath("|".join(f"//{tag}" for tag in NON_TEXT_TAGS)):
+            if element.getparent() != None:
+                element.drop_tree()  # The text that follows the element (its tail) is kept
+
+        headings = tree.xpath("|".join(f"//{tag}" for tag in HEADING_TAGS))
+        heading: str | None = " ".join(headings[0].text_content().split()) if len(headings) > 0 else None
+
+        body = tree.find("body") if tree.tag == "html" else tree  # Sections of old MOBI files have no body
+        text: str = body.text_content() if body != None and body.tag not in NON_TEXT_TAGS else ""
+        return text, heading or None
+    else:
+        soup = BeautifulSoup(markup, "html.parser")
+        for tag in soup.find_all(NON_TEXT_TAGS):
+            tag.decompose()
+
+        heading_tag = soup.find(HEADING_TAGS)
+        heading: str | None = " ".join(heading_tag.get_text().split()) if heading_tag != None else None
+        return (soup.body or soup).get_text(), heading or None
+
+
+def collapse_blank_strings(tree: "lxml.html.HtmlElement") -> None:
+    """
+    Collapse each string of the tree that is nothing but whitespace into a single new line (if it contains one) or
+    space, outside of the tags whose whitespace is preserved, as Beautiful Soup does while it builds its tree.
+    """
+    preserving_elements: set["lxml.html.HtmlElement"] = set(tree.iter(*WHITESPACE_PRESERVING_TAGS))
+    preserved_elements: set["lxml.html.HtmlElement"] = {descendant for element in preserving_elements for descendant in element.iterdescendants()}
+
+    for element in tree.iter():
+        if element in preserved_elements:
+            continue  # Both its text and its tail are inside a tag whose whitespace is preserved
+
+        if isinstance(element.tag, str) and is_blank(text=element.text) and element not in preserving_elements:
+            element.text = "\n" if "\n" in element.text else " "
+
+        if is_blank(text=element.tail):
+            element.tail = "\n" if "\n" in element.tail else " "
+
+
+def is_blank(text: str | None) -> bool:
+    return text != None and len(text) > 0 and text.translate(ASCII_WHITESPACE) == ""
+
+
+def read_book(path: Path) -> list[Document]:
+    """
+    Read all the chapters of a book (in a worker process).
+    """
+    return list(read_chapters(path=path))
+
+
+def read_books(paths: list[Path], workers: int | None = None) -> Iterator[tuple[Path, list[Document]]]:
+    """
+    Read the chapters of several books at once, in a pool of processes, and yield the chapters of each book in the
+    order in which the books were given. No more than one book per worker is read ahead of the one that is being
+    consumed, so the chapters of the whole collection are never all held in memory at once.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1 or len(paths) <= 1:
+        for path in paths:
+            yield path, read_book(path=path)
+        return
+
+    in_flight: deque[tuple[Path, Future[list[Document]]]] = deque()
+    with ProcessPoolExecutor(max_workers=min(workers, len(paths)), mp_context=multiprocessing.get_context("spawn")) as pool:
+        for path in paths:
+            in_flight.append((path, pool.submit(read_book, path)))
+            if len(in_flight) >= workers:
+                path, future = in_flight.popleft()
+                yield path, future.result()
+
+        while len(in_flight) > 0:
+            path, future = in_flight.popleft()
+            yield path, future.result()
+
+
+def read_pdf_page_range(path: Path, pages: range) -> list[Document]:
+    """
+    Read a range of the pages of a PDF (in a worker process).
+    """
+    return list(read_pdf_pages(path=path, pages=pages))
+
+
+def split_page_range(pages: range, pages_per_task: int) -> list[range]:
+    return [range(start, min(start + pages_per_task, pages.stop)) for start in range(pages.start, pages.stop, pages_per_task)]
+
+
+def read_pdfs(
+    pdfs: list[tuple[Path, range | None]],
+    workers: int | None = None,
+    pages_per_task: int = 16
+) -> Iterator[tuple[Path, list[Document]]]:
+    """
+    Read the given pages of several PDFs at once, in a pool of processes, and yield the pages of each PDF in the
+    order in which the PDFs were given. The pages of each PDF are split into ranges of pages_per_task pages, so
+    that a single large PDF is spread across the pool as well. Since every range is read by read_pdf_pages, the
+    pages are the same (text and metadata) as those that reading each PDF in the main process produces.
+
+    Args:
+        pdfs: the path of each PDF, along with the (0-indexed) pages to read from it (None for all of them).
+        workers: the number of processes. If this is 1, each PDF is read in the main process instead.
+        pages_per_task: the number of pages that a worker reads from a PDF in one go. The PDF is opened once per
+                        range, so ranges that are too short add the cost of parsing its structure again and again.
+    """
+    workers = workers or os.cpu_count() or 1
+
+    if workers == 1:
+        for path, pages in pdfs:
+            yield path, list(read_pdf_pages(path=path, pages=pages))
+        return
+
+    tasks: list[tuple[int, Path, range]] = []  # Along with the position of the PDF that each range of pages is from
+    for pdf_number, (path, pages) in enumerate(pdfs):
+        page_count: int = len(PdfReader(path).pages)
+        pages = range(page_count) if pages == None else range(max(pages.start, 0), min(pages.stop, page_count))
+        page_ranges: list[range] = split_page_range(pages=pages, pages_per_task=pages_per_task) or [pages]
+        tasks.extend((pdf_number, path, page_range) for page_range in page_ranges)
+
+    in_flight: deque[tuple[int, Future[list[Document]]]] = deque()
+    pdf_pages: list[list[Document]] = [[] for _ in pdfs]
+    next_pdf_number: int = 0
 
-        raw_text = ""
-        if self.extension == ".mobi":
-            _ , metadata = mobi.extract(infile=path) 
-            with open(metadata, mode="r", encoding="utf-8") as file:
-                raw_text += file.read() + "\n\n"
-        else: 
-            book: epub.EpubBook = epub.read_epub(name=path)
-            for item in book.get_items():
-                if item.get_type() == ebooklib.ITEM_DOCUMENT:
-                    soup = BeautifulSoup(item.get_content(), "html.parser")
-                    raw_text += soup.get_text() + "\n\n"
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for task_number, (pdf_number, path, page_range) in enumerate(tasks):
+            in_flight.append((pdf_number, pool.submit(read_pdf_page_range, path, page_range)))
+            is_last_task: bool = task_number == len(tasks) - 1
 
-        return raw_text
+            # Twice as many ranges as there are workers are kept in flight, so that none of the workers sit idle
+            while len(in_flight) > 0 and (len(in_flight) >= 2 * workers or is_last_task):
+                pdf_number, future = in_flight.popleft()
+                pdf_pages[pdf_number].extend(future.result())
 
+                # Every range of the PDFs before this one has been read, so they are complete
+                while next_pdf_number < pdf_number or (is_last_task and len(in_flight) == 0 and next_pdf_number < len(pdfs)):
+                    yield pdfs[next_pdf_number][0], pdf_pages[next_pdf_number]
+                    pdf_pages[next_pdf_number] = []
+                    next_pdf_number += 1
@@ -0,0 +1,84 @@
+"""
+Contains a record (kept in SQLite) of the fingerprint of the inputs and configuration that each stage of ingestion
+last ran with, for each author and book, so that work whose inputs haven't changed can be skipped.
+"""
+import os
+import json
+import sqlite3
+import hashlib
+import threading
+from pathlib import Path
+
+from src.setup.paths import DATA_DIR, STAGE_RUNS_DB
+
+
+class StageRunStore:
+    def __init__(self, database_path: Path = STAGE_RUNS_DB) -> None:
+        self.database_path: Path = database_path
+        self.connection: sqlite3.Connection | None = None
+        self.connection_pid: int | None = None  # Each of the worker processes needs a connection of its own
+        self.lock: threading.Lock = threading.Lock()
+
+    def connect(self) -> sqlite3.Connection:
+        if self.connection == None or self.connection_pid != os.getpid():
+            if not DATA_DIR.exists():
+                os.mkdir(DATA_DIR)
+
+            self.connection = sqlite3.connect(database=self.database_path, timeout=30, check_same_thread=False)
+            self.connection_pid = os.getpid()
+            _ = self.connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS stage_runs (
+                    author TEXT NOT NULL,
+                    book TEXT NOT NULL,
+                    stage TEXT NOT NULL,
+                    fingerprint TEXT NOT NULL,
+                    PRIMARY KEY (author, book, stage)
+                )
+                """
+            )
+            self.connection.commit()
+
+        return self.connection
+
+    def get(self, author_name: str, stage: str, book: str = "") -> str | None:
+        """
+        Return the fingerprint that the stage last completed with. Stages that run for an author as a whole
+        (rather than for each of their books) are recorded with an empty book name.
+        """
+        with self.lock:
+            row: tuple[str] | None = self.connect().execute(
+                "SELECT fingerprint FROM stage_runs WHERE author = ? AND book = ? AND stage = ?", (author_name, book, stage)
+            ).fetchone()
+
+        return row[0] if row != None else None
+
+    def record(self, author_name: str, stage: str, fingerprint: str, book: str = "") -> None:
+        with self.lock, self.connect() as connection:
+            _ = connection.execute(
+                "INSERT OR REPLACE INTO stage_runs VALUES (?, ?, ?, ?)", (author_name, book, stage, fingerprint)
+            )
+
+    def get_books(self, author_name: str, stage: str) -> list[str]:
+        with self.lock:
+            rows: list[tuple[str]] = self.connect().execute(
+                "SELECT book FROM stage_runs WHERE author = ? AND stage = ? AND book != ''", (author_name, stage)
+            ).fetchall()
+
+        return [row[0] for row in rows]
+
+    def remove_book(self, author_name: str, book: str) -> None:
+        with self.lock, self.connect() as connection:
+            _ = connection.execute("DELETE FROM stage_runs WHERE author = ? AND book = ?", (author_name, book))
+
+
+def make_fingerprint(stage: str, *inputs: object) -> str:
+    """
+    Hash the name of a stage together with everything that determines its output: the fingerprints of the
+    stages it depends on, its own inputs, and its configuration.
+    """
+    serialised_inputs: str = json.dumps([stage, *inputs], sort_keys=True, default=str)
+    return hashlib.sha256(serialised_inputs.encode()).hexdigest()
+
+
+stage_runs = StageRunStore()
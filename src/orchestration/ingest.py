@@ -0,0 +1,249 @@
+"""
+Contains an orchestrator that runs the whole of ingestion (download → dedup → OCR → clean → chunk → embed) as a
+graph of stages, for each author and each of their books. Every stage is fingerprinted by its inputs and
+configuration, so stages whose fingerprints haven't changed since they last ran are skipped. Authors, and then
+their books, are processed in parallel by a pool of processes. Embedding happens in the main process, so that
+the embedding model is only loaded once, and each author's collection has a single writer.
+"""
+import os
+import time
+import multiprocessing
+from pathlib import Path
+from argparse import ArgumentParser
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from src.setup.config import chunk_config, embed_config
+from src.data_preparation.ocr import OCRModule
+from src.data_preparation.sourcing import Author
+from src.data_preparation.archive import AuthorArchiver
+from src.data_preparation.books import BookRecord, get_book_index
+from src.data_preparation.authors import author_registry
+from src.data_preparation.inventory import raw_file_inventory
+from src.data_preparation.management import VersionManager
+from src.data_preparation.utils import StageStats
+from src.data_processing.cleaning import Cleaner
+from src.data_processing.normalization import Normalizer
+from src.data_processing.chunking import split_documents
+from src.orchestration.fingerprints import make_fingerprint, stage_runs
+from src.vector_store.embeddings import ChromaAPI
+
+
+# Each stage, and the stages that it depends on
+STAGES: dict[str, tuple[str, ...]] = {
+    "download": (),
+    "dedup": ("download",),
+    "ocr": ("dedup",),
+    "clean": ("ocr",),
+    "chunk": ("clean",),
+    "embed": ("chunk",),
+}
+
+BOOK_STAGES: tuple[str, str, str, str] = ("ocr", "clean", "chunk", "embed")
+
+
+def run_author_stages(author_name: str, force: bool) -> dict[str, str]:
+    """
+    Run (in a worker process) the stages that concern all of an author's books at once.
+
+    Returns:
+        dict[str, str]: the SHA-256 of each of the author's raw files, keyed by file name, once deduplicated.
+    """
+    author: Author = author_registry.get(name=author_name)
+
+    download_fingerprint: str = make_fingerprint("download", AuthorArchiver(author=author).construct_archive())
+    if force or stage_runs.get(author_name=author.name, stage="download") != download_fingerprint:
+        author.download_books()  # Raises if any download failed, so that the fingerprint isn't recorded
+        stage_runs.record(author_name=author.name, stage="download", fingerprint=download_fingerprint)
+    else:
+        logger.success(f"The sources of {author.name} haven't changed since they were downloaded")
+
+    # Deduplication is fingerprinted by the files it leaves behind, so it only runs again if the files change
+    hashes: dict[str, str] = raw_file_inventory.get_hashes(author=author)
+    if author.books_via_torrent != None:
+        if force or stage_runs.get(author_name=author.name, stage="dedup") != make_fingerprint("dedup", hashes):
+            manager = VersionManager(author=author)
+            _ = manager.curate()
+            hashes = raw_file_inventory.get_hashes(author=author)
+
+    stage_runs.record(author_name=author.name, stage="dedup", fingerprint=make_fingerprint("dedup", hashes))
+    return hashes
+
+
+def get_book_fingerprints(author: Author, file_name: str, sha256: str, chunk: bool) -> dict[str, str]:
+    """
+    Fingerprint each of the stages that a book goes through, each of which builds on the stage before it.
+    """
+    ocr_module = OCRModule(author=author, workers=1)  # Only used to describe OCR, rather than to run it
+    file_path: Path = author.path_to_raw_data.joinpath(file_name)
+    needs_ocr: bool = ocr_module.requires_ocr(file_path=file_path)
+    ocr_settings: str | None = ocr_module.describe_settings(page_numbers=ocr_module.get_page_numbers(file_path=file_path)) if needs_ocr else None
+    book: BookRecord = get_book_index(author=author).get(file_name=file_name)
+    chunking_settings: dict[str, object] = {
+        name: value for name, value in vars(type(chunk_config)).items() if not name.startswith("_")
+    }
+
+    # The rules are applied in order, so they are fingerprinted as a list of pairs rather than as a (sorted) mapping
+    normalization_rules: list[tuple[str, str]] = list(Normalizer.for_author(author=author).replacements.items())
+
+    stage_inputs: dict[str, tuple[object, ...]] = {
+        "ocr": (sha256, needs_ocr, book.start_page, book.end_page, ocr_settings),
+        "clean": (author.name, book.start_page, book.end_page, normalization_rules),
+        "chunk": (chunk, chunking_settings),
+        "embed": (embed_config.embedding_model_name,),
+    }
+
+    fingerprints: dict[str, str] = {}
+    for stage in BOOK_STAGES:
+        upstream_fingerprints: list[str] = [fingerprints[parent] for parent in STAGES[stage] if parent in fingerprints]
+        fingerprints[stage] = make_fingerprint(stage, *upstream_fingerprints, *stage_inputs[stage])
+
+    return fingerprints
+
+
+def get_ocr_workers(pool_workers: int | None) -> int:
+    """
+    Split the cores between the workers of a pool, each of which may run OCR with a pool of its own, so that the
+    machine isn't asked to run a Tesseract process per core in each of them.
+
+    Args:
+        pool_workers: the number of workers in the outer pool (None for one per core, as in ProcessPoolExecutor).
+    """
+    cores: int = os.cpu_count() or 1
+    return max(1, cores // (pool_workers if pool_workers != None else cores))
+
+
+def run_book_stages(
+    author_name: str, file_name: str, sha256: str, chunk: bool, force: bool, ocr_workers: int = 1
+) -> tuple[list[Document], str] | None:
+    """
+    Run (in a worker process) the stages that prepare a book for embedding. The output of cleaning and chunking
+    is only held in memory, so they run whenever the book has to be embedded again. OCR writes its output to
+    disk, so it only runs when its own fingerprint has changed.
+
+    Args:
+        ocr_workers: the number of processes that OCR may use, which is this worker's share of the cores.
+
+    Returns:
+        tuple[list[Document], str] | None: the documents to embed, and the fingerprint of the embedding stage,
+                                           or None if the book's embeddings are up to date.
+    """
+    author: Author = author_registry.get(name=author_name)
+    fingerprints: dict[str, str] = get_book_fingerprints(author=author, file_name=file_name, sha256=sha256, chunk=chunk)
+
+    if not force and stage_runs.get(author_name=author.name, stage="embed", book=file_name) == fingerprints["embed"]:
+        return None
+
+    ocr_module = OCRModule(author=author, workers=ocr_workers)
+    file_path: Path = author.path_to_raw_data.joinpath(file_name)
+
+    if ocr_module.requires_ocr(file_path=file_path):
+        if force or stage_runs.get(author_name=author.name, stage="ocr", book=file_name) != fingerprints["ocr"]:
+            ocr_module.process_file(file_path=file_path)
+            stage_runs.record(author_name=author.name, stage="ocr", fingerprint=fingerprints["ocr"], book=file_name)
+
+    cleaner = Cleaner(author=author)
+    documents: list[Document] = cleaner.clean_file(file_path=file_path)
+    documents = split_documents(documents=documents) if chunk and len(documents) > 0 else documents
+    return documents, fingerprints["embed"]
+
+
+class IngestOrchestrator:
+    def __init__(self, max_workers: int | None = None, chunk: bool = True, force: bool = False) -> None:
+        self.max_workers: int | None = max_workers
+        self.ocr_workers: int = get_ocr_workers(pool_workers=max_workers)
+        self.chunk: bool = chunk
+        self.force: bool = force
+        self.apis: dict[str, ChromaAPI] = {}
+        self.failures: list[str] = []
+
+        self.author_stats = StageStats(name="Download and dedup", unit="authors")
+        self.book_stats = StageStats(name="OCR, cleaning and chunking", unit="books")
+        self.embed_stats = StageStats(name="Embedding", unit="books")
+
+    def get_api(self, author: Author) -> ChromaAPI:
+        if author.name not in self.apis:
+            self.apis[author.name] = ChromaAPI(author=author)
+        return self.apis[author.name]
+
+    def remove_stale_books(self, author: Author, file_names: list[str]) -> None:
+        """
+        Remove the embeddings of books that are no longer among the author's files (because deduplication deleted
+        them, for instance).
+        """
+        for file_name in stage_runs.get_books(author_name=author.name, stage="embed"):
+            if file_name not in file_names:
+                logger.warning(f"Removing the embeddings of {file_name}, which is no longer among {author.name}'s files")
+                self.get_api(author=author).remove_book(file_name=file_name)
+                stage_runs.remove_book(author_name=author.name, book=file_name)
+
+    def embed(self, author: Author, file_name: str, documents: list[Document], fingerprint: str) -> None:
+        started_at: float = time.time()
+        _ = self.get_api(author=author).embed_book(documents=documents, file_name=file_name)
+        stage_runs.record(author_name=author.name, stage="embed", fingerprint=fingerprint, book=file_name)
+        self.embed_stats.record(started_at=started_at, finished_at=time.time())
+        logger.success(f"Embedded {file_name} by {author.name}")
+
+    def run(self, authors: list[Author]) -> None:
+        started_at: float = time.time()
+        pending: dict[Future[dict[str, str]] | Future[tuple[list[Document], str] | None], tuple[Author, str | None, float]] = {}
+
+        # Spawned (rather than forked) workers, since the main process holds the embedding model
+        with ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            for author in authors:
+                pending[pool.submit(run_author_stages, author.name, self.force)] = (author, None, time.time())
+
+            while len(pending) > 0:
+                done, _ = wait(pending.keys(), return_when=FIRST_COMPLETED)
+                for future in done:
+                    author, file_name, submitted_at = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as error:
+                        self.failures.append(f"{file_name or 'all books'} by {author.name} ({error})")
+                        continue
+
+                    if file_name == None:
+                        assert isinstance(result, dict)
+                        self.author_stats.record(started_at=submitted_at, finished_at=time.time())
+                        self.remove_stale_books(author=author, file_names=list(result.keys()))
+
+                        for name, sha256 in result.items():
+                            book_future = pool.submit(run_book_stages, author.name, name, sha256, self.chunk, self.force, self.ocr_workers)
+                            pending[book_future] = (author, name, time.time())
+
+                    elif result == None:
+                        logger.success(f"The embeddings of {file_name} by {author.name} are up to date")
+                    else:
+                        assert isinstance(result, tuple)
+                        self.book_stats.record(started_at=submitted_at, finished_at=time.time())
+                        documents, fingerprint = result
+                        try:
+                            self.embed(author=author, file_name=file_name, documents=documents, fingerprint=fingerprint)
+                        except Exception as error:
+                            self.failures.append(f"{file_name} by {author.name} ({error})")
+
+        for stats in [self.author_stats, self.book_stats, self.embed_stats]:
+            stats.log()
+
+        logger.info(f"Ingestion took {time.time() - started_at:.1f}s")
+        if len(self.failures) > 0:
+            raise Exception(f"Ingestion failed for {len(self.failures)} jobs: {', '.join(self.failures)}")
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    _ = parser.add_argument("--workers", type=int, default=None)
+    _ = parser.add_argument("--nicknames", nargs="*", default=None)
+    _ = parser.add_argument("--no-chunk", action="store_true")
+    _ = parser.add_argument("--force", action="store_true")
+    args = parser.parse_args()
+
+    authors: list[Author] = author_registry.all() if args.nicknames == None else [
+        author_registry.find(nickname=nickname) for nickname in args.nicknames
+    ]
+
+    orchestrator = IngestOrchestrator(max_workers=args.workers, chunk=not args.no_chunk, force=args.force)
+    orchestrator.run(authors=authors)
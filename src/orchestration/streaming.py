@@ -0,0 +1,176 @@
+"""
+Contains a streaming mode of ingestion, in which the stages are connected by bounded queues instead of handing
+each other everything they produced. Books are OCR'd, cleaned and chunked by a pool of processes while the main
+thread embeds the chunks of the books that are already ready, so the stages overlap, and the number of books
+that are held in memory at once is bounded by the size of the queues rather than by the size of the corpus.
+Each book that has been embedded is recorded with the same fingerprints as in the orchestrator of ingestion, so
+books whose embeddings are up to date are skipped, and those that weren't finished (after a crash) are not.
+"""
+import time
+import queue
+import threading
+import multiprocessing
+from collections import deque
+from collections.abc import Iterator
+from concurrent.futures import Future, ProcessPoolExecutor
+
+from loguru import logger
+from langchain_core.documents import Document
+
+from src.data_preparation.sourcing import Author
+from src.data_preparation.inventory import raw_file_inventory
+from src.data_preparation.utils import StageStats
+from src.orchestration.fingerprints import stage_runs
+from src.orchestration.ingest import get_ocr_workers, run_book_stages
+from src.vector_store.embeddings import ChromaAPI
+
+
+class PreparedBook:
+    def __init__(
+        self,
+        author: Author,
+        file_name: str,
+        documents: list[Document] | None,
+        fingerprint: str | None,
+        started_at: float,
+        finished_at: float
+    ) -> None:
+
+        self.author: Author = author
+        self.file_name: str = file_name
+        self.documents: list[Document] | None = documents  # None if the book's embeddings are up to date
+        self.fingerprint: str | None = fingerprint
+        self.started_at: float = started_at
+        self.finished_at: float = finished_at
+
+
+def prepare_book(
+    author_name: str, file_name: str, sha256: str, chunk: bool, ocr_workers: int
+) -> tuple[tuple[list[Document], str] | None, float, float]:
+    """
+    Run (in a worker process) OCR if the book needs it, and then clean (and chunk) the book, unless its embeddings
+    are up to date.
+
+    Returns:
+        tuple[tuple[list[Document], str] | None, float, float]: the documents and the fingerprint of the embedding
+                                                                stage (or None if the book's embeddings are up to
+                                                                date), and the times at which preparation started
+                                                                and finished.
+    """
+    started_at: float = time.time()
+    prepared: tuple[list[Document], str] | None = run_book_stages(
+        author_name=author_name, file_name=file_name, sha256=sha256, chunk=chunk, force=False, ocr_workers=ocr_workers
+    )
+
+    return prepared, started_at, time.time()
+
+
+class StreamingPipeline:
+    def __init__(
+        self,
+        chunk: bool = True,
+        prepare_workers: int = 2,
+        queue_size: int = 2,
+        batch_size: int = 64
+    ) -> None:
+
+        self.chunk: bool = chunk
+        self.prepare_workers: int = prepare_workers
+        self.ocr_workers: int = get_ocr_workers(pool_workers=prepare_workers)
+        self.queue_size: int = queue_size
+        self.batch_size: int = batch_size
+        self.peak_books_in_memory: int = 0
+
+        self.prepare_stats = StageStats(name="OCR, cleaning and chunking", unit="books")
+        self.embed_stats = StageStats(name="Embedding", unit="books")
+
+    def iterate_books(self, authors: list[Author], apis: dict[str, ChromaAPI]) -> Iterator[tuple[Author, str, str]]:
+        """
+        Yield each of the authors' books, with the SHA-256 of its raw file. Whether a book has to be embedded is
+        decided for each book (rather than for each author), so that an author whose books were only partly
+        embedded has the rest of them embedded.
+        """
+        for author in authors:
+            apis[author.name] = ChromaAPI(author=author)
+            for file_name, sha256 in sorted(raw_file_inventory.get_hashes(author=author).items()):
+                yield author, file_name, sha256
+
+    def prepare_books(self, books: Iterator[tuple[Author, str, str]], pool: ProcessPoolExecutor) -> Iterator[PreparedBook]:
+        """
+        Keep up to one book per worker being prepared, and yield the books in the order in which they were given.
+        A new book is only submitted once the oldest one has been taken, so a slow consumer holds back the workers.
+        """
+        in_flight: deque[tuple[Author, str, Future[tuple[tuple[list[Document], str] | None, float, float]]]] = deque()
+
+        for author, file_name, sha256 in books:
+            in_flight.append((author, file_name, pool.submit(prepare_book, author.name, file_name, sha256, self.chunk, self.ocr_workers)))
+            if len(in_flight) >= self.prepare_workers:
+                yield self.collect(*in_flight.popleft())
+
+        while len(in_flight) > 0:
+            yield self.collect(*in_flight.popleft())
+
+    def collect(
+        self,
+        author: Author,
+        file_name: str,
+        future: Future[tuple[tuple[list[Document], str] | None, float, float]]
+    ) -> PreparedBook:
+
+        prepared, started_at, finished_at = future.result()
+        documents, fingerprint = prepared if prepared != None else (None, None)
+        self.prepare_stats.record(started_at=started_at, finished_at=finished_at)
+
+        return PreparedBook(
+            author=author,
+            file_name=file_name,
+            documents=documents,
+            fingerprint=fingerprint,
+            started_at=started_at,
+            finished_at=finished_at
+        )
+
+    def produce(self, books: Iterator[PreparedBook], prepared_books: queue.Queue[PreparedBook | None], errors: list[Exception]) -> None:
+        try:
+            for book in books:
+                prepared_books.put(book)  # Blocks while the queue is full
+        except Exception as error:
+            errors.append(error)
+        finally:
+            prepared_books.put(None)
+
+    def run(self, authors: list[Author]) -> None:
+        started_at: float = time.time()
+        apis: dict[str, ChromaAPI] = {}
+        errors: list[Exception] = []
+        prepared_books: queue.Queue[PreparedBook | None] = queue.Queue(maxsize=self.queue_size)
+
+        with ProcessPoolExecutor(max_workers=self.prepare_workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+            books: Iterator[PreparedBook] = self.prepare_books(books=self.iterate_books(authors=authors, apis=apis), pool=pool)
+            producer = threading.Thread(target=self.produce, args=(books, prepared_books, errors), daemon=True)
+            producer.start()
+
+            while (book := prepared_books.get()) != None:
+                if book.documents == None or book.fingerprint == None:
+                    logger.success(f"The embeddings of {book.file_name} by {book.author.name} are up to date")
+                    continue
+
+                self.peak_books_in_memory = max(self.peak_books_in_memory, prepared_books.qsize() + 1)
+                embedding_started_at: float = time.time()
+
+                _ = apis[book.author.name].embed_book(documents=book.documents, file_name=book.file_name, batch_size=self.batch_size)
+                stage_runs.record(author_name=book.author.name, stage="embed", fingerprint=book.fingerprint, book=book.file_name)
+                self.embed_stats.record(started_at=embedding_started_at, finished_at=time.time())
+                logger.success(f"Embedded {book.file_name} by {book.author.name} ({len(book.documents)} documents)")
+
+            producer.join()
+
+        self.prepare_stats.log()
+        self.embed_stats.log()
+        logger.info(
+            f"Streaming ingestion took {time.time() - started_at:.1f}s, with at most {self.peak_books_in_memory} prepared "
+            f"books waiting to be embedded (and up to {self.prepare_workers} being prepared)"
+        )
+
+        if len(errors) > 0:
+            raise errors[0]
@@ -5,15 +5,27 @@ from pathlib import Path
 PARENT_DIR = Path("__file__").parent.resolve()
 DATA_DIR = PARENT_DIR.joinpath("data")
 IMAGES_DIR = PARENT_DIR.joinpath("images") 
+BENCHMARKS_DIR = PARENT_DIR.joinpath("benchmarks")
 
 OCR_OUTPUTS = PARENT_DIR.joinpath("OCR")
 OCR_IMAGES = OCR_OUTPUTS.joinpath("images")
 PDFS_AFTER_OCR = OCR_OUTPUTS.joinpath("pdf")
 TXT_AFTER_OCR = OCR_OUTPUTS.joinpath("txt") 
+PAGES_AFTER_OCR = OCR_OUTPUTS.joinpath("pages")
 
 CHROMA_DIR = PARENT_DIR.joinpath("./chroma")
-ARCHIVE_DIR = DATA_DIR.joinpath("archive.json") 
+ARCHIVE_DB = DATA_DIR.joinpath("archive.db")
+PARTIAL_DOWNLOADS = DATA_DIR.joinpath("partial_downloads")
+HTTP_CACHE = DATA_DIR.joinpath("http_cache")
+INVENTORY_DB = DATA_DIR.joinpath("inventory.db")
+CONTENT_STORE = DATA_DIR.joinpath("content_store")
+STAGE_RUNS_DB = DATA_DIR.joinpath("stage_runs.db")
+OCR_PAGES_DB = DATA_DIR.joinpath("ocr_pages.db")
 IMAGES_IN_DOWNLOADS = IMAGES_DIR.joinpath("images_in_downloads")
+HTML_FIXTURES = BENCHMARKS_DIR.joinpath("html")
+SCANNED_FIXTURES = BENCHMARKS_DIR.joinpath("scanned")
+
+NORMALIZATION_RULES = Path(__file__).parent.parent.joinpath("data_processing", "normalization_rules.json")  # Shipped with the code
 
 
 def make_fundamental_paths():
@@ -26,7 +38,11 @@ def make_fundamental_paths():
         OCR_IMAGES, 
         PDFS_AFTER_OCR, 
         TXT_AFTER_OCR,
+        PAGES_AFTER_OCR,
         IMAGES_IN_DOWNLOADS, 
+        PARTIAL_DOWNLOADS,
+        HTTP_CACHE,
+        CONTENT_STORE
     ]
 
     for path in paths_to_create:
@@ -2,6 +2,8 @@
 Contains code for embedding chunks of text into selected vector databases.
 """
 import os
+import itertools
+from functools import cache
 from pathlib import Path
 from loguru import logger 
 from argparse import ArgumentParser 
@@ -15,7 +17,7 @@ from src.setup.config import embed_config
 from src.data_processing.cleaning import Cleaner 
 from src.data_preparation.sourcing import Author
 from src.data_processing.chunking import split_documents 
-from src.data_preparation.authors import prepare_sources
+from src.data_preparation.authors import author_registry
 
     
 class ChromaAPI: 
@@ -30,9 +32,12 @@ class ChromaAPI:
             embedding_function=get_embedding_model()
         ) 
 
+    def has_embeddings(self) -> bool:
+        return len(os.listdir(self.embeddings_directory)) > 1
+
     def embed_books(self, chunk: bool) -> list[str] | None:
 
-        if len(os.listdir(self.embeddings_directory)) > 1:
+        if self.has_embeddings():
             logger.success(f"Embeddings have already been made for {self.author.name}'s texts")
         else:
             cleaner = Cleaner(author=self.author)
@@ -51,7 +56,35 @@ class ChromaAPI:
                 logger.success(f"Successfully embedded the {'chunks of' if chunk else ''} text using ChromaDB.")
                 return ids
 
+    def embed_book(self, documents: list[Document], file_name: str, batch_size: int | None = None) -> list[str]:
+        """
+        Replace the embeddings of a single book with those of the given documents, so that a book that has changed
+        can be embedded again without touching the rest of the author's collection.
+
+        Args:
+            documents: the (chunks of the) pages of the book.
+            file_name: the name of the book's raw file.
+            batch_size: the number of documents to embed at a time. By default, they are all embedded at once.
+
+        Returns:
+            list[str]: the IDs of the embedded documents.
+        """
+        for document in documents:
+            document.metadata["file_name"] = file_name
+
+        self.remove_book(file_name=file_name)
+        ids: list[str] = []
+
+        for batch in itertools.batched(documents, batch_size or max(len(documents), 1)):
+            ids.extend(self.vector_store.add_documents(documents=list(batch)))
+
+        return ids
+
+    def remove_book(self, file_name: str) -> None:
+        self.vector_store.delete(where={"file_name": file_name})
+
 
+@cache
 def get_embedding_model() -> HuggingFaceEmbeddings:
     return HuggingFaceEmbeddings(model_name=embed_config.embedding_model_name)
 
@@ -60,10 +93,15 @@ if __name__ == "__main__":
 
     parser = ArgumentParser()
     _ = parser.add_argument("--chunk", action="store_true")
+    _ = parser.add_argument("--stream", action="store_true")
     args = parser.parse_args()
    
-    for author in prepare_sources():
-        author.download_books()
-        api = ChromaAPI(author=author)
-        _ = api.embed_books(chunk=args.chunk)
+    if args.stream:
+        from src.orchestration.streaming import StreamingPipeline
+        pipeline = StreamingPipeline(chunk=args.chunk)
+        pipeline.run(authors=author_registry.all())
+    else:
+        for author in author_registry.all():  # The books have to be downloaded (and OCR'd) beforehand
+            api = ChromaAPI(author=author)
+            _ = api.embed_books(chunk=args.chunk)
 
@@ -4,7 +4,7 @@ from langchain_core.documents import Document
 
 from src.data_preparation.sourcing import Author
 from src.vector_store.embeddings import ChromaAPI
-from src.data_preparation.authors import prepare_sources
+from src.data_preparation.authors import author_registry
 
 
 def get_context(nickname: str, question: str, top_k: int = 5) -> list[Document]:
@@ -30,16 +30,7 @@ def get_context(nickname: str, question: str, top_k: int = 5) -> list[Document]:
     
 
 def get_author(nickname: str) -> Author | None:
-
-    matching_authors: list[Author] = [author for author in prepare_sources() if nickname in author.name.lower()]
-
-    if len(matching_authors) == 0:
-        raise Exception(f"The nickname {nickname} doesn't correspond to any existing author")
-    elif len(matching_authors) == 1:
-        # logger.warning(f"Querying {matching_authors[0].name}'s vector database")
-        return matching_authors[0]
-    else:
-        raise Exception(f"The nickname {nickname} correponds to {len(matching_authors)} authors. Pick a better nickname!")
+    return author_registry.find(nickname=nickname)
 
 
 def get_prompt(context: str, question: str) -> str:
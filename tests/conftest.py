@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+from pypdf import PdfWriter
+
+import src.data_preparation.ocr as ocr
+from src.data_preparation.sourcing import Author
+from src.data_preparation.checkpoints import OCRPageStore
+
+
+class EmptyInventory:
+    """
+    An inventory that knows no hashes, so that the hash of each PDF is computed from the file itself.
+    """
+    def get_hashes(self, author: Author) -> dict[str, str]:
+        return {}
+
+
+def write_pdf(path: Path, number_of_pages: int) -> Path:
+    writer = PdfWriter()
+    for _ in range(number_of_pages):
+        _ = writer.add_blank_page(width=595, height=842)
+
+    with open(path, mode="wb") as file:
+        _ = writer.write(file)
+
+    return path
+
+
+@pytest.fixture
+def author(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> Author:
+    """
+    An author whose raw files, and everything that OCR writes, are kept in a temporary directory.
+    """
+    for name in ["OCR_IMAGES", "PDFS_AFTER_OCR", "TXT_AFTER_OCR", "PAGES_AFTER_OCR"]:
+        directory: Path = tmp_path.joinpath(name)
+        directory.mkdir()
+        monkeypatch.setattr(ocr, name, directory)
+
+    store = OCRPageStore(database_path=tmp_path.joinpath("ocr_pages.db"))
+    monkeypatch.setattr(ocr, "make_fundamental_paths", lambda: None)
+    monkeypatch.setattr(ocr, "raw_file_inventory", EmptyInventory())
+    monkeypatch.setattr("src.data_preparation.checkpoints.DATA_DIR", tmp_path)
+    monkeypatch.setattr(ocr, "ocr_pages", store)
+    monkeypatch.setattr("src.data_preparation.text_layer.ocr_pages", store)
+
+    author = Author(name="Test Author")
+    author.path_to_raw_data = tmp_path
+    return author
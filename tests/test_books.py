@@ -0,0 +1,49 @@
+from pathlib import Path
+
+import pytest
+
+from src.data_preparation.books import BookIndex, BookRecord
+from src.data_preparation.inventory import RawFileInventory
+from src.data_preparation.sourcing import Author, ViaHTTP
+
+
+def make_author(raw_dir: Path) -> Author:
+    author = Author(name="Test Author", books_via_http=[ViaHTTP(title="Known Book", url=None, start_page=2, end_page=5)])
+    author.path_to_raw_data = raw_dir
+    author.paths_made = True
+    return author
+
+
+@pytest.mark.parametrize(
+    ("file_name", "expected_format"),
+    [("book.pdf", ".pdf"), ("Book.PDF", ".pdf"), ("book.Epub", ".epub"), ("book.azw3", ".azw3"), ("README", "")]
+)
+def test_format_of_any_raw_file(file_name: str, expected_format: str) -> None:
+    assert BookRecord(file_name=file_name, source="torrent").format == expected_format
+
+
+def test_index_looks_up_books_by_file_name(tmp_path: Path) -> None:
+    index = BookIndex(author=make_author(raw_dir=tmp_path))
+
+    known: BookRecord = index.get(file_name="known_book.pdf")
+    assert (known.source, known.core_pages) == ("http", range(2, 5))
+
+    unknown: BookRecord = index.get(file_name="Other Book.AZW3")
+    assert (unknown.source, unknown.format, unknown.core_pages) == ("torrent", ".azw3", None)
+
+
+def test_inventory_refresh_accepts_any_extension(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr("src.data_preparation.inventory.DATA_DIR", tmp_path)
+    raw_dir: Path = tmp_path.joinpath("raw")
+    raw_dir.mkdir()
+
+    file_names: list[str] = ["known_book.pdf", "Book.PDF", "book.azw3"]
+    for file_name in file_names:
+        _ = raw_dir.joinpath(file_name).write_bytes(b"contents of " + file_name.encode())
+
+    inventory = RawFileInventory(database_path=tmp_path.joinpath("inventory.db"))
+    author: Author = make_author(raw_dir=raw_dir)
+    inventory.refresh(author=author)
+
+    assert sorted(inventory.get_file_names(author=author)) == sorted(file_names)
+    assert inventory.get_file_names(author=author, origin="http") == ["known_book.pdf"]
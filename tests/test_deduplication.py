@@ -0,0 +1,108 @@
+from pathlib import Path
+
+import pytest
+
+import src.data_preparation.deduplication as deduplication
+from src.data_preparation.sourcing import Author
+from src.data_preparation.inventory import RawFileInventory
+from src.data_preparation.deduplication import DuplicateFinder, DuplicateGroup, RawFile
+
+
+def make_words(start: int, end: int) -> str:
+    return " ".join(f"word{number}" for number in range(start, end))
+
+
+def make_file(directory: Path, file_name: str, contents: str, source: str = "torrent") -> RawFile:
+    path: Path = directory.joinpath(file_name)
+    _ = path.write_text(contents)
+    return RawFile(path=path, sha256=f"hash of {contents}", source=source)
+
+
+@pytest.fixture
+def finder(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> DuplicateFinder:
+    """
+    A finder whose signatures are stored in a temporary inventory.
+    """
+    monkeypatch.setattr("src.data_preparation.inventory.DATA_DIR", tmp_path)
+    monkeypatch.setattr(deduplication, "raw_file_inventory", RawFileInventory(database_path=tmp_path.joinpath("inventory.db")))
+    return DuplicateFinder(author=Author(name="Test Author"))
+
+
+def get_names(groups: list[DuplicateGroup]) -> list[list[str]]:
+    return [sorted(file.name for file in group.files) for group in groups]
+
+
+def test_files_with_the_same_title_are_grouped(finder: DuplicateFinder, tmp_path: Path) -> None:
+    files: list[RawFile] = [
+        make_file(directory=tmp_path, file_name="The Book.pdf", contents=make_words(0, 50)),
+        make_file(directory=tmp_path, file_name="The Book (1a2b3c4d).epub", contents=make_words(100, 150)),
+        make_file(directory=tmp_path, file_name="Another Book.pdf", contents=make_words(200, 250)),
+    ]
+
+    groups: list[DuplicateGroup] = finder.find_groups(files=files, near_duplicates=False)
+    assert get_names(groups=groups) == [["The Book (1a2b3c4d).epub", "The Book.pdf"]]
+    assert groups[0].reasons == {"title"}
+
+
+def test_files_with_identical_contents_are_grouped(finder: DuplicateFinder, tmp_path: Path) -> None:
+    files: list[RawFile] = [
+        make_file(directory=tmp_path, file_name="first.pdf", contents=make_words(0, 50)),
+        make_file(directory=tmp_path, file_name="second.pdf", contents=make_words(0, 50)),
+        make_file(directory=tmp_path, file_name="third.pdf", contents=make_words(200, 250)),
+    ]
+
+    groups: list[DuplicateGroup] = finder.find_groups(files=files, near_duplicates=False)
+    assert get_names(groups=groups) == [["first.pdf", "second.pdf"]]
+    assert groups[0].reasons == {"identical contents"}
+
+
+def test_near_duplicate_texts_are_grouped(finder: DuplicateFinder, tmp_path: Path) -> None:
+    files: list[RawFile] = [
+        make_file(directory=tmp_path, file_name="speeches.txt", contents=make_words(0, 100)),
+        make_file(directory=tmp_path, file_name="selected_speeches.txt", contents=make_words(0, 95)),
+        make_file(directory=tmp_path, file_name="letters.txt", contents=make_words(500, 600)),
+    ]
+
+    groups: list[DuplicateGroup] = finder.find_groups(files=files)
+    assert get_names(groups=groups) == [["selected_speeches.txt", "speeches.txt"]]
+    assert groups[0].reasons == {"similar text"}
+
+
+def test_texts_are_not_chained_into_a_group_through_a_text_that_is_similar_to_both(
+    finder: DuplicateFinder, tmp_path: Path
+) -> None:
+    # The first two and the last two overlap by about 73% of their shingles, but the first and last only by about 52%
+    files: list[RawFile] = [
+        make_file(directory=tmp_path, file_name="early.txt", contents=make_words(0, 100)),
+        make_file(directory=tmp_path, file_name="middle.txt", contents=make_words(15, 115)),
+        make_file(directory=tmp_path, file_name="late.txt", contents=make_words(30, 130)),
+    ]
+
+    groups: list[DuplicateGroup] = finder.find_groups(files=files)
+    assert len(groups) == 1
+    assert "middle.txt" in get_names(groups=groups)[0]
+    assert len(groups[0].files) == 2
+
+
+def test_largest_file_in_the_preferred_format_is_kept(tmp_path: Path) -> None:
+    small: RawFile = make_file(directory=tmp_path, file_name="small.pdf", contents="short")
+    large: RawFile = make_file(directory=tmp_path, file_name="large.pdf", contents="much longer")
+    epub: RawFile = make_file(directory=tmp_path, file_name="book.epub", contents="the longest of them all")
+    text: RawFile = make_file(directory=tmp_path, file_name="book.txt", contents="text")
+
+    group = DuplicateGroup(files=[small, large, epub, text], reasons={"title"})
+    group.apply_format_preferences()
+
+    assert (group.keep, group.delete) == ([text, large], [small, epub])
+
+
+@pytest.mark.parametrize("source", ["http", "scraper"])
+def test_files_that_we_download_ourselves_are_never_deleted(source: str, tmp_path: Path) -> None:
+    downloaded: RawFile = make_file(directory=tmp_path, file_name="book.pdf", contents="short", source=source)
+    larger: RawFile = make_file(directory=tmp_path, file_name="book (1a2b3c4d).pdf", contents="much longer")
+    epub: RawFile = make_file(directory=tmp_path, file_name="book.epub", contents="an epub")
+
+    group = DuplicateGroup(files=[larger, downloaded, epub], reasons={"title"})
+    group.apply_format_preferences()
+
+    assert (group.keep, group.delete) == ([downloaded], [larger, epub])
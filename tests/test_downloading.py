@@ -0,0 +1,231 @@
+import time
+import threading
+from io import BytesIO
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+import requests
+
+import src.data_preparation.sourcing as sourcing
+import src.data_preparation.downloading as downloading
+import src.data_preparation.torrenting as torrenting
+from src.data_preparation.caching import HTTPCache
+from src.data_preparation.inventory import RawFileInventory
+from src.data_preparation.sourcing import Author, ViaHTTP, ViaTorrent
+from src.data_preparation.downloading import DownloadJob, DownloadScheduler, DownloadTotals
+from src.data_preparation.torrenting import TorrentManager
+
+
+BOOK: bytes = b"%PDF the whole book"
+
+
+def make_author() -> Author:
+    return Author(
+        name="Test Author",
+        books_via_http=[ViaHTTP(title="Book", url="https://example.com/book.pdf")],
+        books_via_torrent=[ViaTorrent(magnet="magnet:?xt=urn:btih:0")]
+    )
+
+
+def download_http(failed: bool):
+    def download_authors(self: DownloadScheduler, authors: list[Author]) -> DownloadTotals:
+        totals = DownloadTotals()
+        job = DownloadJob(author_name=authors[0].name, book=authors[0].books_via_http[0], file_path=Path("book.pdf"))
+        totals.record(job=job, bytes_written=None if failed else 100)
+        return totals
+
+    return download_authors
+
+
+def open_no_session(self: TorrentManager) -> None:
+    pass
+
+
+def download_torrents(failed: bool):
+    def download_authors(self: TorrentManager, authors: list[Author]) -> list[str]:
+        return [f"the torrent 0 for {authors[0].name}"] if failed else []
+
+    return download_authors
+
+
+@pytest.mark.parametrize(("http_failed", "torrent_failed"), [(True, False), (False, True), (True, True)])
+def test_failed_downloads_are_raised(http_failed: bool, torrent_failed: bool, monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(DownloadScheduler, "download_authors", download_http(failed=http_failed))
+    monkeypatch.setattr(TorrentManager, "__init__", open_no_session)
+    monkeypatch.setattr(TorrentManager, "download_authors", download_torrents(failed=torrent_failed))
+
+    with pytest.raises(Exception, match="Failed to download"):
+        make_author().download_books()
+
+
+def test_successful_downloads_are_not_raised(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(DownloadScheduler, "download_authors", download_http(failed=False))
+    monkeypatch.setattr(TorrentManager, "__init__", open_no_session)
+    monkeypatch.setattr(TorrentManager, "download_authors", download_torrents(failed=False))
+
+    make_author().download_books()
+
+
+def test_concurrent_managers_do_not_share_a_port(monkeypatch: pytest.MonkeyPatch) -> None:
+    settings: list[dict[str, str]] = []
+    monkeypatch.setattr(torrenting.lt, "session", lambda session_settings: settings.append(session_settings))
+
+    _ = TorrentManager()
+    _ = TorrentManager()
+    assert settings == [{"listen_interfaces": "0.0.0.0:0"}] * 2
+
+
+class FinishedRangeSession:
+    """
+    A session for a server that answers a Range request that starts at the end of the file with a 416.
+    """
+    def get(self, url: str, headers: dict[str, str], stream: bool, timeout: float) -> requests.Response:
+        response = requests.Response()
+        response.url = url
+
+        if headers.get("Range") == f"bytes={len(BOOK)}-":
+            response.status_code = 416
+            response.headers["Content-Range"] = f"bytes */{len(BOOK)}"
+            response.raw = BytesIO(b"")
+        else:
+            response.status_code = 200
+            response.headers["Content-Length"] = str(len(BOOK))
+            response.raw = BytesIO(BOOK)
+
+        return response
+
+
+@pytest.fixture
+def partly_downloaded_book(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> DownloadJob:
+    """
+    A book whose every byte was downloaded into its partial file by a run that was interrupted before the file
+    could be moved into place.
+    """
+    monkeypatch.setattr(sourcing, "PARTIAL_DOWNLOADS", tmp_path)
+    monkeypatch.setattr(sourcing, "make_fundamental_paths", lambda: None)
+    monkeypatch.setattr(sourcing, "http_cache", HTTPCache(cache_dir=tmp_path.joinpath("http_cache")))
+
+    book = ViaHTTP(title="Book", url="https://example.com/book.pdf")
+    job = DownloadJob(author_name="Test Author", book=book, file_path=tmp_path.joinpath("raw", "book.pdf"))
+    job.file_path.parent.mkdir()
+
+    _ = book.get_partial_path(file_path=str(job.file_path)).write_bytes(BOOK)
+    return job
+
+
+def test_resumed_download_of_a_finished_partial_file_is_counted(partly_downloaded_book: DownloadJob) -> None:
+    job: DownloadJob = partly_downloaded_book
+    bytes_written: int | None = job.book.download(file_path=str(job.file_path), session=FinishedRangeSession())
+
+    assert bytes_written == len(BOOK)
+    assert job.file_path.read_bytes() == BOOK
+    assert not job.book.get_partial_path(file_path=str(job.file_path)).exists()
+
+
+def test_resumed_download_of_a_finished_partial_file_is_recorded(
+    partly_downloaded_book: DownloadJob, tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("src.data_preparation.inventory.DATA_DIR", tmp_path)
+    inventory = RawFileInventory(database_path=tmp_path.joinpath("inventory.db"))
+    monkeypatch.setattr(downloading, "raw_file_inventory", inventory)
+
+    scheduler = DownloadScheduler(max_workers=1, session=FinishedRangeSession())
+    totals: DownloadTotals = scheduler.run(jobs=[partly_downloaded_book])
+
+    assert (totals.downloaded, totals.skipped, totals.failed) == (1, 0, [])
+    assert inventory.connect().execute("SELECT name FROM raw_files").fetchall() == [("book.pdf",)]
+
+
+class StandInServer:
+    """
+    A local HTTP server that serves a different book at every path, and keeps track of the largest number of
+    requests that it was serving at once. Each response is held back for a moment so that requests overlap.
+    """
+    def __init__(self, delay: float = 0.2) -> None:
+        self.delay: float = delay
+        self.active: int = 0
+        self.peak: int = 0
+        self.requests: int = 0
+        self.lock: threading.Lock = threading.Lock()
+        self.server: ThreadingHTTPServer = ThreadingHTTPServer(("127.0.0.1", 0), self.make_handler())
+        self.thread: threading.Thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def host(self) -> str:
+        return f"127.0.0.1:{self.server.server_address[1]}"
+
+    @staticmethod
+    def get_book(path: str) -> bytes:
+        return f"%PDF the whole of {path} ".encode() * (1 + len(path))
+
+    def make_handler(self) -> type[BaseHTTPRequestHandler]:
+        stand_in: StandInServer = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:
+                with stand_in.lock:
+                    stand_in.requests += 1
+                    stand_in.active += 1
+                    stand_in.peak = max(stand_in.peak, stand_in.active)
+
+                try:
+                    time.sleep(stand_in.delay)
+                    book: bytes = stand_in.get_book(path=self.path)
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/pdf")
+                    self.send_header("Content-Length", str(len(book)))
+                    self.end_headers()
+                    _ = self.wfile.write(book)
+                finally:
+                    with stand_in.lock:
+                        stand_in.active -= 1
+
+            def log_message(self, format: str, *args: object) -> None:
+                pass
+
+        return Handler
+
+    def __enter__(self) -> "StandInServer":
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exception: object) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+        self.thread.join()
+
+
+def test_scheduler_pools_downloads_from_a_local_server_within_the_limit_per_host(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr(sourcing, "PARTIAL_DOWNLOADS", tmp_path)
+    monkeypatch.setattr(sourcing, "make_fundamental_paths", lambda: None)
+    monkeypatch.setattr(sourcing, "http_cache", HTTPCache(cache_dir=tmp_path.joinpath("http_cache")))
+    monkeypatch.setattr("src.data_preparation.inventory.DATA_DIR", tmp_path)
+    monkeypatch.setattr(downloading, "raw_file_inventory", RawFileInventory(database_path=tmp_path.joinpath("inventory.db")))
+    tmp_path.joinpath("raw").mkdir()
+
+    with StandInServer() as first_host, StandInServer() as second_host:
+        jobs: list[DownloadJob] = [
+            DownloadJob(
+                author_name="Test Author",
+                book=ViaHTTP(title=f"Book {number} from {host}", url=f"http://{server.host}/book_{number}.pdf"),
+                file_path=tmp_path.joinpath("raw", f"book_{number}_from_host_{host}.pdf")
+            )
+            for host, server in enumerate([first_host, second_host]) for number in range(6)
+        ]
+
+        scheduler = DownloadScheduler(max_workers=8, max_workers_per_host=2)
+        start_time: float = time.perf_counter()
+        totals: DownloadTotals = scheduler.run(jobs=jobs)
+        seconds_elapsed: float = time.perf_counter() - start_time
+
+    books: list[bytes] = [StandInServer.get_book(path=f"/book_{number}.pdf") for host in range(2) for number in range(6)]
+    assert (totals.downloaded, totals.skipped, totals.failed) == (12, 0, [])
+    assert totals.bytes_downloaded == sum(len(book) for book in books)
+    assert [job.file_path.read_bytes() for job in jobs] == books
+
+    assert (first_host.requests, second_host.requests) == (6, 6)
+    assert (first_host.peak, second_host.peak) == (2, 2)
+    assert seconds_elapsed < 12 * first_host.delay / 2  # Both hosts were served at once, not one after the other
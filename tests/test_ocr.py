@@ -0,0 +1,187 @@
+import json
+import random
+import shutil
+from io import BytesIO
+from pathlib import Path
+
+import pytest
+from PIL import Image, ImageDraw, ImageFont
+from pypdf import PdfReader, PdfWriter
+
+import src.data_preparation.ocr as ocr
+from src.data_preparation.ocr import OCRModule, make_windows, read_words
+from src.data_preparation.checkpoints import OCRPage, OCRPageStore
+from src.data_preparation.sourcing import Author
+from src.data_preparation.text_layer import TextLayerScanner
+from src.data_preparation.preprocessing import PreprocessingConfig
+
+
+WORDS: list[str] = ["people", "freedom", "history", "struggle", "nation", "labour", "land", "power", "unity", "state"]
+
+# OCR itself needs Tesseract, and rasterizing the pages of a PDF needs Poppler
+needs_ocr_binaries = pytest.mark.skipif(
+    shutil.which("tesseract") == None or shutil.which("pdftoppm") == None, reason="Tesseract and Poppler are not installed"
+)
+
+
+def make_scanned_pdf(path: Path, number_of_pages: int, dpi: int = 150, seed: int = 0) -> Path:
+    """
+    Write a PDF whose pages are only images of text (with a little noise and skew, like a scan), each of which
+    starts with a line that says which page it is.
+    """
+    generator = random.Random(seed)
+    font = ImageFont.load_default(size=dpi // 5)
+    pages: list[Image.Image] = []
+
+    for page_number in range(1, number_of_pages + 1):
+        page: Image.Image = Image.new(mode="L", size=(int(4.1 * dpi), int(5.8 * dpi)), color=255)  # A6
+        draw = ImageDraw.Draw(page)
+        lines: list[str] = [f"Page {page_number}"] + [" ".join(generator.choices(WORDS, k=3)) for _ in range(4)]
+
+        for line_number, line in enumerate(lines):
+            draw.text(xy=(dpi // 2, dpi // 2 + line_number * dpi // 3), text=line, fill=0, font=font)
+
+        page = page.rotate(angle=generator.uniform(-0.5, 0.5), fillcolor=255)
+        for _ in range(200):
+            page.putpixel(xy=(generator.randrange(page.width), generator.randrange(page.height)), value=generator.randint(0, 120))
+
+        pages.append(page)
+
+    pages[0].save(path, format="PDF", resolution=dpi, save_all=True, append_images=pages[1:])
+    return path
+
+
+def read_pages(module: OCRModule, file_path: Path) -> list[dict[str, int | str | float | bool | None]]:
+    with open(module.get_pages_path(file_path=file_path), mode="r") as file:
+        return [json.loads(line) for line in file]
+
+
+@pytest.mark.parametrize(
+    ("page_numbers", "window_size", "expected"),
+    [
+        ([1, 2, 3, 4, 5], 2, [(1, 2), (3, 4), (5, 5)]),
+        ([7, 3, 4, 9, 10], 4, [(3, 4), (7, 7), (9, 10)]),
+        ([1, 2, 3], 1, [(1, 1), (2, 2), (3, 3)]),
+        ([], 4, []),
+    ]
+)
+def test_windows_cover_each_page_once(page_numbers: list[int], window_size: int, expected: list[tuple[int, int]]) -> None:
+    windows: list[tuple[int, int]] = make_windows(page_numbers=page_numbers, window_size=window_size)
+
+    assert windows == expected
+    assert [page for first, last in windows for page in range(first, last + 1)] == sorted(page_numbers)
+
+
+def test_words_are_put_back_into_lines_and_paragraphs() -> None:
+    words: dict[str, list[str | int | float]] = {
+        "block_num": [1, 1, 1, 1, 1, 2, 2],
+        "par_num": [1, 1, 1, 1, 1, 1, 1],
+        "line_num": [0, 1, 1, 2, 2, 1, 1],
+        "text": ["", "Page", "3", "the", " ", "new", "paragraph"],
+        "conf": [-1, 90, 80, 70, 95, 60, 50],
+    }
+    page = read_words(words=words)
+
+    assert page.output == "Page 3\nthe\n\nnew paragraph"
+    assert page.confidence == 70.0
+
+
+def test_generated_scans_need_ocr(author: Author) -> None:
+    path: Path = make_scanned_pdf(path=author.path_to_raw_data.joinpath("scan.pdf"), number_of_pages=3)
+    assert TextLayerScanner().scan(pdf_path=path) == [1, 2, 3]
+
+
+def make_blank_page() -> bytes:
+    writer = PdfWriter()
+    _ = writer.add_blank_page(width=595, height=842)
+    output = BytesIO()
+    _ = writer.write(output)
+    return output.getvalue()
+
+
+def fake_ocr_window(windows: list[tuple[int, int]]):
+    """
+    Stand in for the OCR of a window of pages (which is called directly when OCR runs serially), recording each
+    window. Pages come out as a blank single-page PDF, or as text that says which page it is.
+    """
+    def ocr_window(
+        pdf_path: Path, first_page: int, last_page: int, preprocessing: PreprocessingConfig, image_dir: Path | None, output_format: str, language: str
+    ) -> list[OCRPage]:
+        windows.append((first_page, last_page))
+        return [
+            OCRPage(output=make_blank_page() if output_format == ".pdf" else f"Page {number} after OCR", confidence=90.0)
+            for number in range(first_page, last_page + 1)
+        ]
+
+    return ocr_window
+
+
+def test_merged_output_is_read_back_from_the_store_a_page_at_a_time(author: Author, monkeypatch: pytest.MonkeyPatch) -> None:
+    file_path: Path = make_scanned_pdf(path=author.path_to_raw_data.joinpath("scan.pdf"), number_of_pages=5)
+    monkeypatch.setattr(ocr, "ocr_window", fake_ocr_window(windows=[]))
+
+    pages_read: list[int] = []
+    get_page = OCRPageStore.get_page
+
+    def record_read(store: OCRPageStore, book_sha256: str, page: int, **settings: int | str) -> OCRPage | None:
+        pages_read.append(page)
+        return get_page(store, book_sha256=book_sha256, page=page, **settings)
+
+    monkeypatch.setattr(OCRPageStore, "get_page", record_read)
+    module = OCRModule(author=author, workers=1, window_size=2)
+    module.process_file(file_path=file_path)
+
+    assert pages_read == [1, 2, 3, 4, 5]
+    assert len(PdfReader(module.get_output_path(file_path=file_path)).pages) == 5
+    assert [page["page"] for page in read_pages(module=module, file_path=file_path)] == [1, 2, 3, 4, 5]
+    assert module.has_output(file_path=file_path, settings=module.describe_settings(page_numbers=range(1, 6)))
+
+
+def test_resumed_ocr_only_ocrs_the_pages_that_were_not_recorded(author: Author, monkeypatch: pytest.MonkeyPatch) -> None:
+    file_path: Path = make_scanned_pdf(path=author.path_to_raw_data.joinpath("scan.pdf"), number_of_pages=5)
+    module = OCRModule(author=author, output_format=".txt", workers=1, window_size=2)
+
+    # An earlier run that was interrupted after it had OCR'd the second and third pages
+    book_sha256: str = module.get_book_hash(file_path=file_path)
+    earlier_pages: dict[int, OCRPage] = {number: OCRPage(output=f"Page {number} from an earlier run", confidence=80.0) for number in [2, 3]}
+    ocr.ocr_pages.store_pages(book_sha256=book_sha256, pages=earlier_pages, **module.describe_page_settings())
+
+    windows: list[tuple[int, int]] = []
+    monkeypatch.setattr(ocr, "ocr_window", fake_ocr_window(windows=windows))
+    module.process_file(file_path=file_path)
+
+    assert windows == [(1, 1), (4, 5)]
+    assert [page["text"] for page in read_pages(module=module, file_path=file_path)] == [
+        "Page 1 after OCR", "Page 2 from an earlier run", "Page 3 from an earlier run", "Page 4 after OCR", "Page 5 after OCR"
+    ]
+
+
+@needs_ocr_binaries
+@pytest.mark.parametrize("output_format", [".txt", ".pdf"])
+def test_parallel_ocr_matches_serial_ocr(author: Author, output_format: str) -> None:
+    file_path: Path = make_scanned_pdf(path=author.path_to_raw_data.joinpath("scan.pdf"), number_of_pages=7)
+    outputs: list[list[dict[str, int | str | float | bool | None]]] = []
+
+    for workers in [1, 3]:
+        # A different DPI for each run, so that the second run doesn't reuse the pages that the first one OCR'd
+        module = OCRModule(
+            author=author, output_format=output_format, workers=workers, window_size=2, preprocessing=PreprocessingConfig(dpi=150 + workers)
+        )
+        module.process_file(file_path=file_path)
+        pages: list[dict[str, int | str | float | bool | None]] = read_pages(module=module, file_path=file_path)
+
+        assert [page["page"] for page in pages] == list(range(1, 8))
+        assert all(page["ocr"] for page in pages)
+        assert all(f"Page {page['page']}" in str(page["text"]) for page in pages), "The pages were put back out of order"
+
+        if output_format == ".pdf":
+            merged = PdfReader(module.get_output_path(file_path=file_path))
+            assert [f"Page {number}" in page.extract_text() for number, page in enumerate(merged.pages, start=1)] == [True] * 7
+        else:
+            text: str = module.get_output_path(file_path=file_path).read_text()
+            assert [text.index(f"Page {number}") for number in range(1, 8)] == sorted(text.index(f"Page {number}") for number in range(1, 8))
+
+        outputs.append(pages)
+
+    assert [page["page"] for page in outputs[0]] == [page["page"] for page in outputs[1]]
+    assert [str(page["text"]).splitlines()[0] for page in outputs[0]] == [str(page["text"]).splitlines()[0] for page in outputs[1]]
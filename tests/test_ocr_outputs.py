@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import src.data_preparation.ocr as ocr
+from src.data_preparation.ocr import OCRModule
+from src.data_preparation.sourcing import Author, ViaHTTP
+from src.data_preparation.preprocessing import PreprocessingConfig
+from src.data_processing.cleaning import Cleaner
+
+from tests.conftest import write_pdf
+
+
+def build_output(module: OCRModule, file_path: Path, page_numbers: range) -> None:
+    """
+    Write the final output of OCR for the book, and record it, as process_file does once OCR is done.
+    """
+    _ = module.get_output_path(file_path=file_path).write_bytes(b"%PDF merged")
+    _ = module.get_pages_path(file_path=file_path).write_text('{"page": 1, "text": "", "confidence": null, "ocr": true}\n')
+    ocr.ocr_pages.store_output(
+        output_path=module.get_output_path(file_path=file_path),
+        book_sha256=module.get_book_hash(file_path=file_path),
+        settings=module.describe_settings(page_numbers=page_numbers)
+    )
+
+
+def test_output_is_only_reused_for_the_same_book_and_settings(author: Author) -> None:
+    file_path: Path = write_pdf(path=author.path_to_raw_data.joinpath("book.pdf"), number_of_pages=3)
+    module = OCRModule(author=author)
+    page_numbers = range(1, 4)
+
+    assert not module.is_book_already_processed(file_path=file_path, page_numbers=page_numbers)
+
+    build_output(module=module, file_path=file_path, page_numbers=page_numbers)
+    assert module.is_book_already_processed(file_path=file_path, page_numbers=page_numbers)
+    assert not module.is_book_already_processed(file_path=file_path, page_numbers=range(1, 3))
+
+    binarizing_module = OCRModule(author=author, preprocessing=PreprocessingConfig(binarize=True))
+    assert not binarizing_module.is_book_already_processed(file_path=file_path, page_numbers=page_numbers)
+    assert binarizing_module.has_output(file_path=file_path)  # The output is still that of the current PDF
+
+    _ = write_pdf(path=file_path, number_of_pages=4)  # A new version of the book
+    assert not module.is_book_already_processed(file_path=file_path, page_numbers=page_numbers)
+    assert not module.has_output(file_path=file_path)
+
+
+def test_unrecorded_output_is_not_trusted(author: Author) -> None:
+    file_path: Path = write_pdf(path=author.path_to_raw_data.joinpath("book.pdf"), number_of_pages=2)
+    module = OCRModule(author=author)
+
+    _ = module.get_output_path(file_path=file_path).write_bytes(b"%PDF merged")
+    _ = module.get_pages_path(file_path=file_path).write_text("")
+
+    assert not module.has_output(file_path=file_path)
+
+
+def test_output_for_other_core_pages_is_not_cleaned(author: Author) -> None:
+    book = ViaHTTP(title="Book", url="https://example.com/book.pdf", needs_ocr=True, start_page=1, end_page=3)
+    author.books_via_http = [book]
+    file_path: Path = write_pdf(path=author.path_to_raw_data.joinpath("book.pdf"), number_of_pages=4)
+
+    build_output(module=OCRModule(author=author), file_path=file_path, page_numbers=range(2, 4))
+    assert Cleaner(author=author).find_text(file_path=file_path) == (OCRModule(author=author).get_pages_path(file_path=file_path), ".jsonl", None)
+
+    # The same book, whose core pages have since been corrected
+    corrected = Author(name=author.name, books_via_http=[ViaHTTP(title="Book", url=book.url, needs_ocr=True, start_page=0, end_page=3)])
+    corrected.path_to_raw_data = author.path_to_raw_data
+    assert Cleaner(author=corrected).find_text(file_path=file_path) == (file_path, ".pdf", range(0, 3))
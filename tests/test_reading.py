@@ -0,0 +1,172 @@
+from pathlib import Path
+
+import pytest
+from ebooklib import epub
+from pypdf import PageObject, PdfReader, PdfWriter
+from pypdf.generic import DecodedStreamObject, DictionaryObject, NameObject
+from langchain_core.documents import Document
+
+from src.data_processing.reading import html_to_text, read_chapters, read_pdf_pages
+
+
+CHAPTERS: list[tuple[str, str]] = [
+    (
+        "Chapter One",
+        "<h1>Chapter One</h1><style>p { margin: 0 }</style><p>The people &amp; the <b>land</b>.</p>"
+        "<script>var pages = 1;</script><p>Café society</p>"
+    ),
+    (
+        "Chapter Two",
+        "<h2>Chapter Two</h2><!-- a comment --><p>Freedom<br/>and unity</p><template><p>Hidden</p></template>"
+    ),
+]
+
+
+def make_epub(path: Path) -> Path:
+    book = epub.EpubBook()
+    book.set_identifier("test-book")
+    book.set_title("A Test Book")
+    book.set_language("en")
+
+    stylesheet = epub.EpubItem(uid="style", file_name="style.css", media_type="text/css", content=b"body { color: black }")
+    book.add_item(stylesheet)
+
+    items: list[epub.EpubHtml] = []
+    for number, (title, body) in enumerate(CHAPTERS, start=1):
+        item = epub.EpubHtml(title=title, file_name=f"chapter_{number}.xhtml", lang="en")
+        item.content = f"<html><head><title>{title} (head)</title></head><body>{body}</body></html>"
+        item.add_item(stylesheet)
+        book.add_item(item)
+        items.append(item)
+
+    book.toc = items
+    book.spine = ["nav"] + items
+    book.add_item(epub.EpubNcx())
+    book.add_item(epub.EpubNav())
+
+    epub.write_epub(str(path), book)
+    return path
+
+
+def read_texts(path: Path) -> list[tuple[str, dict[str, str | int]]]:
+    chapters: list[Document] = list(read_chapters(path=path))
+    return [(chapter.page_content, chapter.metadata) for chapter in chapters]
+
+
+def test_markup_that_is_not_text_is_left_out() -> None:
+    markup: bytes = (
+        b'<?xml version="1.0" encoding="utf-8"?><html><head><title>Ch 1</title><style>p{margin:0}</style></head>'
+        b"<body><h1>Chapter One</h1><script>var x=1;</script>tail<p>text</p></body></html>"
+    )
+    assert html_to_text(markup=markup) == ("Chapter Onetailtext", "Chapter One")
+
+
+@pytest.mark.parametrize(
+    "markup",
+    [
+        b"<html><body>\n<p>a &nbsp; </p>\t\n<p>b</p></body></html>",
+        b"<div>\n <pre>  x\n  y </pre>\n</div>",
+        b"<h3>Title</h3>  <p>x<style>a { }</style>  </p> tail ",
+        b"<p>caf\xc3\xa9 \xe2\x80\x94 x</p>\r\n<p>y</p>",  # A section of an old MOBI file, with no declared encoding
+        b"<html><head><title>t</title></head>\n<body>\n<textarea>  </textarea> <p>z</p>\n</body>\n</html>",
+    ]
+)
+def test_lxml_and_beautiful_soup_agree_on_markup(markup: bytes, monkeypatch: pytest.MonkeyPatch) -> None:
+    with_lxml: tuple[str, str | None] = html_to_text(markup=markup)
+    monkeypatch.setattr("src.data_processing.reading.find_spec", lambda name: None)
+    assert with_lxml == html_to_text(markup=markup)
+
+
+def test_lxml_and_beautiful_soup_agree_on_epub_chapters(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path: Path = make_epub(path=tmp_path.joinpath("book.epub"))
+    with_lxml: list[tuple[str, dict[str, str | int]]] = read_texts(path=path)
+
+    monkeypatch.setattr("src.data_processing.reading.find_spec", lambda name: None)
+    with_beautiful_soup: list[tuple[str, dict[str, str | int]]] = read_texts(path=path)
+
+    assert with_lxml == with_beautiful_soup
+    assert [metadata["chapter_title"] for _, metadata in with_lxml][-2:] == ["Chapter One", "Chapter Two"]
+
+    text: str = " ".join(text for text, _ in with_lxml)
+    for leaked in ["margin", "var pages", "(head)", "Hidden", "a comment", "color: black"]:
+        assert leaked not in text
+
+
+def make_text_pdf(path: Path, number_of_pages: int) -> Path:
+    """
+    Write a PDF with a text layer, in which each page only says which page it is.
+    """
+    writer = PdfWriter()
+    font = DictionaryObject({
+        NameObject("/Type"): NameObject("/Font"),
+        NameObject("/Subtype"): NameObject("/Type1"),
+        NameObject("/BaseFont"): NameObject("/Helvetica")
+    })
+
+    for page_number in range(number_of_pages):
+        page: PageObject = PageObject.create_blank_page(width=595, height=842)
+        page[NameObject("/Resources")] = DictionaryObject({NameObject("/Font"): DictionaryObject({NameObject("/F1"): font})})
+
+        stream = DecodedStreamObject()
+        stream.set_data(f"BT /F1 12 Tf 60 790 Td (Page {page_number}) Tj ET".encode())
+        page.replace_contents(stream)
+        _ = writer.add_page(page)
+
+    with open(path, mode="wb") as file:
+        _ = writer.write(file)
+
+    return path
+
+
+def read_page_numbers(path: Path, pages: range | None) -> list[int]:
+    return [document.metadata["page"] for document in read_pdf_pages(path=path, pages=pages)]
+
+
+def test_only_the_core_pages_are_read_in_order(tmp_path: Path) -> None:
+    path: Path = make_text_pdf(path=tmp_path.joinpath("book.pdf"), number_of_pages=10)
+    documents: list[Document] = list(read_pdf_pages(path=path, pages=range(2, 7)))
+
+    assert [document.page_content for document in documents] == [f"Page {number}" for number in range(2, 7)]
+    assert [document.metadata for document in documents] == [
+        {"source": str(path), "page": number, "page_label": str(number + 1), "total_pages": 10} for number in range(2, 7)
+    ]
+
+
+def test_every_page_is_read_without_core_pages(tmp_path: Path) -> None:
+    path: Path = make_text_pdf(path=tmp_path.joinpath("book.pdf"), number_of_pages=6)
+
+    assert read_page_numbers(path=path, pages=None) == list(range(6))
+    assert [document.page_content for document in read_pdf_pages(path=path)] == [
+        page.extract_text().strip() for page in PdfReader(path).pages
+    ]
+
+
+@pytest.mark.parametrize(
+    ("pages", "expected"),
+    [
+        (range(3, 3), []),
+        (range(5, 2), []),
+        (range(8, 14), [8, 9]),
+        (range(10, 14), []),
+        (range(25, 30), []),
+        (range(-3, 2), [0, 1]),
+    ]
+)
+def test_empty_and_past_the_end_ranges(tmp_path: Path, pages: range, expected: list[int]) -> None:
+    path: Path = make_text_pdf(path=tmp_path.joinpath("book.pdf"), number_of_pages=10)
+    assert read_page_numbers(path=path, pages=pages) == expected
+
+
+def test_pages_outside_the_range_are_not_decoded(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    path: Path = make_text_pdf(path=tmp_path.joinpath("book.pdf"), number_of_pages=10)
+    decoded_pages: list[str] = []
+    extract_text = PageObject.extract_text
+
+    def record_extraction(page: PageObject, *args: object, **kwargs: object) -> str:
+        text: str = extract_text(page, *args, **kwargs)
+        decoded_pages.append(text)
+        return text
+
+    monkeypatch.setattr(PageObject, "extract_text", record_extraction)
+    _ = list(read_pdf_pages(path=path, pages=range(4, 6)))
+    assert decoded_pages == ["Page 4", "Page 5"]
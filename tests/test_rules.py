@@ -0,0 +1,92 @@
+import random
+import itertools
+from pathlib import Path
+
+import pytest
+
+from src.data_preparation.sourcing import Author
+from src.data_preparation.rules import FilePlan, FileRule, RuleSet, make_plan
+
+
+WORDS: list[str] = ["history", "revolution", "letters", "speeches", "collected", "essays", "africa", "freedom", "volume"]
+
+
+def make_file_names(number_of_files: int, biographers: list[str], seed: int) -> list[str]:
+    generator = random.Random(seed)
+    file_names: list[str] = []
+
+    for number in range(number_of_files):
+        words: list[str] = generator.choices(WORDS, k=generator.randint(2, 6))
+        roll: float = generator.random()
+
+        if roll < 0.05:
+            words.insert(generator.randint(0, len(words)), "complete works")
+        if 0.03 < roll < 0.15:  # Some of the names have both a biographer and "complete works" in them
+            words.insert(generator.randint(0, len(words)), generator.choice(biographers))
+
+        file_names.append(f"{' '.join(words)} ({number}){generator.choice(['.pdf', '.epub', '.mobi', '.txt'])}")
+
+    return file_names
+
+
+def classify_pairwise(file_names: list[str], biographers: list[str]) -> set[str]:
+    """
+    The checks that the rule engine replaced: a substring test for every pair of file and biographer, and then
+    another scan for complete works.
+    """
+    to_delete: set[str] = set()
+    for file_name, biographer in itertools.product(file_names, biographers):
+        if biographer in file_name:
+            to_delete.add(file_name)
+
+    return to_delete | {file_name for file_name in file_names if "complete works" in file_name}
+
+
+def classify_leftmost(file_name: str, rule_set: RuleSet) -> str | None:
+    matches: list[tuple[int, int, str]] = [
+        (file_name.find(pattern), precedence, rule_name)
+        for precedence, (pattern, rule_name) in enumerate(rule_set.literals) if pattern in file_name
+    ]
+    return min(matches)[2] if len(matches) > 0 else None
+
+
+@pytest.mark.parametrize("number_of_biographers", [1, 5, 60])
+@pytest.mark.parametrize("single_pass", [False, True])
+def test_plan_matches_pairwise_checks_on_large_listings(number_of_biographers: int, single_pass: bool) -> None:
+    # Some biographers' names are prefixes of others' ("Biographer 1" and "Biographer 10")
+    biographers: list[str] = [f"Biographer {number}" for number in range(number_of_biographers)]
+    author = Author(name="Synthetic Author", books_via_http=[], biographers_and_compilers=biographers)
+    file_names: list[str] = make_file_names(number_of_files=12_000, biographers=biographers, seed=number_of_biographers)
+
+    rule_set = RuleSet(rules=RuleSet.for_author(author=author).rules, single_pass=single_pass)
+    plan: FilePlan = make_plan(file_paths=[Path(file_name) for file_name in file_names], rule_set=rule_set)
+
+    assert {file_path.name for file_path in plan.delete} == classify_pairwise(file_names=file_names, biographers=biographers)
+    assert len(plan.keep) + len(plan.delete) == len(file_names)
+    assert all(reason == classify_leftmost(file_name=file_path.name, rule_set=rule_set) for file_path, reason in plan.delete.items())
+
+
+def test_leftmost_match_wins_and_then_the_first_rule() -> None:
+    rules: list[FileRule] = [FileRule(name="first", patterns=["works", "ab"]), FileRule(name="second", patterns=["abc", "b"])]
+
+    for single_pass in [False, True]:
+        rule_set = RuleSet(rules=rules, single_pass=single_pass)
+        file_names: list[str] = ["abc works", "xbab", "works b", "none", "", "ab", "zzabc"]
+
+        assert rule_set.classify_all(file_names=file_names) == ["first", "second", "first", None, None, "first", "first"]
+        assert rule_set.classify_all(file_names=file_names) == [rule_set.classify(file_name=name) for name in file_names]
+
+
+def test_rules_with_regular_expressions() -> None:
+    rule_set = RuleSet(rules=[FileRule(name="volume", patterns=[r"vol(ume)? \d+"], literal=False)] + RuleSet.for_author(
+        author=Author(name="Synthetic Author", books_via_http=[], biographers_and_compilers=["Biographer"])
+    ).rules)
+
+    file_names: list[str] = ["essays vol 2.pdf", "complete works volume 3.pdf", "letters - Biographer.pdf", "letters.pdf"]
+    assert rule_set.classify_all(file_names=file_names) == ["volume", "complete works", "biographical work", None]
+
+
+def test_author_without_biographers() -> None:
+    rule_set: RuleSet = RuleSet.for_author(author=Author(name="Synthetic Author", books_via_http=[]))
+    assert rule_set.classify_all(file_names=["complete works.pdf", "essays.pdf"]) == ["complete works", None]
+    assert RuleSet(rules=[]).classify_all(file_names=["essays.pdf"]) == [None]
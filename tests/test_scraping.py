@@ -0,0 +1,133 @@
+from pathlib import Path
+
+import pytest
+import requests
+
+import src.data_preparation.scraping_pipeline as scraping_pipeline
+from src.data_preparation.caching import HTTPCache
+from src.data_preparation.inventory import RawFileInventory
+from src.data_preparation.scraping import extract_text, get_parser_features, scrape, truncate_after_terminal_marker
+from src.data_preparation.scraping_pipeline import ScrapeJob, ScrapingPipeline
+from src.data_preparation.sourcing import ViaScraper
+
+
+URL: str = "https://example.com/speech"
+MARKUP: bytes = b"<html><body><p>Start of the speech. The end.</p></body></html>"
+
+
+class FakeSession:
+    """
+    A session that answers every request with the same page, and a 304 if the request is conditional on the
+    page's ETag.
+    """
+    def __init__(self, etag: str = '"v1"') -> None:
+        self.etag: str = etag
+        self.requests: list[dict[str, str]] = []
+
+    def get(self, url: str, headers: dict[str, str], timeout: float) -> requests.Response:
+        self.requests.append(headers)
+        response = requests.Response()
+        response.url = url
+        response.headers["ETag"] = self.etag
+
+        if headers.get("If-None-Match") == self.etag:
+            response.status_code = 304
+            response._content = b""
+        else:
+            response.status_code = 200
+            response._content = MARKUP
+            response.encoding = "utf-8"
+
+        return response
+
+
+@pytest.fixture
+def cache(tmp_path: Path) -> HTTPCache:
+    return HTTPCache(cache_dir=tmp_path.joinpath("http_cache"))
+
+
+def test_validators_are_stored_once_the_text_is_written(tmp_path: Path, cache: HTTPCache) -> None:
+    file_path: Path = tmp_path.joinpath("speech.txt")
+    session = FakeSession()
+
+    assert scrape(url=URL, file_path=file_path, session=session, cache=cache)
+    assert file_path.read_text() == "Start of the speech. The end."
+    assert cache.get_conditional_headers(url=URL) == {"If-None-Match": '"v1"'}
+
+    assert not scrape(url=URL, file_path=file_path, session=session, cache=cache, conditional=True)
+    assert session.requests[-1] == {"If-None-Match": '"v1"'}
+
+
+def test_validators_are_not_stored_when_the_text_is_not_written(tmp_path: Path, cache: HTTPCache) -> None:
+    with pytest.raises(Exception, match="without one of the markers"):
+        _ = scrape(url=URL, file_path=tmp_path.joinpath("speech.txt"), session=FakeSession(), cache=cache, initial_marker="Start")
+
+    with pytest.raises(FileNotFoundError):
+        _ = scrape(url=URL, file_path=tmp_path.joinpath("missing", "speech.txt"), session=FakeSession(), cache=cache)
+
+    assert not cache.has_validators(url=URL)
+
+
+def test_pipeline_stores_validators_only_for_pages_that_were_saved(
+    tmp_path: Path, cache: HTTPCache, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    monkeypatch.setattr("src.data_preparation.inventory.DATA_DIR", tmp_path)
+    monkeypatch.setattr(scraping_pipeline, "http_cache", cache)
+    monkeypatch.setattr(scraping_pipeline, "raw_file_inventory", RawFileInventory(database_path=tmp_path.joinpath("inventory.db")))
+
+    saved = ScrapeJob(author_name="Test Author", book=ViaScraper(title="Saved", url=URL), file_path=tmp_path.joinpath("Saved.txt"))
+    unsaved_url: str = URL + "/unsaved"
+    unsaved = ScrapeJob(
+        author_name="Test Author",
+        book=ViaScraper(title="Unsaved", url=unsaved_url),
+        file_path=tmp_path.joinpath("missing", "Unsaved.txt")
+    )
+
+    pipeline = ScrapingPipeline(fetch_workers=2, parse_workers=1, requests_per_second_per_domain=100, session=FakeSession())
+    with pytest.raises(Exception, match="Scraping of 1 books failed"):
+        pipeline.run(jobs=[saved, unsaved])
+
+    assert saved.file_path.read_text() == "Start of the speech. The end."
+    assert cache.has_validators(url=URL)
+    assert not cache.has_validators(url=unsaved_url)
+
+
+def test_pages_are_parsed_with_html_parser_unless_lxml_is_asked_for_and_installed(monkeypatch: pytest.MonkeyPatch) -> None:
+    assert get_parser_features(backend="html.parser") == "html.parser"
+
+    monkeypatch.setattr("src.data_preparation.scraping.find_spec", lambda name: None)
+    assert get_parser_features(backend="lxml") == "html.parser"
+
+
+@pytest.mark.parametrize(
+    "markup",
+    [
+        "<html><body><p>Start A end. B end<i>.</i> tail</p></body></html>",  # The marker split by a tag
+        "<p>Start A end. B end&#46; tail</p>",  # The marker written with an entity
+        "<p>Start A end. x</p><p>&#84;ail</p><p><b>St</b>art B end. y</p>",
+        "<p>Start A end. x</p><p>&#83;tart y</p>",
+        "<p>Start A end. x</p><!-- <script> -->B end.<script></script>",
+        "<p>Start A end. x</p><textarea>end.</textarea>",
+        "<p>Start A end. &copy2 x</p>",
+        "<p>Start A end. a < b end.</p>",
+        '<p title="a>end.">Start A</p>',  # The only literal marker is in an attribute
+        '<p>Start A</p><script>var end = "end."</script>',
+        "<p>Start A &notend. x</p>",  # The only literal marker is part of an entity
+    ]
+)
+def test_bounded_extraction_matches_a_full_parse(markup: str) -> None:
+    bounded: str = extract_text(markup=markup, url=URL, initial_marker="Start", terminal_marker="end.")
+    assert bounded == extract_text(markup=markup, url=URL, initial_marker="Start", terminal_marker="end.", bounded=False)
+
+
+@pytest.mark.parametrize(
+    "markup",
+    [
+        "<p>Start A end. x &nbsp; <a href=\"y>\" title='z'>z</a> &#8212;</p><!-- a comment -->",
+        "<p>Start A end. x</p><script>var a = \"Start\";</script><style>p { }</style>",
+        "<script>var a = 1;</script><p>Start A end. x</p>",
+    ]
+)
+def test_markup_is_cut_when_the_rest_has_neither_marker_in_its_text(markup: str) -> None:
+    assert truncate_after_terminal_marker(markup=markup, initial_marker="Start", terminal_marker="end.").endswith("Start A end.")
+    assert extract_text(markup=markup, url=URL, initial_marker="Start", terminal_marker="end.") == "Start A "
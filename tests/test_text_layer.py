@@ -0,0 +1,46 @@
+from io import BytesIO
+
+from PIL import Image
+from pypdf import PdfReader, PdfWriter, PageObject
+from pypdf.generic import IndirectObject, NameObject
+
+from src.data_preparation.text_layer import TextLayerScanner, has_images
+
+
+def make_scanned_page(indirect_resources: bool) -> PageObject:
+    """
+    Make a PDF of a single page that is only an image, and read its page back. Pillow writes the page's resources
+    directly into the page, so they are moved into an object of their own when they are to be indirect (as they
+    are in most real PDFs).
+    """
+    image_pdf = BytesIO()
+    Image.new(mode="L", size=(600, 800), color=255).save(image_pdf, format="PDF")
+
+    writer = PdfWriter()
+    writer.append(PdfReader(image_pdf))
+    if indirect_resources:
+        page: PageObject = writer.pages[0]
+        page[NameObject("/Resources")] = writer._add_object(page["/Resources"])
+
+    output = BytesIO()
+    _ = writer.write(output)
+    return PdfReader(output).pages[0]
+
+
+def test_image_is_found_with_direct_resources() -> None:
+    assert has_images(page=make_scanned_page(indirect_resources=False))
+
+
+def test_image_is_found_with_indirect_resources() -> None:
+    page: PageObject = make_scanned_page(indirect_resources=True)
+
+    assert isinstance(page.get("/Resources"), IndirectObject)
+    assert has_images(page=page)
+    assert TextLayerScanner().page_needs_ocr(page=page)
+
+
+def test_blank_page_has_no_images() -> None:
+    page: PageObject = PageObject.create_blank_page(width=595, height=842)
+
+    assert not has_images(page=page)
+    assert not TextLayerScanner().page_needs_ocr(page=page)